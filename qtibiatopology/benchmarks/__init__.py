@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the Coverage Cleaning plugin. Not loaded by QGIS."""
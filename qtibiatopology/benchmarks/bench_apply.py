@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of writing cleaned geometries into a layer.
+
+Compares three ways of applying N changed geometries to a memory layer:
+
+    loop     one changeGeometry() per feature, each its own undo command
+             and signal round (the plugin before batching)
+    batched  apply_geometry_changes(): one undo command, layer signals
+             blocked, a single dataChanged at the end
+    direct   apply_geometry_changes(direct=True): changeGeometryValues()
+             on the data provider, no edit buffer
+
+A slot counting geometryChanged is connected to the layer to stand in for
+the attribute tables and snapping indexes listening in a QGIS session.
+Every edit buffer run is rolled back; direct runs restore the original
+geometries through the provider. Results are written as JSON.
+
+Needs PyQGIS only. From the repository root:
+
+    python -m qtibiatopology.benchmarks.bench_apply --changes 1000,50000 --output apply.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from qgis.core import Qgis, QgsApplication, QgsFeature, QgsGeometry, QgsVectorLayer
+
+from ..layer_edits import apply_geometry_changes
+from ..utils import wkb_to_geom
+from .synthetic import CoverageSpec, generate
+
+MODES = ("loop", "batched", "direct")
+
+
+def make_layer(count, seed):
+    """Memory layer with count synthetic polygons, and a shifted copy of each geometry."""
+    spec = CoverageSpec(count, vertices_per_edge=4, gap_fraction=0.0, overlap_fraction=0.0,
+                        seed=seed)
+    layer = QgsVectorLayer("Polygon?crs=EPSG:3844", "bench", "memory")
+    features = []
+    for wkb in generate(spec):
+        feature = QgsFeature()
+        feature.setGeometry(wkb_to_geom(wkb))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+
+    originals, changes = {}, []
+    for feature in layer.getFeatures():
+        geom = feature.geometry()
+        originals[feature.id()] = geom
+        moved = QgsGeometry(geom)
+        moved.translate(0.001, 0.0)
+        changes.append((feature.id(), moved))
+    return layer, originals, changes
+
+
+def apply_loop(layer, changes):
+    layer.startEditing()
+    for fid, geom in changes:
+        layer.changeGeometry(fid, geom)
+
+
+def run_once(layer, originals, changes, mode, signals):
+    """Apply changes once in mode and undo them.
+
+    :param signals: One-element list counting geometryChanged emissions
+    :return: Seconds, undo steps and geometryChanged signals of the apply
+    """
+    signals[0] = 0
+    start = time.perf_counter()
+    if mode == "loop":
+        apply_loop(layer, changes)
+    else:
+        apply_geometry_changes(layer, changes, direct=mode == "direct")
+    seconds = time.perf_counter() - start
+    emitted = signals[0]
+
+    if mode == "direct":
+        undo_steps = 0
+        layer.dataProvider().changeGeometryValues(originals)
+        layer.reload()
+    else:
+        undo_steps = layer.undoStack().count()
+        layer.rollBack()
+    return seconds, undo_steps, emitted
+
+
+def run_benchmark(args):
+    results = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "qgis": Qgis.version(),
+            "repeat": args.repeat,
+        },
+        "runs": [],
+    }
+    for count in args.changes:
+        layer, originals, changes = make_layer(count, args.seed)
+        signals = [0]
+        layer.geometryChanged.connect(lambda *_: signals.__setitem__(0, signals[0] + 1))
+        print(f"{count} changes")
+        for mode in args.modes:
+            # Warm-up run: provider caches, undo stack allocation
+            run_once(layer, originals, changes, mode, signals)
+            samples = []
+            for _ in range(args.repeat):
+                seconds, undo_steps, emitted = run_once(layer, originals, changes, mode, signals)
+                samples.append(seconds)
+            run = {
+                "changes": count,
+                "mode": mode,
+                "min": min(samples),
+                "median": statistics.median(samples),
+                "runs": samples,
+                "undo_steps": undo_steps,
+                "geometry_changed_signals": emitted,
+            }
+            results["runs"].append(run)
+            print(f"  {mode:<8}{run['median'] * 1000:10.1f}ms  undo steps {undo_steps:>7}  "
+                  f"geometryChanged {run['geometry_changed_signals']:>7}")
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--changes", type=lambda text: [int(v) for v in text.split(",")],
+                        default=[1000, 50000], help="comma separated change counts (default 1000,50000)")
+    parser.add_argument("--modes", type=lambda text: [v.strip() for v in text.split(",")],
+                        default=list(MODES), help="comma separated: loop, batched, direct")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per combination")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        results = run_benchmark(args)
+    finally:
+        app.exitQgis()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
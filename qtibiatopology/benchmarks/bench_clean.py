@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Stage-level benchmark of a PostGIS coverage clean.
+
+Generates synthetic coverages (see synthetic.py) and runs the stages of
+clean_coverage() against a PostGIS server, one timer per stage:
+
+    serialize  QgsGeometry -> WKB rows (iter_feature_wkb)
+    upload     TRUNCATE + load_coverage_input (binary COPY or executemany)
+    sql        CLEAN_SQL on the server, result kept in a temp table
+    fetch      result rows to the client
+    decode     WKB -> QgsGeometry (wkb_to_geom)
+    apply      apply_geometry_changes() into a memory layer's edit buffer
+
+The plugin streams serialization into the upload and fetches while the
+query runs; here every stage is timed on its own so a regression can be
+traced to one of them. Results are written as JSON, and a previous result
+file can be passed with --compare.
+
+Needs PyQGIS, psycopg and a pg_service pointing at PostGIS 3.6+. From the
+repository root:
+
+    python -m qtibiatopology.benchmarks.bench_clean --service bench \\
+        --features 1000,10000 --ingestion copy,executemany --output run.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from qgis.core import Qgis, QgsApplication, QgsFeature, QgsVectorLayer
+
+from ..layer_edits import apply_geometry_changes
+from ..postgis_engine import CLEAN_SQL, SessionPool, geometry_output, load_coverage_input
+from ..utils import iter_feature_wkb, wkb_to_geom
+from .synthetic import CoverageSpec, generate, vertex_count
+
+STAGES = ("serialize", "upload", "sql", "fetch", "decode", "apply")
+STRATEGIES = ("MERGE_LONGEST_BORDER", "MERGE_MAX_AREA", "MERGE_MIN_AREA", "MERGE_MIN_INDEX")
+
+# The clean result is materialized on the server, so the query and the
+# transfer of its rows are timed separately
+SQL_STAGE = ("CREATE TEMP TABLE bench_result ON COMMIT DROP AS "
+             + CLEAN_SQL.format(output=geometry_output("clean")))
+FETCH_STAGE = "SELECT feature_order, geom FROM bench_result ORDER BY feature_order"
+
+
+def make_layer(wkbs):
+    """Memory layer holding the synthetic polygons, with its features."""
+    layer = QgsVectorLayer("Polygon?crs=EPSG:3844", "bench", "memory")
+    features = []
+    for wkb in wkbs:
+        feature = QgsFeature()
+        feature.setGeometry(wkb_to_geom(wkb))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer, list(layer.getFeatures())
+
+
+def run_once(pool, layer, features, params, use_copy):
+    """Run every stage once.
+
+    :return: Dict with the seconds per stage, byte counts, method and changed count
+    """
+    timings = {}
+    start = time.perf_counter()
+    rows = list(iter_feature_wkb(features))
+    timings["serialize"] = time.perf_counter() - start
+    upload_bytes = sum(len(wkb or b"") for _order, wkb in rows)
+
+    with pool.session() as session, session.conn.transaction():
+        with session.conn.cursor(binary=True) as cur:
+            start = time.perf_counter()
+            cur.execute("TRUNCATE coverage_input")
+            method = load_coverage_input(cur, lambda: iter(rows), use_copy)
+            timings["upload"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cur.execute(SQL_STAGE, params)
+            timings["sql"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cur.execute(FETCH_STAGE)
+            results = cur.fetchall()
+            timings["fetch"] = time.perf_counter() - start
+    download_bytes = sum(len(wkb or b"") for _order, wkb in results)
+
+    start = time.perf_counter()
+    changed = [(feature_order, wkb_to_geom(wkb)) for feature_order, wkb in results]
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    apply_geometry_changes(layer, ((features[feature_order].id(), geom)
+                                   for feature_order, geom in changed))
+    timings["apply"] = time.perf_counter() - start
+    layer.rollBack()
+
+    return {
+        "timings": timings,
+        "method": method,
+        "changed": len(changed),
+        "upload_bytes": upload_bytes,
+        "download_bytes": download_bytes,
+    }
+
+
+def summarize(samples):
+    return {"min": min(samples), "median": statistics.median(samples), "runs": samples}
+
+
+def server_info(pool):
+    with pool.session() as session:
+        row = session.conn.execute("SELECT version(), postgis_full_version()").fetchone()
+    return {"postgres": row[0], "postgis": row[1]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    pool = SessionPool(args.service)
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "qgis": Qgis.version(),
+            "server": server_info(pool),
+            "gap_tolerance": args.gap_tolerance,
+            "snapping_distance": args.snapping_distance,
+            "repeat": args.repeat,
+        },
+        "runs": [],
+    }
+    try:
+        for count in args.features:
+            spec = CoverageSpec(count, args.vertices, args.gap_fraction, args.gap_width,
+                                args.overlap_fraction, args.overlap_width, args.seed)
+            wkbs = generate(spec)
+            layer, features = make_layer(wkbs)
+            print(f"{count} features, {vertex_count(wkbs)} vertices")
+            for strategy in args.strategies:
+                params = (args.gap_tolerance, args.snapping_distance, strategy)
+                for ingestion in args.ingestion:
+                    # One warm-up run: prepared statements, caches, connection
+                    run_once(pool, layer, features, params, ingestion == "copy")
+                    samples = [run_once(pool, layer, features, params, ingestion == "copy")
+                               for _ in range(args.repeat)]
+                    stages = {stage: summarize([s["timings"][stage] for s in samples])
+                              for stage in STAGES}
+                    run = {
+                        "features": count,
+                        "strategy": strategy,
+                        "ingestion": ingestion,
+                        "method": samples[-1]["method"],
+                        "coverage": spec.as_dict(),
+                        "changed": samples[-1]["changed"],
+                        "upload_bytes": samples[-1]["upload_bytes"],
+                        "download_bytes": samples[-1]["download_bytes"],
+                        "stages": stages,
+                        "total_median": sum(stage["median"] for stage in stages.values()),
+                    }
+                    results["runs"].append(run)
+                    print(f"  {strategy:<22}{ingestion:<14}" + "".join(
+                        f"{stage} {stages[stage]['median'] * 1000:8.1f}ms  " for stage in STAGES))
+    finally:
+        pool.close()
+    return results
+
+
+def run_key(run):
+    return run["features"], run["strategy"], run["ingestion"]
+
+
+def compare(baseline, current):
+    """Print the median stage times of current relative to baseline."""
+    old_runs = {run_key(run): run for run in baseline["runs"]}
+    print(f"\ncompared with {baseline['meta'].get('commit') or 'baseline'} "
+          "(median, new/old; > 1.00 is slower)")
+    for run in current["runs"]:
+        old = old_runs.get(run_key(run))
+        if old is None:
+            continue
+        ratios = "  ".join(
+            f"{stage} {run['stages'][stage]['median'] / old['stages'][stage]['median']:.2f}"
+            for stage in STAGES if old["stages"][stage]["median"] > 0)
+        print(f"  {run['features']:>7} {run['strategy']:<22}{run['ingestion']:<14}{ratios}")
+
+
+def parse_args(argv):
+    def int_list(text):
+        return [int(value) for value in text.split(",")]
+
+    def str_list(text):
+        return [value.strip() for value in text.split(",")]
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--service", required=True, help="pg_service of the PostGIS database")
+    parser.add_argument("--features", type=int_list, default=[1000, 10000],
+                        help="comma separated feature counts (default 1000,10000)")
+    parser.add_argument("--strategies", type=str_list, default=["MERGE_LONGEST_BORDER"],
+                        help="comma separated merge strategies, or 'all'")
+    parser.add_argument("--ingestion", type=str_list, default=["copy", "executemany"],
+                        help="comma separated upload methods: copy, executemany")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per combination")
+    parser.add_argument("--gap-tolerance", type=float, default=0.01)
+    parser.add_argument("--snapping-distance", type=float, default=-1)
+    parser.add_argument("--vertices", type=int, default=8, help="extra vertices per cell edge")
+    parser.add_argument("--gap-fraction", type=float, default=0.05)
+    parser.add_argument("--gap-width", type=float, default=0.005)
+    parser.add_argument("--overlap-fraction", type=float, default=0.05)
+    parser.add_argument("--overlap-width", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args(argv)
+    if args.strategies == ["all"]:
+        args.strategies = list(STRATEGIES)
+    unknown = set(args.ingestion) - {"copy", "executemany"}
+    if unknown:
+        parser.error(f"unknown ingestion method(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        results = run_benchmark(args)
+    finally:
+        app.exitQgis()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Peak memory of a selection clean against the selection size.
+
+Writes synthetic coverages (see synthetic.py) to GeoPackages, then cleans
+every feature of each one with the PostGIS engine and writes the results
+back with apply_geometry_changes(direct=True). Each run is a fresh
+interpreter, and the growth of its peak resident set size over the
+baseline after opening the layer is reported. Two ways of handing over
+the input are compared:
+
+    stream  SelectionStream: geometry-only reads in chunks (the plugin)
+    list    layer.selectedFeatures(): every feature with its attributes
+            in memory at once (the plugin before streaming)
+
+Results come back through the server-side cursor and ResultSpool in both
+modes. Peak RSS comes from getrusage(), so figures are only comparable on
+the same OS. Needs PyQGIS, psycopg and a pg_service pointing at PostGIS
+3.6+. From the repository root:
+
+    python -m qtibiatopology.benchmarks.bench_memory --service bench \\
+        --features 10000,100000,400000 --modes stream,list --output memory.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("stream", "list")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def write_coverage(path, features, vertices, seed):
+    """Write a synthetic coverage of features polygons to a GeoPackage."""
+    from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransformContext, QgsFeature,
+                           QgsFeatureSink, QgsFields, QgsVectorFileWriter, QgsWkbTypes)
+
+    from ..utils import wkb_to_geom
+    from .synthetic import CoverageSpec, generate
+
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "GPKG"
+    writer = QgsVectorFileWriter.create(path, QgsFields(), QgsWkbTypes.Polygon,
+                                        QgsCoordinateReferenceSystem("EPSG:3844"),
+                                        QgsCoordinateTransformContext(), options)
+    for wkb in generate(CoverageSpec(features, vertices, seed=seed)):
+        feature = QgsFeature()
+        feature.setGeometry(wkb_to_geom(wkb))
+        writer.addFeature(feature, QgsFeatureSink.FastInsert)
+    del writer
+
+
+def child(args):
+    """Clean the GeoPackage args.child in this process and print the figures as JSON."""
+    from qgis.core import QgsApplication, QgsVectorLayer
+
+    from ..layer_edits import apply_geometry_changes
+    from ..postgis_engine import PostGISEngine, SessionPoolRegistry
+    from ..streaming import SelectionStream, feature_ids
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    layer = QgsVectorLayer(args.child, "bench", "ogr")
+    layer.selectAll()
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    features = SelectionStream(layer) if args.mode == "stream" else layer.selectedFeatures()
+    pools = SessionPoolRegistry()
+    engine = PostGISEngine(args.service, pools)
+    try:
+        result = engine.clean(features, args.gap_tolerance, args.snapping_distance,
+                              "MERGE_LONGEST_BORDER")
+    finally:
+        pools.close()
+    fids = feature_ids(features)
+    apply_geometry_changes(layer, ((fids[idx], geom) for idx, geom in result.changed),
+                           direct=True)
+    seconds = time.perf_counter() - start
+
+    print(json.dumps({"peak_growth_mb": peak_rss_mb() - baseline, "baseline_mb": baseline,
+                      "seconds": seconds, "changed": len(result.changed)}))
+
+
+def run(args):
+    from qgis.core import QgsApplication
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for count in args.features:
+            source = os.path.join(folder, f"coverage_{count}.gpkg")
+            write_coverage(source, count, args.vertices, args.seed)
+            for mode in args.modes:
+                # Direct writes change the file, every run starts from a copy
+                path = os.path.join(folder, f"run_{count}_{mode}.gpkg")
+                shutil.copy(source, path)
+                out = subprocess.run(
+                    [sys.executable, "-m", "qtibiatopology.benchmarks.bench_memory",
+                     "--child", path, "--mode", mode, "--service", args.service,
+                     "--gap-tolerance", str(args.gap_tolerance),
+                     "--snapping-distance", str(args.snapping_distance)],
+                    check=True, capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                results[f"{count}/{mode}"] = result
+                print(f"{count:>9} {mode:>7}: peak +{result['peak_growth_mb']:8.1f} MB, "
+                      f"{result['seconds']:7.2f} s, {result['changed']} changed")
+
+    if args.output:
+        meta = {"python": platform.python_version(), "machine": platform.platform(),
+                "vertices": args.vertices, "seed": args.seed,
+                "gap_tolerance": args.gap_tolerance, "snapping_distance": args.snapping_distance}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--service", required=True, help="pg_service of the PostGIS server")
+    parser.add_argument("--features", type=lambda text: [int(v) for v in text.split(",")],
+                        default=[10000, 100000])
+    parser.add_argument("--modes", type=lambda text: text.split(","), default=list(MODES))
+    parser.add_argument("--vertices", type=int, default=8, help="extra vertices per cell edge")
+    parser.add_argument("--gap-tolerance", type=float, default=0.01)
+    parser.add_argument("--snapping-distance", type=float, default=-1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Startup cost of the plugin: what QGIS pays before the first click.
+
+Every sample runs in a fresh interpreter: after PyQt and qgis.core are
+imported and a QgsApplication is initialized (QGIS has paid for those
+already), it times importing the plugin package and classFactory()
+building the plugin object, then lists the heavy modules that came along
+(psycopg, shapely, numpy) and how many plugin modules were loaded.
+
+--ref measures a git revision next to the working tree, e.g. the commit
+before lazy imports, so the before/after figures come from one machine
+and one command. Needs PyQGIS only. From the repository root:
+
+    python -m qtibiatopology.benchmarks.bench_startup --repeat 20 --ref HEAD~1 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+# Modules a plugin load should not pull in before the first run
+HEAVY_MODULES = ("psycopg", "shapely", "numpy")
+
+PROBE = """
+import json, sys, time
+from qgis.core import QgsApplication
+app = QgsApplication([], False)
+app.initQgis()
+sys.path.insert(0, {root!r})
+before = set(sys.modules)
+start = time.perf_counter()
+import qtibiatopology
+plugin = qtibiatopology.classFactory(None)
+seconds = time.perf_counter() - start
+loaded = set(sys.modules) - before
+print(json.dumps({{
+    "seconds": seconds,
+    "heavy": sorted(name for name in {heavy!r} if name in loaded),
+    "plugin_modules": sorted(name for name in loaded if name.startswith("qtibiatopology")),
+}}))
+"""
+
+
+def repository_root():
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def export_revision(ref, folder):
+    """Extract the plugin folder of git revision ref into folder."""
+    archive = os.path.join(folder, "plugin.tar")
+    subprocess.run(["git", "archive", "--output", archive, ref, "qtibiatopology"],
+                   cwd=repository_root(), check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(folder)
+    return folder
+
+
+def measure(root, repeat):
+    """Run the probe repeat times against the plugin found in root."""
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(root=root, heavy=HEAVY_MODULES)],
+                             check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    seconds = [sample["seconds"] for sample in samples]
+    return {
+        "median_ms": statistics.median(seconds) * 1000,
+        "min_ms": min(seconds) * 1000,
+        "samples_ms": [s * 1000 for s in seconds],
+        "heavy": samples[-1]["heavy"],
+        "plugin_modules": samples[-1]["plugin_modules"],
+    }
+
+
+def report(label, result):
+    heavy = ", ".join(result["heavy"]) or "none"
+    print(f"{label:>12}: median {result['median_ms']:8.1f} ms, min {result['min_ms']:8.1f} ms, "
+          f"{len(result['plugin_modules'])} plugin modules, heavy modules: {heavy}")
+
+
+def run(args):
+    from qgis.core import Qgis
+
+    results = {"working tree": measure(repository_root(), args.repeat)}
+    if args.ref:
+        with tempfile.TemporaryDirectory() as folder:
+            results[args.ref] = measure(export_revision(args.ref, folder), args.repeat)
+    for label, result in results.items():
+        report(label, result)
+
+    if args.output:
+        meta = {"python": platform.python_version(), "qgis": Qgis.QGIS_VERSION,
+                "machine": platform.platform(), "repeat": args.repeat}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters per variant")
+    parser.add_argument("--ref", help="git revision to measure as well, e.g. HEAD~1")
+    parser.add_argument("--output", help="write the results as JSON")
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
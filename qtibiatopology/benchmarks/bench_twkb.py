@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Payload size, speed and correctness check of the TWKB transfer format.
+
+Encodes the polygons of a synthetic coverage (see synthetic.py) with
+wkb_to_twkb() at several precisions, reports the size against full
+precision WKB and the encode/decode time per geometry, and checks that
+decoding gives back every coordinate rounded to the precision. Runs
+without QGIS; from the repository root:
+
+    python -m qtibiatopology.benchmarks.bench_twkb --features 2000 --precisions 0,3,6
+"""
+import argparse
+import struct
+import time
+
+from ..wkb import twkb_to_wkb, wkb_to_twkb
+from .synthetic import CoverageSpec, generate
+
+
+def coordinates(wkb):
+    """Coordinates of a little-endian 2D ISO WKB polygon, in order."""
+    (rings,) = struct.unpack_from("<I", wkb, 5)
+    pos, coords = 9, []
+    for _ in range(rings):
+        (points,) = struct.unpack_from("<I", wkb, pos)
+        coords.extend(struct.unpack_from(f"<{2 * points}d", wkb, pos + 4))
+        pos += 4 + 16 * points
+    return coords
+
+
+def check(wkbs, precision):
+    """Assert the round trip keeps every vertex, within half a unit of the last decimal."""
+    tolerance = 0.5 * 10.0 ** -precision + 1e-9
+    for wkb in wkbs:
+        original, decoded = coordinates(wkb), coordinates(twkb_to_wkb(wkb_to_twkb(wkb, precision)))
+        assert len(original) == len(decoded)
+        assert all(abs(a - b) <= tolerance for a, b in zip(original, decoded))
+
+
+def run(args):
+    spec = CoverageSpec(args.features, args.vertices, seed=args.seed)
+    wkbs = generate(spec)
+    wkb_size = sum(len(wkb) for wkb in wkbs)
+    print(f"{len(wkbs)} polygons, {wkb_size / 1024:.1f} KB as WKB")
+    print(f"{'precision':>9}{'TWKB KB':>12}{'of WKB':>9}{'encode':>12}{'decode':>12}")
+    for precision in args.precisions:
+        check(wkbs, precision)
+        start = time.perf_counter()
+        twkbs = [wkb_to_twkb(wkb, precision) for wkb in wkbs]
+        encode = time.perf_counter() - start
+        start = time.perf_counter()
+        for twkb in twkbs:
+            twkb_to_wkb(twkb)
+        decode = time.perf_counter() - start
+        size = sum(len(twkb) for twkb in twkbs)
+        print(f"{precision:>9}{size / 1024:>12.1f}{100 * size / wkb_size:>8.0f}%"
+              f"{encode / len(wkbs) * 1e6:>10.1f}us{decode / len(wkbs) * 1e6:>10.1f}us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--features", type=int, default=2000)
+    parser.add_argument("--vertices", type=int, default=8, help="extra vertices per cell edge")
+    parser.add_argument("--precisions", type=lambda text: [int(v) for v in text.split(",")],
+                        default=[0, 3, 6], help="comma separated decimal places (default 0,3,6)")
+    parser.add_argument("--seed", type=int, default=1)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for EWKB decoding.
+
+Compares the binary ewkb_to_wkb() with the hex round trip the plugin used
+before (bytes.hex(), string slicing to drop the SRID, bytes.fromhex()).
+Its EWKB builders are shared with the correctness tests in test_wkb.py.
+Runs without QGIS; from the repository root:
+
+    python -m qtibiatopology.benchmarks.bench_wkb_decode
+"""
+import struct
+import timeit
+
+from ..wkb import EWKB_M_FLAG, EWKB_SRID_FLAG, EWKB_Z_FLAG, ewkb_to_wkb
+
+
+def legacy_ewkb_to_wkb(ewkb):
+    """The previous ewkb_to_geom() conversion, minus the QgsGeometry step."""
+    ewkb_str = ewkb.hex()
+    header = ewkb_str[2:10]
+    has_srid = int(header[6], 16) & 2 > 0
+    if has_srid:
+        header = header[:6] + "%X" % (int(header[6], 16) ^ 2) + header[7]
+        ewkb_str = ewkb_str[:2] + header + ewkb_str[18:]
+    return bytes.fromhex(ewkb_str)
+
+
+def ring(vertices, dims, offset=0.0):
+    """Closed square-ish ring with the given number of vertices."""
+    coords = []
+    for i in range(vertices - 1):
+        coords.append([offset + i, offset + (i % 7)] + [float(i)] * (dims - 2))
+    coords.append(coords[0])
+    return coords
+
+
+def polygon_body(order, rings, dims):
+    body = struct.pack(order + "I", len(rings))
+    for coords in rings:
+        body += struct.pack(order + "I", len(coords))
+        for coord in coords:
+            body += struct.pack(order + "d" * dims, *coord)
+    return body
+
+
+def make_ewkb(order, parts, vertices, z=False, m=False, srid=3844):
+    """Build EWKB for a polygon (parts=1) or a multipolygon, plus the expected ISO WKB."""
+    dims = 2 + z + m
+    byte_order = 1 if order == "<" else 0
+    flags = (EWKB_Z_FLAG if z else 0) | (EWKB_M_FLAG if m else 0)
+    iso_offset = (1000 if z else 0) + (2000 if m else 0)
+    polygons = [[ring(vertices, dims, offset=100.0 * p)] for p in range(parts)]
+
+    if parts == 1:
+        body = polygon_body(order, polygons[0], dims)
+        ewkb = struct.pack(order + "BI", byte_order, 3 | flags | EWKB_SRID_FLAG)
+        ewkb += struct.pack(order + "I", srid) + body
+        iso = struct.pack(order + "BI", byte_order, 3 + iso_offset) + body
+        return ewkb, iso
+
+    ewkb = struct.pack(order + "BI", byte_order, 6 | flags | EWKB_SRID_FLAG)
+    ewkb += struct.pack(order + "I", srid) + struct.pack(order + "I", parts)
+    iso = struct.pack(order + "BI", byte_order, 6 + iso_offset) + struct.pack(order + "I", parts)
+    for rings in polygons:
+        body = polygon_body(order, rings, dims)
+        ewkb += struct.pack(order + "BI", byte_order, 3 | flags) + body
+        iso += struct.pack(order + "BI", byte_order, 3 + iso_offset) + body
+    return ewkb, iso
+
+
+def benchmark():
+    print(f"{'geometry':<28}{'legacy hex':>14}{'binary':>14}{'speedup':>10}")
+    for parts, vertices in ((1, 5), (1, 200), (1, 5000), (10, 500)):
+        ewkb, _iso = make_ewkb("<", parts, vertices)
+        number = max(200, 200000 // (parts * vertices))
+        legacy = min(timeit.repeat(lambda: legacy_ewkb_to_wkb(ewkb), number=number, repeat=5))
+        binary = min(timeit.repeat(lambda: ewkb_to_wkb(ewkb), number=number, repeat=5))
+        label = f"{parts} part(s) x {vertices} vertices"
+        print(f"{label:<28}{legacy / number * 1e6:>12.2f}us{binary / number * 1e6:>12.2f}us"
+              f"{legacy / binary:>9.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Replay of a captured cleaning run without the QGIS interface.
+
+A capture (.qtcap, written when "Capture run inputs for replay" is on,
+see capture.py) holds the exact input WKB of a clean, its parameters,
+engine options and timings. This reruns it against any engine and
+database, so a slow or broken production run can be profiled on a
+developer machine:
+
+    captured   the engine, parameters and options of the capture
+    --engine   another engine (postgis or geos)
+    --service  another pg_service, e.g. a local copy of the server
+    --set      an engine option, e.g. --set partition_clusters=true
+
+Every repetition gets a run profile, and the stage timings are printed
+next to the captured run's. Captures can be kept as benchmark fixtures:
+--output writes the results as JSON. Needs PyQGIS, and psycopg with a
+pg_service pointing at PostGIS 3.6+ (or shapely) for the engine. From
+the repository root:
+
+    python -m qtibiatopology.benchmarks.replay slow-run.qtcap --service dev \\
+        --repeat 3 --output replay.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+from contextlib import nullcontext
+
+from qgis.core import QgsApplication
+
+from ..capture import CaptureFile
+from ..engines import ENGINE_GEOS, ENGINE_POSTGIS
+from ..profiling import RunProfile
+
+
+class ReplayRun:
+    """Stands in for a CoverageCleaningTask: records the stages in a run profile."""
+
+    PROFILE_KIND = "replay"
+
+    def __init__(self, capture):
+        self.profile = RunProfile(self.PROFILE_KIND, features=len(capture))
+
+    def isCanceled(self):  # same name as QgsTask.isCanceled()
+        return False
+
+    def set_stage(self, stage, fraction=0.0):
+        self.profile.stage(stage)
+
+    def cancel_hook(self, callback):
+        return nullcontext()
+
+
+def option_setting(text):
+    """Parse --set OPTION=VALUE, reading the value as JSON (numbers, true/false) or text."""
+    name, _sep, value = text.partition("=")
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def create_engine(name, options, args, pools):
+    """Create the replay engine from the captured options and the command line."""
+    if name == ENGINE_GEOS:
+        from ..geos_engine import GeosEngine
+        return GeosEngine(simplify_tolerance=options.get("simplify_tolerance", 0.0),
+                          verbose=args.verbose)
+    if name != ENGINE_POSTGIS:
+        raise SystemExit(f"Unknown engine {name}")
+    if not args.service:
+        raise SystemExit("--service is needed to replay on PostGIS")
+    from ..postgis_engine import PostGISEngine
+    return PostGISEngine(args.service, pools, diagnostics=args.diagnostics,
+                         verbose=args.verbose, **options)
+
+
+def replay(capture, args):
+    """Clean capture args.repeat times and return the run summaries."""
+    from ..postgis_engine import SessionPoolRegistry
+
+    header = capture.header
+    engine_name = args.engine or header["engine"]
+    options = dict(header.get("engine_options", {}))
+    for name, value in args.set:
+        options[name] = value
+    if engine_name == ENGINE_GEOS:
+        options = {name: value for name, value in options.items() if name == "simplify_tolerance"}
+    gap_tolerance = (args.gap_tolerance if args.gap_tolerance is not None
+                     else header["gap_tolerance"])
+    snapping_distance = (args.snapping_distance if args.snapping_distance is not None
+                         else header["snapping_distance"])
+    merge_strategy = args.merge_strategy or header["merge_strategy"]
+
+    pools = SessionPoolRegistry()
+    runs = []
+    try:
+        engine = create_engine(engine_name, options, args, pools)
+        print(f"Replaying {len(capture)} features with the {engine.label} engine: "
+              f"gap={gap_tolerance:g}, snap={snapping_distance:g}, {merge_strategy}, "
+              f"options {json.dumps(options)}")
+        for repetition in range(args.repeat):
+            run = ReplayRun(capture)
+            run.profile.annotate(engine=engine.name, repetition=repetition)
+            start = time.perf_counter()
+            try:
+                result = engine.clean(capture, gap_tolerance, snapping_distance,
+                                      merge_strategy, run)
+                run.profile.annotate(outcome="finished", changed=len(result.changed))
+            except Exception as e:
+                run.profile.annotate(outcome="failed", error=str(e))
+            run.profile.finish()
+            summary = run.profile.summary()
+            runs.append(summary)
+            print(f"  run {repetition + 1}: {time.perf_counter() - start:8.3f} s, "
+                  f"{summary.get('changed', summary.get('error'))}")
+        # The engine gathers the server figures of all repetitions
+        if engine_name == ENGINE_POSTGIS and args.diagnostics and runs:
+            runs[-1]["server"] = engine.diagnostics.summary()
+    finally:
+        pools.close()
+    return runs
+
+
+def print_stages(captured, runs):
+    """Print the median seconds of every stage of the replays next to the captured run."""
+    captured_stages = (captured or {}).get("profile", {}).get("stages", {})
+    names = list(captured_stages)
+    for run in runs:
+        names.extend(name for name in run["stages"] if name not in names)
+    print(f"{'stage':>14} {'captured':>10} {'replay':>10}")
+    for name in names:
+        before = captured_stages.get(name, {}).get("seconds")
+        after = [run["stages"][name]["seconds"] for run in runs if name in run["stages"]]
+        print(f"{name:>14} {before if before is not None else '-':>10} "
+              f"{round(statistics.median(after), 3) if after else '-':>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("capture", help=".qtcap file to replay")
+    parser.add_argument("--engine", choices=(ENGINE_POSTGIS, ENGINE_GEOS),
+                        help="engine to replay on, the captured one by default")
+    parser.add_argument("--service", help="pg_service of the PostGIS server")
+    parser.add_argument("--gap-tolerance", type=float)
+    parser.add_argument("--snapping-distance", type=float)
+    parser.add_argument("--merge-strategy")
+    parser.add_argument("--set", action="append", default=[], metavar="OPTION=VALUE",
+                        type=option_setting,
+                        help="override a captured engine option")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="PostGIS: EXPLAIN ANALYZE the statements (see diagnostics.py)")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    with CaptureFile(args.capture) as capture:
+        header, captured = capture.header, capture.trailer
+        print(f"Capture of a {header.get('kind', '')} run on {header.get('layer') or '-'} "
+              f"({header['created']}, QGIS {header.get('qgis')}, {header['engine']}): "
+              + (f"{captured['outcome']} in {captured['seconds']:.3f} s" if captured
+                 else "the run never finished"))
+        runs = replay(capture, args)
+    print_stages(captured, runs)
+
+    if args.output:
+        meta = {"python": platform.python_version(), "machine": platform.platform(),
+                "capture": args.capture}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "header": header, "captured": captured, "runs": runs},
+                      f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic polygon coverages for benchmarks.
+
+A grid of cells whose shared corners are jittered and whose shared edges
+are densified with identical vertices on both sides, so the untouched
+coverage is valid. Chosen cells are then shrunk (leaving gaps to their
+neighbours) or grown (overlapping them). Everything is derived from the
+seed, so the same arguments always give the same bytes. Pure Python, no
+QGIS needed.
+"""
+import math
+import random
+import struct
+
+# Side length of a grid cell in map units
+CELL_SIZE = 100.0
+
+
+class CoverageSpec:
+    """Parameters of a synthetic coverage."""
+
+    def __init__(self, features, vertices_per_edge=8, gap_fraction=0.05, gap_width=0.005,
+                 overlap_fraction=0.05, overlap_width=0.005, seed=1):
+        """Constructor.
+
+        :param features: Number of polygons
+        :param vertices_per_edge: Extra vertices on every cell edge (vertex density)
+        :param gap_fraction: Share of cells shrunk away from their neighbours
+        :param gap_width: Width of the gaps around shrunk cells, in map units
+        :param overlap_fraction: Share of cells grown into their neighbours
+        :param overlap_width: Width of the overlaps around grown cells, in map units
+        :param seed: Random seed
+        """
+        self.features = features
+        self.vertices_per_edge = vertices_per_edge
+        self.gap_fraction = gap_fraction
+        self.gap_width = gap_width
+        self.overlap_fraction = overlap_fraction
+        self.overlap_width = overlap_width
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def generate(spec):
+    """Build the coverage described by spec.
+
+    :return: List of little-endian ISO WKB polygons, in grid order
+    """
+    cols = max(1, math.ceil(math.sqrt(spec.features)))
+    rows = math.ceil(spec.features / cols)
+    rng = random.Random(spec.seed)
+
+    # Jittered grid corners, shared by the up to four cells around them
+    jitter = CELL_SIZE * 0.2
+    corners = [[(c * CELL_SIZE + rng.uniform(-jitter, jitter),
+                 r * CELL_SIZE + rng.uniform(-jitter, jitter))
+                for c in range(cols + 1)] for r in range(rows + 1)]
+
+    # Cell edits are drawn after the grid, so changing the fractions keeps the geometry
+    edits = []
+    for _ in range(spec.features):
+        draw = rng.random()
+        if draw < spec.gap_fraction:
+            edits.append(-spec.gap_width)
+        elif draw < spec.gap_fraction + spec.overlap_fraction:
+            edits.append(spec.overlap_width)
+        else:
+            edits.append(0.0)
+
+    edge_cache = {}
+    polygons = []
+    for idx in range(spec.features):
+        r, c = divmod(idx, cols)
+        # Counter-clockwise corner keys of the cell
+        keys = [(r, c), (r, c + 1), (r + 1, c + 1), (r + 1, c)]
+        ring = []
+        for start, end in zip(keys, keys[1:] + keys[:1]):
+            ring.extend(_edge(corners, start, end, spec.vertices_per_edge, edge_cache)[:-1])
+        ring.append(ring[0])
+        if edits[idx]:
+            ring = _offset(ring, edits[idx])
+        polygons.append(polygon_wkb(ring))
+    return polygons
+
+
+def _edge(corners, start, end, vertices, cache):
+    """Vertices from corner start to corner end, identical for both cells sharing the edge."""
+    key = (min(start, end), max(start, end))
+    points = cache.get(key)
+    if points is None:
+        (x0, y0), (x1, y1) = corners[key[0][0]][key[0][1]], corners[key[1][0]][key[1][1]]
+        length = math.hypot(x1 - x0, y1 - y0)
+        nx, ny = -(y1 - y0) / length, (x1 - x0) / length
+        # A gentle wave, so densified edges aren't collinear and survive simplification
+        amplitude = CELL_SIZE * 0.03
+        points = []
+        for i in range(vertices + 2):
+            t = i / (vertices + 1)
+            wave = amplitude * math.sin(math.pi * t) * math.sin(3 * math.pi * t)
+            points.append((x0 + (x1 - x0) * t + nx * wave, y0 + (y1 - y0) * t + ny * wave))
+        cache[key] = points
+    return points if key[0] == start else points[::-1]
+
+
+def _offset(ring, distance):
+    """Move every vertex away from (distance > 0) or towards the ring centroid."""
+    cx = sum(x for x, _y in ring[:-1]) / (len(ring) - 1)
+    cy = sum(y for _x, y in ring[:-1]) / (len(ring) - 1)
+    moved = []
+    for x, y in ring:
+        d = math.hypot(x - cx, y - cy)
+        scale = (d + distance) / d if d else 1.0
+        moved.append((cx + (x - cx) * scale, cy + (y - cy) * scale))
+    return moved
+
+
+def polygon_wkb(ring):
+    """Little-endian ISO WKB of a single-ring polygon."""
+    return (struct.pack("<BII", 1, 3, 1) + struct.pack("<I", len(ring))
+            + struct.pack(f"<{2 * len(ring)}d", *(v for point in ring for v in point)))
+
+
+def vertex_count(wkbs):
+    """Total number of vertices of polygons built by generate()."""
+    return sum(struct.unpack_from("<I", wkb, 9)[0] for wkb in wkbs)
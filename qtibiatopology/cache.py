@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Content-addressed cache of cleaning results. Runs are keyed by a hash of
+ the input WKBs and the cleaning parameters; results live in an in-memory
+ LRU and optionally in a size-capped folder on disk. Keys and storage are
+ pure Python: QGIS is imported where geometries are converted and messages
+ logged, so they can be tested outside QGIS.
+"""
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .engines import CleaningResult
+
+# Memory tier size; results only hold changed geometries, so this is plenty
+# for stepping back and forth between a handful of tolerances
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Disk entry layout: magic, total and changed count, then per changed
+# geometry its input index and WKB length followed by the WKB itself
+DISK_MAGIC = b"QTCC1"
+_DISK_HEADER = struct.Struct("<II")
+_DISK_ENTRY = struct.Struct("<II")
+
+
+def input_digest(features, progress=None):
+    """Hash the input geometries of a cleaning run.
+
+    Every WKB is length-prefixed so that different splits of the same bytes
+    never collide; an empty geometry hashes as length zero.
+
+    :param features: List of QgsFeature objects, in run order
+    :param progress: Optional callable receiving the fraction of features hashed
+    :return: Digest bytes, combined with the parameters by run_key()
+    """
+    from .utils import PROGRESS_INTERVAL, geometry_wkb
+    digest = hashlib.blake2b(digest_size=32)
+    count = len(features)
+    for idx, feature in enumerate(features):
+        if progress is not None and idx % PROGRESS_INTERVAL == 0:
+            progress(idx / count)
+        wkb = geometry_wkb(feature.geometry()) or b""
+        digest.update(struct.pack("<I", len(wkb)))
+        digest.update(wkb)
+    return digest.digest()
+
+
+def changed_wkb(result):
+    """Yield (input index, WKB) of a CleaningResult's changed geometries.
+
+    Results spooled as WKB (ResultSpool) are read back without decoding.
+    """
+    wkb_items = getattr(result.changed, "wkb_items", None)
+    if wkb_items is not None:
+        yield from wkb_items()
+        return
+    from .utils import geometry_wkb
+    for idx, geom in result.changed:
+        yield idx, geometry_wkb(geom)
+
+
+def run_key(digest, gap_tolerance, snapping_distance, merge_strategy, engine):
+    """Return the cache key of a run on the input hashed by input_digest().
+
+    :param engine: Name of the engine, results of different engines are kept apart
+    :return: Hex digest identifying the run
+    """
+    key = hashlib.blake2b(digest, digest_size=32)
+    key.update(struct.pack("<dd", gap_tolerance, snapping_distance))
+    key.update(f"{merge_strategy}\0{engine}".encode())
+    return key.hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache of CleaningResult objects keyed by run_key().
+
+    Entries are stored as WKB, never as QgsGeometry, so a hit hands out
+    fresh geometries. Safe to use from several task threads.
+    """
+
+    def __init__(self, enabled=True, disk_folder=None, disk_max_bytes=0):
+        """Constructor.
+
+        :param enabled: When False, get() always misses and put() stores nothing
+        :param disk_folder: Folder of the disk tier, None to keep results in memory only
+        :param disk_max_bytes: Size cap of the disk tier, oldest entries are evicted first
+        """
+        self.enabled = enabled
+        self.disk_folder = disk_folder
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, enabled, disk_folder, disk_max_bytes):
+        """Apply changed settings; cached entries are kept."""
+        with self._lock:
+            self.enabled = enabled
+            self.disk_folder = disk_folder
+            self.disk_max_bytes = disk_max_bytes
+            if not enabled:
+                self._memory.clear()
+                self._memory_bytes = 0
+
+    def get(self, key):
+        """Return the cached CleaningResult for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        from .utils import log_message, wkb_to_geom
+        entry, tier = self._lookup(key)
+        log_message(f"Result cache {'hit (' + tier + ')' if entry is not None else 'miss'}: "
+                    f"{self.hits} hits, {self.misses} misses")
+        if entry is None:
+            return None
+        total, changed = entry
+        return CleaningResult([(idx, wkb_to_geom(wkb)) for idx, wkb in changed], total)
+
+    def get_wkb(self, key):
+        """Return the cached (total, list of (input index, WKB)) for key, or None on a miss."""
+        return self._lookup(key)[0]
+
+    def _lookup(self, key):
+        """Find key in memory, then on disk, and count the hit or miss.
+
+        :return: Tuple (entry or None, tier it was found in)
+        """
+        if not self.enabled:
+            return None, None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                tier = "memory"
+        if entry is None:
+            entry = self._read_disk(key)
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self._remember(key, entry)
+                tier = "disk"
+        return entry, tier
+
+    def put(self, key, result):
+        """Store a CleaningResult under key in both tiers.
+
+        Results too large for the memory tier are not copied into memory;
+        they only go to the disk tier, streamed from the result.
+        """
+        if not self.enabled:
+            return
+        changed, size = [], 0
+        for idx, wkb in changed_wkb(result):
+            size += len(wkb or b"") + 8
+            if size > MEMORY_CACHE_MAX_BYTES:
+                changed = None
+                break
+            changed.append((idx, wkb))
+        if changed is not None:
+            with self._lock:
+                self._remember(key, (result.total, changed))
+        if self.disk_folder and self.disk_max_bytes > 0:
+            try:
+                self._write_disk(key, result.total, len(result.changed),
+                                 changed if changed is not None else changed_wkb(result))
+            except OSError as e:
+                from qgis.core import Qgis
+                from .utils import log_message
+                log_message(f"Could not write the disk result cache: {e}", Qgis.Warning)
+
+    def clear(self):
+        """Drop every entry from memory and disk and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.hits = 0
+            self.misses = 0
+        removed = 0
+        for path, _size, _mtime in self._disk_entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def _remember(self, key, entry):
+        """Add entry to the memory tier, evicting least recently used ones. Needs _lock."""
+        size = _entry_size(entry)
+        if size > MEMORY_CACHE_MAX_BYTES:
+            return
+        if key in self._memory:
+            self._memory_bytes -= _entry_size(self._memory.pop(key))
+        self._memory[key] = entry
+        self._memory_bytes += size
+        while self._memory_bytes > MEMORY_CACHE_MAX_BYTES:
+            _old_key, old_entry = self._memory.popitem(last=False)
+            self._memory_bytes -= _entry_size(old_entry)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_folder, f"{key}.bin")
+
+    def _disk_entries(self):
+        """Return (path, size, mtime) of every disk entry."""
+        folder = self.disk_folder
+        if not folder or not os.path.isdir(folder):
+            return []
+        entries = []
+        for name in os.listdir(folder):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _read_disk(self, key):
+        """Read an entry from the disk tier, or return None."""
+        if not self.disk_folder:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Reading counts as use for the size-cap eviction order
+            os.utime(path)
+        except OSError:
+            return None
+        if not data.startswith(DISK_MAGIC):
+            return None
+        pos = len(DISK_MAGIC)
+        total, count = _DISK_HEADER.unpack_from(data, pos)
+        pos += _DISK_HEADER.size
+        changed = []
+        for _ in range(count):
+            idx, length = _DISK_ENTRY.unpack_from(data, pos)
+            pos += _DISK_ENTRY.size
+            changed.append((idx, data[pos:pos + length] if length else None))
+            pos += length
+        return total, changed
+
+    def _write_disk(self, key, total, count, changed):
+        """Write an entry atomically, then evict the oldest entries above the size cap.
+
+        :param count: Number of (input index, WKB) rows in changed
+        """
+        os.makedirs(self.disk_folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(DISK_MAGIC)
+                f.write(_DISK_HEADER.pack(total, count))
+                for idx, wkb in changed:
+                    f.write(_DISK_ENTRY.pack(idx, len(wkb or b"")))
+                    f.write(wkb or b"")
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        used = sum(size for _path, size, _mtime in entries)
+        for path, size, _mtime in entries:
+            if used <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                used -= size
+            except OSError:
+                pass
+
+
+def _entry_size(entry):
+    return sum(len(wkb or b"") + 8 for _idx, wkb in entry[1])
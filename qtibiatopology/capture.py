@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Run captures: the exact input WKB, parameters and timings of a clean in
+ one binary file, so a run can be replayed away from the selection it
+ came from (see benchmarks/replay.py).
+"""
+import json
+import mmap
+import os
+import platform
+import struct
+import time
+from datetime import datetime, timezone
+
+from qgis.core import Qgis, QgsFeature
+
+from .utils import PROGRESS_INTERVAL, geometry_wkb, wkb_to_geom
+
+# File layout, little-endian:
+#   MAGIC, header length (uint32), header JSON (parameters, engine options)
+#   one record per input feature: WKB length (uint32, 0 for an empty geometry), WKB
+#   trailer JSON (outcome, seconds, profile)
+#   footer: trailer offset (uint64), trailer length (uint32), feature count (uint64), MAGIC
+# A capture whose run never ended (e.g. QGIS crashed) has no trailer and footer;
+# its records are still readable.
+MAGIC = b"QTCAPT01"
+_LENGTH = struct.Struct("<I")
+_FOOTER = struct.Struct("<QIQ8s")
+
+CAPTURE_SUFFIX = ".qtcap"
+
+# Engine attributes recorded with a capture; replay passes them back to the
+# engine constructor
+ENGINE_OPTIONS = ("use_copy", "partition_clusters", "partition_workers", "twkb_precision",
+                  "validity_probe", "simplify_tolerance", "time_budget")
+
+
+def engine_options(engine):
+    """Return the recorded options of engine as a dict."""
+    return {name: getattr(engine, name) for name in ENGINE_OPTIONS if hasattr(engine, name)}
+
+
+class CaptureWriter:
+    """Writes the capture of one run: input and parameters first, outcome last.
+
+    The input is written before the engine starts, so a run that hangs or
+    takes QGIS down still leaves a replayable file.
+    """
+
+    def __init__(self, path, gap_tolerance, snapping_distance, merge_strategy, engine, **meta):
+        """Constructor.
+
+        :param path: File to write, replaced if it exists
+        :param engine: CleaningEngine of the run, its name and options are recorded
+        :param meta: Extra header fields (kind of run, layer, ...)
+        """
+        self.path = path
+        self.header = dict(
+            meta,
+            created=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            gap_tolerance=gap_tolerance,
+            snapping_distance=snapping_distance,
+            merge_strategy=merge_strategy,
+            engine=engine.name,
+            result_variant=engine.result_variant,
+            engine_options=engine_options(engine),
+            qgis=Qgis.QGIS_VERSION,
+            python=platform.python_version(),
+        )
+        self.count = 0
+        self._file = None
+        self._start = None
+
+    def write_input(self, features, progress=None):
+        """Write the header and the WKB of every feature, in input order.
+
+        :param features: List of QgsFeature objects, or a SelectionStream
+        :param progress: Optional callable receiving the fraction of features written
+        """
+        total = len(features)
+        self.header["features"] = total
+        header = json.dumps(self.header).encode("utf-8")
+        self._file = open(self.path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(_LENGTH.pack(len(header)))
+        self._file.write(header)
+        for idx, feature in enumerate(features):
+            if progress is not None and idx % PROGRESS_INTERVAL == 0:
+                progress(idx / total)
+            wkb = geometry_wkb(feature.geometry()) or b""
+            self._file.write(_LENGTH.pack(len(wkb)))
+            self._file.write(wkb)
+            self.count += 1
+        self._file.flush()
+        self._start = time.perf_counter()
+
+    def finish(self, result=None, error=None, profile=None, canceled=False):
+        """Append the outcome of the run and close the file.
+
+        :param result: CleaningResult of the run, None if it failed
+        :param error: Error message of a failed run
+        :param profile: RunProfile of the run; its summary is stored when enabled
+        :param canceled: The run failed because it was canceled
+        """
+        if canceled:
+            outcome = "canceled"
+        else:
+            outcome = "failed" if error is not None else "finished"
+        trailer = {
+            "outcome": outcome,
+            "seconds": round(time.perf_counter() - self._start, 6),
+        }
+        if error is not None:
+            trailer["error"] = error
+        if result is not None:
+            trailer["changed"] = len(result.changed)
+            trailer["total"] = result.total
+        if profile is not None and profile.enabled:
+            trailer["profile"] = profile.summary()
+        data = json.dumps(trailer, default=str).encode("utf-8")
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.write(_FOOTER.pack(offset, len(data), self.count, MAGIC))
+        self.close()
+
+    def close(self):
+        """Close the file; an unfinished capture keeps its records without a trailer."""
+        if self._file is not None:
+            self._file.close()
+
+
+class CaptureFile:
+    """A capture opened for replay, read through mmap.
+
+    Has a length and yields QgsFeature objects with the captured
+    geometries, so it can be handed to an engine like a selection.
+    Geometries are decoded from the mapped file one at a time.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a coverage cleaning capture")
+        pos = len(MAGIC)
+        (length,) = _LENGTH.unpack_from(self._map, pos)
+        pos += _LENGTH.size
+        self.header = json.loads(self._map[pos:pos + length])
+        self._records = pos + length
+        self.trailer = None
+
+        footer = len(self._map) - _FOOTER.size
+        if footer >= self._records and self._map[-len(MAGIC):] == MAGIC:
+            offset, length, self._count, _magic = _FOOTER.unpack_from(self._map, footer)
+            self.trailer = json.loads(self._map[offset:offset + length])
+            self._end = offset
+        else:
+            # Unfinished capture: count the complete records
+            self._end = len(self._map)
+            self._count = sum(1 for _ in self.wkb_items())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def wkb_items(self):
+        """Yield (input index, WKB) for every captured feature, None for an empty geometry."""
+        pos = self._records
+        idx = 0
+        while pos + _LENGTH.size <= self._end:
+            (length,) = _LENGTH.unpack_from(self._map, pos)
+            pos += _LENGTH.size
+            if pos + length > self._end:
+                break
+            yield idx, self._map[pos:pos + length] if length else None
+            pos += length
+            idx += 1
+
+    def __iter__(self):
+        for idx, wkb in self.wkb_items():
+            feature = QgsFeature(idx)
+            feature.setGeometry(wkb_to_geom(wkb))
+            yield feature
+
+
+def capture_path(folder, kind, layer):
+    """Return a new capture file name in folder for a run of kind on layer."""
+    stem = "".join(c if c.isalnum() or c in "-_" else "_"
+                   for c in f"{datetime.now():%Y%m%d-%H%M%S}-{kind}-{layer}")
+    path = os.path.join(folder, stem + CAPTURE_SUFFIX)
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(folder, f"{stem}-{suffix}{CAPTURE_SUFFIX}")
+    return path
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Planning of partitioned cleans: spatial clusters are grouped into jobs
+ and the jobs spread over the cleaning connections. Pure Python, so the
+ plans can be tested outside QGIS.
+"""
+
+# Small clusters are cleaned together until a job holds this many features,
+# so thousands of isolated polygons don't cost one round trip each.
+PARTITION_BATCH_FEATURES = 500
+
+
+def plan_cluster_jobs(clusters):
+    """Group clusters into cleaning jobs.
+
+    Clusters of at least PARTITION_BATCH_FEATURES features get a job of their
+    own, smaller ones are batched together.
+
+    :param clusters: List of (cluster_id, size) tuples, largest first
+    :return: List of (list of cluster ids, feature count) tuples
+    """
+    jobs = []
+    pending = []
+    pending_size = 0
+    for cluster_id, size in clusters:
+        if size >= PARTITION_BATCH_FEATURES:
+            jobs.append(([cluster_id], size))
+            continue
+        pending.append(cluster_id)
+        pending_size += size
+        if pending_size >= PARTITION_BATCH_FEATURES:
+            jobs.append((pending, pending_size))
+            pending = []
+            pending_size = 0
+    if pending:
+        jobs.append((pending, pending_size))
+    return jobs
+
+
+def distribute_jobs(jobs, workers):
+    """Spread jobs over workers, largest first, each to the least loaded worker.
+
+    :return: List of job lists, one per worker
+    """
+    buckets = [[] for _ in range(workers)]
+    loads = [0] * workers
+    for job in sorted(jobs, key=lambda job: job[1], reverse=True):
+        target = loads.index(min(loads))
+        buckets[target].append(job)
+        loads[target] += job[1]
+    return buckets
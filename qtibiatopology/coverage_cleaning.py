@@ -21,165 +21,329 @@
 """
 from PyQt5.QtCore import QSettings, QTranslator, qVersion, QCoreApplication
 from PyQt5.QtGui import QIcon
-from PyQt5.QtWidgets import (QAction, QInputDialog, QMessageBox, QDialog,
-                              QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-                              QDoubleSpinBox, QComboBox, QCheckBox, QPushButton,
-                              QGroupBox, QFormLayout)
+from PyQt5.QtWidgets import (QAction, QMessageBox, QLabel, QDoubleSpinBox, QComboBox,
+                             QFileDialog)
+import json
 import os.path
-
-from qgis.core import (QgsProject, QgsFeature, QgsGeometry, Qgis,
-                       QgsWkbTypes, QgsVectorLayer, QgsMessageLog)
-try:
-    import psycopg
-except ImportError:
-    import pip
-    pip.main(["install", "psycopg[binary]"])
-    import psycopg
-
-
-def log_message(message, level=Qgis.Info, verbose=True):
-    """Log message to QGIS log panel and Python console."""
-    # Set verbose=False in production for better performance
-    if verbose:
-        QgsMessageLog.logMessage(message, 'Coverage Cleaning', level)
-        print(f"[Coverage Cleaning] {message}")
-
-
-def ewkb_to_geom(ewkb_str):
-    """Convert EWKB hex string from PostGIS to QgsGeometry."""
-    if ewkb_str is None:
-        return QgsGeometry()
-    # get type + flags
-    header = ewkb_str[2:10]
-    has_srid = int(header[6], 16) & 2 > 0
-    if has_srid:
-        # remove srid flag
-        header = header[:6] + "%X" % (int(header[6], 16) ^ 2) + header[7]
-        # remove srid
-        ewkb_str = ewkb_str[:2] + header + ewkb_str[18:]
-    w = bytes.fromhex(ewkb_str)
-    g = QgsGeometry()
-    g.fromWkb(w)
-    return g
-
-
-class CoverageCleaningSettingsDialog(QDialog):
-    """Settings dialog for Coverage Cleaning plugin."""
-
-    def __init__(self, plugin, parent=None):
-        super().__init__(parent)
+import threading
+from contextlib import contextmanager
+
+from qgis.core import (QgsProject, Qgis, QgsWkbTypes, QgsVectorLayer,
+                       QgsApplication, QgsTask, QgsVectorLayerFeatureSource,
+                       QgsFeatureRequest)
+
+from .cache import ResultCache, input_digest, run_key
+from .dirty_tracking import DirtyTracker, dirty_neighbourhood
+from .engines import (ENGINE_AUTO, ENGINE_GEOS, CleaningResult, choose_engine,
+                      postgis_available)
+from .layer_edits import apply_geometry_changes, supports_direct_writes
+from .profiling import DISABLED_PROFILE, RunProfile, profile_of
+from .streaming import MultiLayerSelection, SelectionStream, feature_ids
+from .processing_provider import CoverageCleaningProvider
+from .tiling import CheckpointStore, TiledCleaner
+from .utils import CleaningCanceled, log_message, report_stage, stage_percent, wkb_to_geom
+
+# psycopg, shapely, the database code and the dialogs are imported where they
+# are first used, so loading the plugin at QGIS startup stays cheap.
+
+
+class CoverageCleaningTask(QgsTask):
+    """Background task running the cleaning engine for one layer.
+
+    run() executes on a worker thread and must not touch the layer;
+    finished() runs on the main thread and hands the changed geometries to
+    CoverageCleaningPlugin.on_task_finished(), which writes them to the layer.
+    features is a list of QgsFeature or a SelectionStream read in chunks.
+    Subclasses override handle_finished() instead of finished(), which also
+    reports the run profile.
+    """
+
+    # Kind of run recorded in the run profile
+    PROFILE_KIND = "selection"
+    # Simplify the result when the simplify tolerance is set. Runs that drop
+    # part of their results can't: kept polygons would lose the matching
+    # vertices of the dropped ones.
+    SIMPLIFY = True
+
+    def __init__(self, plugin, layer, features, gap_tolerance, snapping_distance, merge_strategy):
+        super().__init__(f"Clean coverage: {layer.name()}", QgsTask.CanCancel)
         self.plugin = plugin
-        self.setWindowTitle("Coverage Cleaning - Settings")
-        self.setMinimumWidth(500)
-        self.setup_ui()
-        self.load_settings()
-
-    def setup_ui(self):
-        """Setup the user interface."""
-        layout = QVBoxLayout()
-
-        # Database settings group
-        db_group = QGroupBox("Database Connection")
-        db_layout = QFormLayout()
-
-        self.pg_service_edit = QLineEdit()
-        self.pg_service_edit.setPlaceholderText("cadastru_999")
-        db_layout.addRow("pg_service:", self.pg_service_edit)
-
-        db_group.setLayout(db_layout)
-        layout.addWidget(db_group)
-
-        # Cleaning parameters group
-        params_group = QGroupBox("Cleaning Parameters")
-        params_layout = QFormLayout()
-
-        self.gap_tolerance_spin = QDoubleSpinBox()
-        self.gap_tolerance_spin.setDecimals(4)
-        self.gap_tolerance_spin.setRange(0.0, 1000000.0)
-        self.gap_tolerance_spin.setSingleStep(0.01)
-        self.gap_tolerance_spin.setSuffix(" map units")
-        params_layout.addRow("Gap Maximum Width:", self.gap_tolerance_spin)
-
-        self.snapping_distance_spin = QDoubleSpinBox()
-        self.snapping_distance_spin.setDecimals(4)
-        self.snapping_distance_spin.setRange(-1.0, 1000000.0)
-        self.snapping_distance_spin.setSingleStep(0.01)
-        self.snapping_distance_spin.setSuffix(" (-1=auto, 0=disabled)")
-        params_layout.addRow("Snapping Distance:", self.snapping_distance_spin)
-
-        self.merge_strategy_combo = QComboBox()
-        self.merge_strategy_combo.addItems([
-            "MERGE_LONGEST_BORDER - Longest common border (recommended)",
-            "MERGE_MAX_AREA - Maximum area",
-            "MERGE_MIN_AREA - Minimum area",
-            "MERGE_MIN_INDEX - Smallest input index"
-        ])
-        params_layout.addRow("Overlap Merge Strategy:", self.merge_strategy_combo)
+        self.layer_id = layer.id()
+        self.layer_name = layer.name()
+        # Every layer the run writes to, checked before queuing another run
+        self.layer_ids = [self.layer_id]
+        self.features = features
+        self.gap_tolerance = gap_tolerance
+        self.snapping_distance = snapping_distance
+        self.merge_strategy = merge_strategy
+        self.cleaned = None
+        self.error = None
+        self.profile = plugin.new_profile(
+            self.PROFILE_KIND, layer=self.layer_name, features=len(features),
+            gap_tolerance=gap_tolerance, snapping_distance=snapping_distance,
+            merge_strategy=merge_strategy)
+        self._cancel_callbacks = set()
+        self._cancel_lock = threading.Lock()
+
+    def run(self):
+        """Clean the coverage on the worker thread."""
+        try:
+            self.cleaned = self.plugin.clean_coverage(
+                self.features, self.gap_tolerance, self.snapping_distance,
+                self.merge_strategy, task=self, simplify=self.SIMPLIFY)
+            return True
+        except Exception as e:
+            if not self.isCanceled():
+                self.error = str(e)
+            return False
+
+    def finished(self, result):
+        """Apply the results on the main thread, then report the run profile."""
+        try:
+            self.handle_finished(result)
+        finally:
+            self.plugin.report_profile(self)
+
+    def handle_finished(self, result):
+        """Apply the results on the main thread."""
+        self.plugin.on_task_finished(self, result)
+
+    def cancel(self):
+        """Cancel the task and any query it is running on the server."""
+        with self._cancel_lock:
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                log_message(f"Canceling a running query failed: {e}", Qgis.Warning)
+        super().cancel()
+
+    @contextmanager
+    def cancel_hook(self, callback):
+        """Call callback (e.g. conn.cancel) if the task is canceled within a with block."""
+        with self._cancel_lock:
+            self._cancel_callbacks.add(callback)
+        try:
+            yield
+        finally:
+            with self._cancel_lock:
+                self._cancel_callbacks.discard(callback)
+
+    def set_stage(self, stage, fraction=0.0):
+        """Report progress within a pipeline stage and stop if canceled.
+
+        :param stage: One of the STAGE_PROGRESS stage names
+        :param fraction: Completed part of the stage, 0.0 to 1.0
+        """
+        if self.isCanceled():
+            raise CleaningCanceled()
+        self.profile.stage(stage)
+        self.setProgress(stage_percent(stage, fraction))
+
+
+class TiledCleaningTask(CoverageCleaningTask):
+    """Background task cleaning a whole layer tile by tile.
+
+    Features are read from a QgsVectorLayerFeatureSource snapshot, so the
+    worker thread never touches the layer. Progress and changed geometries
+    are checkpointed after every tile; canceling keeps the checkpoint so the
+    next run resumes where this one stopped.
+    """
+
+    PROFILE_KIND = "whole-layer"
+
+    def __init__(self, plugin, layer, checkpoint_path, gap_tolerance, snapping_distance,
+                 merge_strategy, tile_features):
+        super().__init__(plugin, layer, [], gap_tolerance, snapping_distance, merge_strategy)
+        self.setDescription(f"Clean entire layer: {layer.name()}")
+        self.source = QgsVectorLayerFeatureSource(layer)
+        self.extent = layer.extent()
+        self.feature_count = layer.featureCount()
+        self.profile.annotate(features=self.feature_count, tile_features=tile_features)
+        self.checkpoint_path = checkpoint_path
+        self.tile_features = tile_features
+        self.summary = None
+        self.tile_position = 0
+        self.tile_total = 1
+
+    def run(self):
+        """Clean all tiles on the worker thread."""
+        try:
+            # Tile halos are discarded, so tiles are never simplified
+            engine = self.plugin.create_engine(self.tile_features, simplify=False)
+            store = CheckpointStore(self.checkpoint_path)
+            try:
+                cleaner = TiledCleaner(
+                    engine, self.source, self.extent, self.feature_count, store,
+                    self.gap_tolerance, self.snapping_distance, self.merge_strategy,
+                    self.tile_features, task=self, verbose=self.plugin.verbose_logging)
+                self.summary = cleaner.run()
+            finally:
+                store.close()
+            return True
+        except Exception as e:
+            if not self.isCanceled():
+                self.error = str(e)
+            return False
+
+    def handle_finished(self, result):
+        """Apply the checkpointed changes on the main thread."""
+        self.plugin.on_tiled_task_finished(self, result)
+
+    def start_tile(self, position, total):
+        """Move the progress bar to the start of tile position out of total."""
+        if self.isCanceled():
+            raise CleaningCanceled()
+        self.tile_position = position
+        self.tile_total = total
+        self.profile.count("tiles")
+        self.setProgress(100.0 * position / total)
+
+    def set_stage(self, stage, fraction=0.0):
+        """Report engine stages as progress within the current tile."""
+        if self.isCanceled():
+            raise CleaningCanceled()
+        self.profile.stage(stage)
+        within = stage_percent(stage, fraction) / 100.0
+        self.setProgress(100.0 * (self.tile_position + within) / self.tile_total)
+
+
+class InDatabaseCleaningTask(CoverageCleaningTask):
+    """Background task cleaning selected rows of a PostGIS layer where they are stored.
+
+    Only primary keys go to the server. finished() hands the changed
+    geometries (or, with direct writeback, the updated keys) to
+    CoverageCleaningPlugin.on_in_database_task_finished().
+    """
+
+    PROFILE_KIND = "in-database"
+
+    def __init__(self, plugin, layer, table, fids_by_key, gap_tolerance, snapping_distance,
+                 merge_strategy, writeback=False):
+        super().__init__(plugin, layer, [], gap_tolerance, snapping_distance, merge_strategy)
+        self.setDescription(f"Clean coverage in database: {layer.name()}")
+        self.table = table
+        self.fids_by_key = fids_by_key
+        self.writeback = writeback
+        self.profile.annotate(features=len(fids_by_key), table=str(table), writeback=writeback)
+        self.changed = None
+        # Set when the table turns out not to be in the pg_service database
+        self.fallback = False
 
-        params_group.setLayout(params_layout)
-        layout.addWidget(params_group)
+    def run(self):
+        """Clean the rows on the server from the worker thread."""
+        from .postgis_engine import NotOnCleaningDatabase
+        try:
+            engine = self.plugin.create_postgis_engine()
+            self.changed = engine.clean_in_database(
+                self.table, list(self.fids_by_key), self.gap_tolerance,
+                self.snapping_distance, self.merge_strategy, self.writeback, task=self)
+            return True
+        except NotOnCleaningDatabase as e:
+            log_message(f"{e}, uploading the selection instead")
+            self.fallback = True
+            return False
+        except Exception as e:
+            if not self.isCanceled():
+                self.error = str(e)
+            return False
 
-        # Performance settings group
-        perf_group = QGroupBox("Performance")
-        perf_layout = QVBoxLayout()
+    def handle_finished(self, result):
+        """Apply the changed geometries on the main thread."""
+        self.plugin.on_in_database_task_finished(self, result)
 
-        self.verbose_logging_check = QCheckBox("Enable verbose logging (slower but detailed)")
-        perf_layout.addWidget(self.verbose_logging_check)
 
-        perf_group.setLayout(perf_layout)
-        layout.addWidget(perf_group)
+class DirtyCleaningTask(CoverageCleaningTask):
+    """Background task re-cleaning the neighbourhood of edited features.
 
-        # Buttons
-        button_layout = QHBoxLayout()
-        save_button = QPushButton("Save")
-        save_button.clicked.connect(self.save_and_close)
-        cancel_button = QPushButton("Cancel")
-        cancel_button.clicked.connect(self.reject)
+    The first core_count features are the edited ones and their
+    neighbours; the rest are a halo whose results are discarded.
+    """
 
-        button_layout.addStretch()
-        button_layout.addWidget(save_button)
-        button_layout.addWidget(cancel_button)
+    PROFILE_KIND = "dirty"
+    SIMPLIFY = False
 
-        layout.addLayout(button_layout)
-        self.setLayout(layout)
+    def __init__(self, plugin, layer, core, halo, marks, gap_tolerance, snapping_distance,
+                 merge_strategy):
+        super().__init__(plugin, layer, core + halo, gap_tolerance, snapping_distance,
+                         merge_strategy)
+        self.setDescription(f"Re-clean edited features: {layer.name()}")
+        self.core_count = len(core)
+        # Dirty marks this run covers, cleared once its results are applied
+        self.marks = marks
+        self.profile.annotate(edited=len(marks), core=len(core), halo=len(halo))
 
-    def load_settings(self):
-        """Load settings from plugin."""
-        self.pg_service_edit.setText(self.plugin.pg_service)
-        self.gap_tolerance_spin.setValue(self.plugin.gap_tolerance)
-        self.snapping_distance_spin.setValue(self.plugin.snapping_distance)
+    def core_result(self):
+        """Return the CleaningResult restricted to the core features."""
+        return CleaningResult([(idx, geom) for idx, geom in self.cleaned.changed
+                               if idx < self.core_count], self.core_count)
+
+    def handle_finished(self, result):
+        """Apply the core results on the main thread."""
+        self.plugin.on_dirty_task_finished(self, result)
 
-        # Set merge strategy combo
-        strategies = ["MERGE_LONGEST_BORDER", "MERGE_MAX_AREA", "MERGE_MIN_AREA", "MERGE_MIN_INDEX"]
-        if self.plugin.merge_strategy in strategies:
-            self.merge_strategy_combo.setCurrentIndex(strategies.index(self.plugin.merge_strategy))
 
-        self.verbose_logging_check.setChecked(self.plugin.verbose_logging)
+class MultiLayerCleaningTask(CoverageCleaningTask):
+    """Background task cleaning the selections of several layers as one coverage.
 
-    def save_and_close(self):
-        """Save settings to plugin and close dialog."""
-        self.plugin.pg_service = self.pg_service_edit.text()
-        self.plugin.gap_tolerance = self.gap_tolerance_spin.value()
-        self.plugin.snapping_distance = self.snapping_distance_spin.value()
+    features is a MultiLayerSelection; finished() hands the result to
+    CoverageCleaningPlugin.on_multi_layer_task_finished(), which sends
+    every changed geometry back to the layer it came from.
+    """
 
-        # Extract strategy key from combo text
-        strategy_text = self.merge_strategy_combo.currentText()
-        self.plugin.merge_strategy = strategy_text.split(" - ")[0]
+    PROFILE_KIND = "multi-layer"
 
-        self.plugin.verbose_logging = self.verbose_logging_check.isChecked()
+    def __init__(self, plugin, layers, selection, gap_tolerance, snapping_distance,
+                 merge_strategy):
+        super().__init__(plugin, layers[0], selection, gap_tolerance, snapping_distance,
+                         merge_strategy)
+        self.layer_ids = list(selection.layer_ids)
+        self.layer_name = ", ".join(selection.layer_names)
+        self.setDescription(f"Clean coverage across {len(layers)} layers")
+        self.profile.annotate(layer=self.layer_name, layers=len(layers))
 
-        # Save to QSettings for persistence
-        self.plugin.save_settings()
+    def handle_finished(self, result):
+        """Apply the results to every layer on the main thread."""
+        self.plugin.on_multi_layer_task_finished(self, result)
 
-        # Update toolbar widgets
-        self.plugin.gap_tolerance_widget.setValue(self.plugin.gap_tolerance)
-        self.plugin.snapping_distance_widget.setValue(self.plugin.snapping_distance)
 
-        # Update merge strategy combo
-        short_name = self.plugin.merge_strategy.replace("MERGE_", "")
-        self.plugin.merge_strategy_widget.setCurrentText(short_name)
+class SweepTask(CoverageCleaningTask):
+    """Background task cleaning one selection with several parameter combinations.
+
+    finished() hands the SweepResult list to
+    CoverageCleaningPlugin.on_sweep_task_finished(), which shows the
+    comparison and applies the chosen result.
+    """
+
+    PROFILE_KIND = "sweep"
+
+    def __init__(self, plugin, layer, features, combinations):
+        super().__init__(plugin, layer, features, *combinations[0])
+        self.setDescription(f"Parameter sweep: {layer.name()}")
+        self.combinations = combinations
+        self.sweeps = None
+        self.profile.annotate(combinations=len(combinations))
+
+    def run(self):
+        """Run every combination on the worker thread."""
+        try:
+            from .sweep import cache_sweep_results
+            engine = self.plugin.create_engine(len(self.features), simplify=False)
+            log_message(f"Sweeping {len(self.combinations)} combinations over "
+                        f"{len(self.features)} features with the {engine.label} engine")
+            self.sweeps = engine.sweep(self.features, self.combinations, task=self)
+            cache_sweep_results(self.plugin.result_cache, self.features, self.sweeps,
+                                engine.sweep_variant)
+            return True
+        except Exception as e:
+            if not self.isCanceled():
+                self.error = str(e)
+            return False
 
-        self.accept()
+    def handle_finished(self, result):
+        """Show the comparison on the main thread."""
+        self.plugin.on_sweep_task_finished(self, result)
 
 
 class CoverageCleaningPlugin:
@@ -196,11 +360,12 @@ class CoverageCleaningPlugin:
         # Save reference to the QGIS interface
         self.iface = iface
         # Store reference to the map canvas
-        self.canvas = self.iface.mapCanvas()
+        # No interface (and no canvas) when loaded by qgis_process for Processing only
+        self.canvas = self.iface.mapCanvas() if self.iface is not None else None
         # initialize plugin directory
         self.plugin_dir = os.path.dirname(__file__)
         # initialize locale
-        locale = QSettings().value('locale/userLocale')[0:2]
+        locale = (QSettings().value('locale/userLocale') or 'en')[0:2]
         locale_path = os.path.join(
             self.plugin_dir,
             'i18n',
@@ -219,7 +384,38 @@ class CoverageCleaningPlugin:
         self.gap_tolerance = float(self.settings.value("gap_tolerance", 0.01))
         self.snapping_distance = float(self.settings.value("snapping_distance", -1))
         self.merge_strategy = self.settings.value("merge_strategy", "MERGE_LONGEST_BORDER")
+        self.engine = self.settings.value("engine", ENGINE_AUTO)
+        self.in_database = self.settings.value("in_database", True, type=bool)
+        self.in_database_writeback = self.settings.value("in_database_writeback", False, type=bool)
+        self.direct_apply = self.settings.value("direct_apply", False, type=bool)
+        self.transfer_precision = self.settings.value("transfer_precision", -1, type=int)
+        self.validity_probe = self.settings.value("validity_probe", True, type=bool)
+        self.simplify_tolerance = float(self.settings.value("simplify_tolerance", 0.0))
+        self.time_budget = self.settings.value("time_budget", 0, type=int)
+        self.diagnostics = self.settings.value("diagnostics", False, type=bool)
+        self.capture_runs = self.settings.value("capture_runs", False, type=bool)
         self.verbose_logging = self.settings.value("verbose_logging", False, type=bool)
+        self.profiling = self.settings.value("profiling", False, type=bool)
+        self.use_copy = self.settings.value("use_copy", True, type=bool)
+        self.partition_clusters = self.settings.value("partition_clusters", False, type=bool)
+        self.partition_workers = self.settings.value("partition_workers", 1, type=int)
+        self.tile_features = self.settings.value("tile_features", 5000, type=int)
+        self.result_cache_enabled = self.settings.value("result_cache", True, type=bool)
+        self.disk_cache = self.settings.value("disk_cache", False, type=bool)
+        self.disk_cache_mb = self.settings.value("disk_cache_mb", 256, type=int)
+
+        # Database session pools keyed by pg_service, created with the first PostGIS run
+        self._session_pools = None
+        self._session_pools_lock = threading.Lock()
+        # Background cleaning tasks still running, kept referenced until finished
+        self.tasks = []
+        # Run profile of the last finished run, when profiling is on
+        self.last_profile = None
+        # Results of earlier runs keyed by input and parameters
+        self.result_cache = ResultCache()
+        self.configure_cache()
+        # Processing provider, registered by initProcessing()
+        self.provider = None
 
     def tr(self, message):
         """Get the translation for a string using Qt translation API.
@@ -237,17 +433,122 @@ class CoverageCleaningPlugin:
         self.settings.setValue("gap_tolerance", self.gap_tolerance)
         self.settings.setValue("snapping_distance", self.snapping_distance)
         self.settings.setValue("merge_strategy", self.merge_strategy)
+        self.settings.setValue("engine", self.engine)
+        self.settings.setValue("in_database", self.in_database)
+        self.settings.setValue("in_database_writeback", self.in_database_writeback)
+        self.settings.setValue("direct_apply", self.direct_apply)
+        self.settings.setValue("transfer_precision", self.transfer_precision)
+        self.settings.setValue("validity_probe", self.validity_probe)
+        self.settings.setValue("simplify_tolerance", self.simplify_tolerance)
+        self.settings.setValue("time_budget", self.time_budget)
+        self.settings.setValue("diagnostics", self.diagnostics)
+        self.settings.setValue("capture_runs", self.capture_runs)
         self.settings.setValue("verbose_logging", self.verbose_logging)
+        self.settings.setValue("profiling", self.profiling)
+        self.settings.setValue("use_copy", self.use_copy)
+        self.settings.setValue("partition_clusters", self.partition_clusters)
+        self.settings.setValue("partition_workers", self.partition_workers)
+        self.settings.setValue("tile_features", self.tile_features)
+        self.settings.setValue("result_cache", self.result_cache_enabled)
+        self.settings.setValue("disk_cache", self.disk_cache)
+        self.settings.setValue("disk_cache_mb", self.disk_cache_mb)
+        self.configure_cache()
         log_message("Settings saved")
 
+    def new_profile(self, kind, **meta):
+        """Return a RunProfile for a new run, or the no-op profile when profiling is off.
+
+        Server diagnostics need the profile to carry their report, so they turn it on too.
+        """
+        if not (self.profiling or self.diagnostics):
+            return DISABLED_PROFILE
+        return RunProfile(kind, **meta)
+
+    def report_profile(self, task):
+        """Close the run profile of a finished task and log it as one line of JSON."""
+        profile = task.profile
+        if not profile.enabled:
+            return
+        profile.finish()
+        if task.isCanceled():
+            outcome = "canceled"
+        elif task.error:
+            outcome = "failed"
+        else:
+            outcome = "finished"
+        profile.annotate(outcome=outcome)
+        self.last_profile = profile
+        log_message(f"Run profile: {profile.to_json()}")
+        if profile.details:
+            self.save_run_report(profile)
+
+    def save_run_report(self, profile):
+        """Write the profile with its details (server plans, ...) to the diagnostics folder."""
+        name = "".join(c if c.isalnum() or c in "-_" else "_"
+                       for c in f"{profile.started:%Y%m%d-%H%M%S}-{profile.kind}-"
+                                f"{profile.meta.get('layer', '')}")
+        path = os.path.join(self.profile_folder("diagnostics"), f"{name}.json")
+        with open(path, "w") as f:
+            json.dump(profile.report(), f, indent=2, default=str)
+        log_message(f"Run report with server diagnostics saved to {path}")
+
+    def export_last_profile(self):
+        """Save the profile of the last run to a JSON file chosen by the user."""
+        if self.last_profile is None:
+            self.iface.messageBar().pushMessage(
+                "Info", "No run profile recorded yet; enable stage timings in the settings",
+                Qgis.Info, duration=3)
+            return
+        path, _filter = QFileDialog.getSaveFileName(
+            self.iface.mainWindow(), "Export Run Profile", "coverage-cleaning-profile.json",
+            "JSON files (*.json)")
+        if not path:
+            return
+        with open(path, "w") as f:
+            json.dump(self.last_profile.report(), f, indent=2, default=str)
+        log_message(f"Run profile exported to {path}")
+
+    def configure_cache(self):
+        """Apply the result cache settings."""
+        self.result_cache.configure(
+            self.result_cache_enabled,
+            self.profile_folder("cache") if self.disk_cache else None,
+            self.disk_cache_mb * 1024 * 1024)
+
+    def clear_result_cache(self):
+        """Drop all cached results, in memory and on disk."""
+        removed = self.result_cache.clear()
+        log_message(f"Result cache cleared ({removed} files removed from disk)")
+        self.iface.messageBar().pushMessage(
+            "Info", "Coverage cleaning result cache cleared", Qgis.Info, duration=3)
+
+    @property
+    def session_pools(self):
+        """SessionPoolRegistry of the plugin; importing it loads psycopg, so it waits for a PostGIS run."""
+        with self._session_pools_lock:
+            if self._session_pools is None:
+                from .postgis_engine import SessionPoolRegistry
+                self._session_pools = SessionPoolRegistry()
+            return self._session_pools
+
     def show_settings_dialog(self):
         """Show the settings dialog."""
+        from .settings_dialog import CoverageCleaningSettingsDialog
         dialog = CoverageCleaningSettingsDialog(self, self.iface.mainWindow())
         dialog.exec_()
 
+    def initProcessing(self):
+        """Register the Processing provider; qgis_process calls this without initGui()."""
+        if self.provider is not None:
+            return
+        self.provider = CoverageCleaningProvider(self)
+        QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
 
+        self.initProcessing()
+
         # Set up icon
         icon_path = os.path.join(self.plugin_dir, 'icon.svg')
         icon = QIcon(icon_path) if os.path.exists(icon_path) else QIcon()
@@ -264,6 +565,42 @@ class CoverageCleaningPlugin:
         self.action.triggered.connect(self.run)
         self.toolbar.addAction(self.action)
 
+        # Whole layer action - tiled clean of every feature
+        self.layer_action = QAction(
+            'Clean Entire Layer',
+            self.iface.mainWindow())
+        self.layer_action.setToolTip("Clean every feature of the active layer tile by tile "
+                                     "(resumes an interrupted run)")
+        self.layer_action.triggered.connect(self.run_whole_layer)
+        self.toolbar.addAction(self.layer_action)
+
+        # Incremental action - clean only around features edited since the last clean
+        self.dirty_action = QAction(
+            'Re-clean Edited Features',
+            self.iface.mainWindow())
+        self.dirty_action.setToolTip("Clean the features of the active layer edited since they "
+                                     "were last cleaned, together with their neighbours")
+        self.dirty_action.triggered.connect(self.run_dirty)
+        self.toolbar.addAction(self.dirty_action)
+
+        # Multi-layer action - clean the selections of the chosen layers as one coverage
+        self.multi_layer_action = QAction(
+            'Clean Selections Across Layers',
+            self.iface.mainWindow())
+        self.multi_layer_action.setToolTip("Clean the selected features of the polygon layers "
+                                           "chosen in the Layers panel as one coverage")
+        self.multi_layer_action.triggered.connect(self.run_multi_layer)
+        self.toolbar.addAction(self.multi_layer_action)
+
+        # Sweep action - compare several parameter combinations on the selection
+        self.sweep_action = QAction(
+            'Parameter Sweep',
+            self.iface.mainWindow())
+        self.sweep_action.setToolTip("Clean the selection with several tolerance/snapping/strategy "
+                                     "combinations and apply the one you choose")
+        self.sweep_action.triggered.connect(self.run_sweep)
+        self.toolbar.addAction(self.sweep_action)
+
         self.toolbar.addSeparator()
 
         # Gap Tolerance control
@@ -309,6 +646,19 @@ class CoverageCleaningPlugin:
         self.merge_strategy_widget.currentTextChanged.connect(self.on_merge_strategy_changed)
         self.toolbar.addWidget(self.merge_strategy_widget)
 
+        # Simplify Tolerance control
+        self.toolbar.addWidget(QLabel(" Simplify: "))
+        self.simplify_tolerance_widget = QDoubleSpinBox()
+        self.simplify_tolerance_widget.setDecimals(4)
+        self.simplify_tolerance_widget.setRange(0.0, 1000.0)
+        self.simplify_tolerance_widget.setSingleStep(0.01)
+        self.simplify_tolerance_widget.setSpecialValueText("off")
+        self.simplify_tolerance_widget.setValue(self.simplify_tolerance)
+        self.simplify_tolerance_widget.setToolTip("Coverage Simplify Tolerance (map units, 0=off)")
+        self.simplify_tolerance_widget.setMaximumWidth(100)
+        self.simplify_tolerance_widget.valueChanged.connect(self.on_simplify_tolerance_changed)
+        self.toolbar.addWidget(self.simplify_tolerance_widget)
+
         # Settings action (for pg_service and verbose logging)
         self.toolbar.addSeparator()
         self.settings_action = QAction(
@@ -320,8 +670,30 @@ class CoverageCleaningPlugin:
 
         # Add to Vector menu
         self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.action)
+        self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.layer_action)
+        self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.dirty_action)
+        self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.multi_layer_action)
+        self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.sweep_action)
         self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.settings_action)
 
+        # Follow edits of polygon layers for "Re-clean Edited Features"
+        self.dirty_tracker = DirtyTracker(QgsProject.instance())
+        self.dirty_tracker.start()
+
+        # Menu only - drop cached results
+        self.clear_cache_action = QAction(
+            'Clear Result Cache',
+            self.iface.mainWindow())
+        self.clear_cache_action.triggered.connect(self.clear_result_cache)
+        self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.clear_cache_action)
+
+        # Menu only - save the stage timings of the last run
+        self.export_profile_action = QAction(
+            'Export Last Run Profile...',
+            self.iface.mainWindow())
+        self.export_profile_action.triggered.connect(self.export_last_profile)
+        self.iface.addPluginToVectorMenu('&QTIBIA Topology', self.export_profile_action)
+
     def on_gap_tolerance_changed(self, value):
         """Handle gap tolerance change from toolbar."""
         self.gap_tolerance = value
@@ -340,22 +712,52 @@ class CoverageCleaningPlugin:
         self.save_settings()
         log_message(f"Merge strategy changed to: {self.merge_strategy}")
 
+    def on_simplify_tolerance_changed(self, value):
+        """Handle simplify tolerance change from toolbar."""
+        self.simplify_tolerance = value
+        self.save_settings()
+        log_message(f"Simplify tolerance changed to: {value}")
+
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
         self.iface.removePluginVectorMenu('&QTIBIA Topology', self.action)
+        self.iface.removePluginVectorMenu('&QTIBIA Topology', self.layer_action)
+        self.iface.removePluginVectorMenu('&QTIBIA Topology', self.dirty_action)
+        self.iface.removePluginVectorMenu('&QTIBIA Topology', self.multi_layer_action)
+        self.iface.removePluginVectorMenu('&QTIBIA Topology', self.sweep_action)
         self.iface.removePluginVectorMenu('&QTIBIA Topology', self.settings_action)
+        self.iface.removePluginVectorMenu('&QTIBIA Topology', self.clear_cache_action)
+        self.iface.removePluginVectorMenu('&QTIBIA Topology', self.export_profile_action)
 
         # Remove toolbar
         del self.toolbar
 
         del self.action
+        del self.layer_action
+        del self.dirty_action
+        del self.multi_layer_action
+        del self.sweep_action
         del self.settings_action
+        del self.clear_cache_action
+        del self.export_profile_action
 
-    def run(self):
-        """Run the coverage cleaning process on selected features."""
+        self.dirty_tracker.stop()
 
-        log_message("=== Coverage Cleaning Started ===")
+        if self.provider is not None:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
+
+        # Stop background runs before their connections go away
+        for task in list(self.tasks):
+            task.cancel()
 
+        # Close pooled database connections, if a PostGIS run ever opened them
+        if self._session_pools is not None:
+            self._session_pools.close()
+            self._session_pools = None
+
+    def active_polygon_layer(self):
+        """Return the active layer if it is a polygon vector layer, else report why and return None."""
         # Get the active layer
         layer = self.iface.activeLayer()
 
@@ -365,13 +767,13 @@ class CoverageCleaningPlugin:
             self.iface.messageBar().pushMessage(
                 "Error", "No active layer selected",
                 Qgis.Critical, duration=3)
-            return
+            return None
 
         if not isinstance(layer, QgsVectorLayer):
             self.iface.messageBar().pushMessage(
                 "Error", "Active layer is not a vector layer",
                 Qgis.Critical, duration=3)
-            return
+            return None
 
         # Check if layer geometry is polygon
         geom_type = layer.geometryType()
@@ -379,14 +781,31 @@ class CoverageCleaningPlugin:
             self.iface.messageBar().pushMessage(
                 "Error", "Layer must contain polygon geometries",
                 Qgis.Critical, duration=3)
-            return
+            return None
+
+        return layer
+
+    def is_layer_busy(self, layer):
+        """Return True, and tell the user, when a run on layer is still going."""
+        if any(layer.id() in task.layer_ids for task in self.tasks):
+            self.iface.messageBar().pushMessage(
+                "Info", f"Coverage cleaning is already running on {layer.name()}",
+                Qgis.Info, duration=3)
+            return True
+        return False
 
-        # Get selected features
-        selected_features = layer.selectedFeatures()
+    def run(self):
+        """Run the coverage cleaning process on selected features."""
 
-        log_message(f"Selected features count: {len(selected_features)}")
+        log_message("=== Coverage Cleaning Started ===")
 
-        if len(selected_features) < 2:
+        layer = self.active_polygon_layer()
+        if layer is None:
+            return
+
+        log_message(f"Selected features count: {layer.selectedFeatureCount()}")
+
+        if layer.selectedFeatureCount() < 2:
             self.iface.messageBar().pushMessage(
                 "Error", "Please select at least 2 features to clean coverage",
                 Qgis.Warning, duration=3)
@@ -395,47 +814,528 @@ class CoverageCleaningPlugin:
         # Use saved settings
         log_message(f"Using settings: tolerance={self.gap_tolerance}, snapping={self.snapping_distance}, pg_service={self.pg_service}, strategy={self.merge_strategy}")
 
-        # Start editing on the layer
-        if not layer.isEditable():
-            log_message("Starting edit mode on layer")
-            layer.startEditing()
+        # Don't queue a second run on a layer that is still being cleaned
+        if self.is_layer_busy(layer):
+            return
+
+        # PostGIS layers are cleaned where they are stored, without reading the geometries
+        if self.start_in_database_clean(layer):
+            return
+
+        if not self.engine_ready(layer.selectedFeatureCount()):
+            return
+
+        # Selected geometries are read in chunks while they are uploaded
+        self.queue_selection_clean(layer, SelectionStream(layer))
+
+    def engine_ready(self, feature_count):
+        """Return True when an engine can clean feature_count features, else tell the user why.
+
+        Checked before a run is queued, so a missing psycopg or shapely is
+        reported right away instead of failing on the worker thread.
+        """
+        try:
+            choose_engine(self.engine, feature_count)
+            return True
+        except RuntimeError as e:
+            log_message(f"ERROR: {e}", Qgis.Critical)
+            self.iface.messageBar().pushMessage("Error", str(e), Qgis.Critical, duration=10)
+            return False
+
+    def queue_selection_clean(self, layer, features):
+        """Clean features of layer in the background, results are applied in on_task_finished()."""
+        task = CoverageCleaningTask(self, layer, features, self.gap_tolerance,
+                                    self.snapping_distance, self.merge_strategy)
+        self.tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+        log_message(f"Coverage cleaning queued as background task for {layer.name()}")
+
+    def start_in_database_clean(self, layer):
+        """Queue an in-database clean of the selection when layer's table allows it.
+
+        :return: True when the run was queued, False to clean the selection client side
+        """
+        if not self.in_database or self.engine == ENGINE_GEOS or not postgis_available():
+            return False
+        from .postgis_engine import LayerTable
+        table, reason = LayerTable.from_layer(layer)
+        if table is None:
+            if layer.providerType() == "postgres":
+                log_message(f"In-database clean not possible: {reason}")
+            return False
+        if self.simplify_tolerance > 0:
+            log_message("Simplification is on, uploading the selection instead of "
+                        "cleaning it in the database")
+            return False
+        if self.time_budget > 0:
+            log_message("A time budget is set, uploading the selection instead of "
+                        "cleaning it in the database")
+            return False
+
+        # Unsaved geometry edits only exist in QGIS, the server would clean stale rows
+        selected_ids = layer.selectedFeatureIds()
+        buffer = layer.editBuffer()
+        if buffer is not None:
+            pending = set(buffer.changedGeometries()) | set(buffer.addedFeatures())
+            if pending.intersection(selected_ids):
+                log_message("Selection has unsaved geometry edits, uploading it instead")
+                return False
+
+        writeback = self.in_database_writeback
+        if writeback and layer.isEditable():
+            log_message("Layer is in edit mode, in-database results go to the edit buffer")
+            writeback = False
+
+        # Primary keys only, no geometries
+        request = (QgsFeatureRequest()
+                   .setFilterFids(selected_ids)
+                   .setFlags(QgsFeatureRequest.NoGeometry)
+                   .setSubsetOfAttributes([table.key_index]))
+        fids_by_key = {feature.attribute(table.key_index): feature.id()
+                       for feature in layer.getFeatures(request)}
+
+        task = InDatabaseCleaningTask(self, layer, table, fids_by_key, self.gap_tolerance,
+                                      self.snapping_distance, self.merge_strategy, writeback)
+        self.tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+        log_message(f"In-database coverage cleaning of {table} queued as background task")
+        return True
+
+    def run_dirty(self):
+        """Re-clean the features of the active layer edited since they were last cleaned."""
+
+        log_message("=== Incremental Coverage Cleaning Started ===")
+
+        layer = self.active_polygon_layer()
+        if layer is None or self.is_layer_busy(layer):
+            return
+
+        marks = self.dirty_tracker.dirty_marks(layer)
+        core, halo, snapping_distance = dirty_neighbourhood(
+            layer, marks, self.gap_tolerance, self.snapping_distance)
+        if not core:
+            self.iface.messageBar().pushMessage(
+                "Info", f"No edited features to re-clean on {layer.name()}",
+                Qgis.Info, duration=3)
+            return
+
+        if not self.engine_ready(len(core) + len(halo)):
+            return
+
+        log_message(f"Re-cleaning {len(marks)} edited features: {len(core)} features with "
+                    f"neighbours, {len(halo)} around them kept in place")
+        task = DirtyCleaningTask(self, layer, core, halo, marks, self.gap_tolerance,
+                                 snapping_distance, self.merge_strategy)
+        self.tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+        log_message(f"Incremental cleaning queued as background task for {layer.name()}")
+
+    def on_dirty_task_finished(self, task, result):
+        """Apply the core results of a finished DirtyCleaningTask and clear its dirty marks."""
+        self.tasks.remove(task)
+
+        if not result:
+            self.report_task_failure(task)
+            return
+
+        layer = QgsProject.instance().mapLayer(task.layer_id)
+        if layer is None:
+            self.iface.messageBar().pushMessage(
+                "Error", f"Layer {task.layer_name} was removed, cleaned geometries discarded",
+                Qgis.Warning, duration=5)
+            return
+
+        try:
+            self.apply_cleaned_geometries(layer, task.features, task.core_result(), task.profile)
+        except Exception as e:
+            log_message(f"ERROR: {str(e)}", Qgis.Critical)
+            self.iface.messageBar().pushMessage(
+                "Error",
+                f"Coverage cleaning failed: {str(e)}",
+                Qgis.Critical, duration=5)
+            return
+        self.dirty_tracker.mark_clean(layer, task.marks)
+
+    def run_multi_layer(self):
+        """Clean the selections of the layers chosen in the Layers panel as one coverage.
+
+        Coverages split by administrative unit across layers only meet
+        cleanly when their shared borders are cleaned together: every
+        selection goes into one upload and one clean, and each changed
+        geometry goes back to the layer it came from.
+        """
+
+        log_message("=== Multi-Layer Coverage Cleaning Started ===")
+
+        layers = [layer for layer in self.iface.layerTreeView().selectedLayers()
+                  if isinstance(layer, QgsVectorLayer)
+                  and layer.geometryType() == QgsWkbTypes.PolygonGeometry
+                  and layer.selectedFeatureCount() > 0]
+        if len(layers) < 2:
+            self.iface.messageBar().pushMessage(
+                "Error", "Choose at least 2 polygon layers with selected features in the "
+                "Layers panel", Qgis.Warning, duration=5)
+            return
+
+        # Geometries are cleaned together as they are stored
+        crs = layers[0].crs()
+        other = next((layer for layer in layers[1:] if layer.crs() != crs), None)
+        if other is not None:
+            self.iface.messageBar().pushMessage(
+                "Error", f"{other.name()} is in {other.crs().authid()}, not "
+                f"{crs.authid()} like {layers[0].name()}: all layers must share one CRS",
+                Qgis.Critical, duration=5)
+            return
+
+        feature_count = sum(layer.selectedFeatureCount() for layer in layers)
+        log_message("Selected features: " + ", ".join(
+            f"{layer.name()} {layer.selectedFeatureCount()}" for layer in layers))
+
+        if any(self.is_layer_busy(layer) for layer in layers):
+            return
+
+        if not self.engine_ready(feature_count):
+            return
+
+        task = MultiLayerCleaningTask(self, layers, MultiLayerSelection(layers),
+                                      self.gap_tolerance, self.snapping_distance,
+                                      self.merge_strategy)
+        self.tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+        log_message(f"Coverage cleaning of {feature_count} features across {len(layers)} "
+                    "layers queued as background task")
+
+    def on_multi_layer_task_finished(self, task, result):
+        """Send the results of a finished MultiLayerCleaningTask back to each layer."""
+        self.tasks.remove(task)
+
+        if not result:
+            self.report_task_failure(task)
+            return
+
+        selection = task.features
+        cleaned = task.cleaned
+        log_message(f"Received {len(cleaned.changed)} changed geometries across "
+                    f"{len(selection.layer_ids)} layers, {cleaned.unchanged} unchanged")
+
+        changed_by_layer = {}
+        committed = True
+        for layer_id, name in zip(selection.layer_ids, selection.layer_names):
+            # A layer may have been removed while the task was running
+            layer = QgsProject.instance().mapLayer(layer_id)
+            if layer is None:
+                self.iface.messageBar().pushMessage(
+                    "Error", f"Layer {name} was removed, its cleaned geometries discarded",
+                    Qgis.Warning, duration=5)
+                continue
+            try:
+                direct = self.use_direct_apply(layer)
+                count = self.write_geometries(layer, selection.layer_changes(cleaned.changed,
+                                                                             layer_id),
+                                              direct, task.profile)
+            except Exception as e:
+                log_message(f"ERROR: {layer.name()}: {str(e)}", Qgis.Critical)
+                self.iface.messageBar().pushMessage(
+                    "Error", f"Coverage cleaning failed on {layer.name()}: {str(e)}",
+                    Qgis.Critical, duration=5)
+                continue
+            log_message(f"{layer.name()}: {count} geometries changed")
+            changed_by_layer[layer.name()] = count
+            committed = committed and direct
+
+        changed_count = sum(changed_by_layer.values())
+        task.profile.annotate(changed=changed_count, changed_by_layer=changed_by_layer)
+        log_message(f"Total changed: {changed_count} of {cleaned.total}")
+        self.push_clean_result(changed_count, cleaned.total, committed=committed)
+
+    def run_sweep(self):
+        """Clean the selected features with several parameter combinations in the background."""
+
+        log_message("=== Parameter Sweep Started ===")
+
+        layer = self.active_polygon_layer()
+        if layer is None:
+            return
+
+        if layer.selectedFeatureCount() < 2:
+            self.iface.messageBar().pushMessage(
+                "Error", "Please select at least 2 features to clean coverage",
+                Qgis.Warning, duration=3)
+            return
+
+        if self.is_layer_busy(layer) or not self.engine_ready(layer.selectedFeatureCount()):
+            return
+
+        from .sweep import SweepParametersDialog
+        dialog = SweepParametersDialog(self, layer.selectedFeatureCount(), self.iface.mainWindow())
+        if not dialog.exec_():
+            return
+
+        # Read geometry-only in chunks on the worker thread, like a selection clean
+        task = SweepTask(self, layer, SelectionStream(layer), dialog.combinations)
+        self.tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+        log_message(f"Parameter sweep of {len(dialog.combinations)} combinations queued "
+                    f"as background task for {layer.name()}")
+
+    def on_sweep_task_finished(self, task, result):
+        """Show the results of a finished SweepTask and apply the chosen combination."""
+        self.tasks.remove(task)
+
+        if not result:
+            self.report_task_failure(task)
+            return
+
+        from .sweep import SweepResultsDialog, log_sweep
+        log_sweep(task.sweeps)
+        dialog = SweepResultsDialog(task.sweeps, len(task.features), self.iface.mainWindow())
+        if not dialog.exec_() or dialog.chosen() is None:
+            return
+        chosen = dialog.chosen()
+
+        # The layer may have been removed while the dialog was open
+        layer = QgsProject.instance().mapLayer(task.layer_id)
+        if layer is None:
+            self.iface.messageBar().pushMessage(
+                "Error", f"Layer {task.layer_name} was removed, cleaned geometries discarded",
+                Qgis.Warning, duration=5)
+            return
+
+        log_message(f"Applying sweep result gap={chosen.gap_tolerance:g}, "
+                    f"snap={chosen.snapping_distance:g}, {chosen.merge_strategy}")
+        task.profile.annotate(applied=[chosen.gap_tolerance, chosen.snapping_distance,
+                                       chosen.merge_strategy])
+        try:
+            self.apply_cleaned_geometries(layer, task.features, chosen.result, task.profile)
+        except Exception as e:
+            log_message(f"ERROR: {str(e)}", Qgis.Critical)
+            self.iface.messageBar().pushMessage(
+                "Error",
+                f"Applying the sweep result failed: {str(e)}",
+                Qgis.Critical, duration=5)
+
+    def run_whole_layer(self):
+        """Clean every feature of the active layer tile by tile in the background."""
+
+        log_message("=== Whole-Layer Coverage Cleaning Started ===")
+
+        layer = self.active_polygon_layer()
+        if layer is None or self.is_layer_busy(layer) or not self.engine_ready(self.tile_features):
+            return
+
+        log_message(f"Using settings: tolerance={self.gap_tolerance}, snapping={self.snapping_distance}, "
+                    f"strategy={self.merge_strategy}, tile_features={self.tile_features}")
+
+        # Resume an interrupted run of the same job, or start a fresh checkpoint
+        checkpoint_path = self.checkpoint_path(layer)
+        signature = CheckpointStore.signature(layer, self.gap_tolerance, self.snapping_distance,
+                                              self.merge_strategy, self.tile_features)
+        store = CheckpointStore(checkpoint_path)
+        try:
+            resume = store.matches(signature) and store.has_progress() and QMessageBox.question(
+                self.iface.mainWindow(), "Clean Entire Layer",
+                f"An interrupted run on {layer.name()} with the same settings was found.\n"
+                "Resume it? Choose No to start over.",
+                QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes
+            if resume:
+                log_message(f"Resuming from checkpoint {checkpoint_path}")
+            else:
+                store.reset(signature)
+        finally:
+            store.close()
+
+        task = TiledCleaningTask(self, layer, checkpoint_path, self.gap_tolerance,
+                                 self.snapping_distance, self.merge_strategy, self.tile_features)
+        self.tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+        log_message(f"Whole-layer cleaning queued as background task for {layer.name()}")
+
+    def profile_folder(self, name):
+        """Return (and create) a folder of the plugin in the QGIS profile."""
+        folder = os.path.join(QgsApplication.qgisSettingsDirPath(), "qtibiatopology", name)
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def checkpoint_path(self, layer):
+        """Return the checkpoint file of whole-layer runs on layer, in the QGIS profile."""
+        folder = self.profile_folder("checkpoints")
+        name = "".join(c if c.isalnum() or c in "-_" else "_" for c in layer.id())
+        return os.path.join(folder, f"{name}.sqlite")
+
+    def on_tiled_task_finished(self, task, result):
+        """Apply the checkpointed changes of a finished TiledCleaningTask on the main thread."""
+        self.tasks.remove(task)
+
+        if not result:
+            if task.isCanceled():
+                message = (f"Whole-layer cleaning of {task.layer_name} stopped; "
+                           "run it again to resume from the checkpoint")
+                log_message(message)
+                self.iface.messageBar().pushMessage("Info", message, Qgis.Info, duration=5)
+            else:
+                log_message(f"ERROR: {task.error}", Qgis.Critical)
+                self.iface.messageBar().pushMessage(
+                    "Error",
+                    f"Coverage cleaning failed: {task.error}",
+                    Qgis.Critical, duration=5)
+            return
+
+        layer = QgsProject.instance().mapLayer(task.layer_id)
+        if layer is None:
+            self.iface.messageBar().pushMessage(
+                "Error", f"Layer {task.layer_name} was removed, results kept in {task.checkpoint_path}",
+                Qgis.Warning, duration=5)
+            return
+
+        direct = self.use_direct_apply(layer)
+        store = CheckpointStore(task.checkpoint_path)
+        try:
+            changes = ((fid, wkb_to_geom(wkb)) for fid, wkb in store.iter_changes())
+            changed_count = self.write_geometries(layer, changes, direct, task.profile)
+        except Exception as e:
+            # The checkpoint holds the whole run, keep it for another try
+            store.close()
+            log_message(f"ERROR: {str(e)}", Qgis.Critical)
+            self.iface.messageBar().pushMessage(
+                "Error",
+                f"Applying the cleaned layer failed: {str(e)}; results kept in "
+                f"{task.checkpoint_path}",
+                Qgis.Critical, duration=10)
+            return
+        store.remove()
+
+        summary = task.summary
+        log_message(f"Total changed: {changed_count} of {task.feature_count}, "
+                    f"{summary['features_per_second']:.0f} features/s")
+        self.iface.messageBar().pushMessage(
+            "Success",
+            f"Layer cleaned: {changed_count} of {task.feature_count} features modified "
+            f"at {summary['features_per_second']:.0f} features/s ({self.result_location(direct)})",
+            Qgis.Success, duration=5)
+
+    def report_task_failure(self, task):
+        """Tell the user why a CoverageCleaningTask did not finish."""
+        if task.isCanceled():
+            log_message(f"Coverage cleaning canceled on {task.layer_name}")
+            self.iface.messageBar().pushMessage(
+                "Info", f"Coverage cleaning canceled on {task.layer_name}",
+                Qgis.Info, duration=3)
         else:
-            log_message("Layer already in edit mode")
+            log_message(f"ERROR: {task.error}", Qgis.Critical)
+            self.iface.messageBar().pushMessage(
+                "Error",
+                f"Coverage cleaning failed: {task.error}",
+                Qgis.Critical, duration=5)
+
+    def on_in_database_task_finished(self, task, result):
+        """Apply the results of a finished InDatabaseCleaningTask on the main thread."""
+        self.tasks.remove(task)
+
+        layer = QgsProject.instance().mapLayer(task.layer_id)
+        if task.fallback:
+            if layer is not None:
+                self.queue_selection_clean(layer, SelectionStream(layer, task.fids_by_key.values()))
+            return
+
+        if not result:
+            self.report_task_failure(task)
+            return
+
+        if layer is None:
+            self.iface.messageBar().pushMessage(
+                "Error", f"Layer {task.layer_name} was removed, cleaned geometries discarded",
+                Qgis.Warning, duration=5)
+            return
+
+        total = len(task.fids_by_key)
+        if task.writeback:
+            # The table changed behind the provider's back
+            layer.reload()
+            layer.triggerRepaint()
+            log_message(f"Total changed: {len(task.changed)} of {total}, written to {task.table}")
+            self.push_clean_result(len(task.changed), total, committed=True)
+            return
 
-        # Process the coverage cleaning
         try:
-            log_message("Calling clean_coverage()...")
-            cleaned_geoms = self.clean_coverage(selected_features, self.gap_tolerance, self.snapping_distance, self.merge_strategy)
-
-            if cleaned_geoms:
-                log_message(f"Received {len(cleaned_geoms)} cleaned geometries")
-                # Update features with cleaned geometries only if they changed
-                changed_count = 0
-                for idx, (feature, clean_geom) in enumerate(zip(selected_features, cleaned_geoms)):
-                    original_geom = feature.geometry()
-                    # Check if geometry actually changed
-                    if not original_geom.equals(clean_geom):
-                        if self.verbose_logging:
-                            log_message(f"Feature {idx} (ID: {feature.id()}) geometry changed", verbose=True)
-                        layer.changeGeometry(feature.id(), clean_geom)
-                        changed_count += 1
-                    else:
-                        if self.verbose_logging:
-                            log_message(f"Feature {idx} (ID: {feature.id()}) geometry unchanged", verbose=True)
-
-                log_message(f"Total changed: {changed_count} of {len(selected_features)}")
-
-                if changed_count > 0:
-                    self.iface.messageBar().pushMessage(
-                        "Success",
-                        f"Coverage cleaned: {changed_count} of {len(selected_features)} features modified (in edit buffer, not committed)",
-                        Qgis.Success, duration=5)
-                else:
-                    self.iface.messageBar().pushMessage(
-                        "Info",
-                        f"Coverage already clean: no changes needed for {len(selected_features)} features",
-                        Qgis.Info, duration=3)
+            direct = self.use_direct_apply(layer)
+            self.write_geometries(layer, ((task.fids_by_key[key], clean_geom)
+                                          for key, clean_geom in task.changed),
+                                  direct, task.profile)
+            log_message(f"Total changed: {len(task.changed)} of {total}")
+            self.push_clean_result(len(task.changed), total, committed=direct)
+        except Exception as e:
+            log_message(f"ERROR: {str(e)}", Qgis.Critical)
+            self.iface.messageBar().pushMessage(
+                "Error",
+                f"Coverage cleaning failed: {str(e)}",
+                Qgis.Critical, duration=5)
+
+    @staticmethod
+    def result_location(committed):
+        """Describe where a run's changes went, for the message bar."""
+        return "written to the data source" if committed else "in edit buffer, not committed"
+
+    def use_direct_apply(self, layer):
+        """Return True when results for layer go straight to its data provider.
 
+        Layers in edit mode always use the edit buffer so pending edits and
+        the cleaned geometries stay in one place.
+        """
+        if not self.direct_apply or layer.isEditable():
+            return False
+        if not supports_direct_writes(layer):
+            log_message(f"{layer.name()} can't change geometries in its data source, "
+                        "using the edit buffer", Qgis.Warning)
+            return False
+        return True
+
+    def write_geometries(self, layer, changes, direct, profile=DISABLED_PROFILE):
+        """Apply (feature id, QgsGeometry) changes to layer in one batch.
+
+        :param direct: Write to the data provider instead of the edit buffer
+        :param profile: RunProfile of the run, receiving the apply span
+        :return: Number of geometries written
+        """
+        with profile.span("apply"):
+            count = apply_geometry_changes(layer, changes, direct=direct, canvas=self.canvas)
+        profile.annotate(changed=count, apply_mode="direct" if direct else "edit buffer")
+        return count
+
+    def push_clean_result(self, changed_count, total, committed=False):
+        """Show how many of total features a run modified.
+
+        :param committed: The changes were written to the data source, not the edit buffer
+        """
+        if changed_count > 0:
+            self.iface.messageBar().pushMessage(
+                "Success",
+                f"Coverage cleaned: {changed_count} of {total} features modified "
+                f"({self.result_location(committed)})",
+                Qgis.Success, duration=5)
+        else:
+            self.iface.messageBar().pushMessage(
+                "Info",
+                f"Coverage already clean: no changes needed for {total} features",
+                Qgis.Info, duration=3)
+
+    def on_task_finished(self, task, result):
+        """Apply the results of a finished CoverageCleaningTask on the main thread."""
+        self.tasks.remove(task)
+
+        if not result:
+            self.report_task_failure(task)
+            return
+
+        # The layer may have been removed while the task was running
+        layer = QgsProject.instance().mapLayer(task.layer_id)
+        if layer is None:
+            self.iface.messageBar().pushMessage(
+                "Error", f"Layer {task.layer_name} was removed, cleaned geometries discarded",
+                Qgis.Warning, duration=5)
+            return
+
+        try:
+            self.apply_cleaned_geometries(layer, task.features, task.cleaned, task.profile)
         except Exception as e:
             log_message(f"ERROR: {str(e)}", Qgis.Critical)
             self.iface.messageBar().pushMessage(
@@ -443,107 +1343,143 @@ class CoverageCleaningPlugin:
                 f"Coverage cleaning failed: {str(e)}",
                 Qgis.Critical, duration=5)
 
-    def clean_coverage(self, features, gap_tolerance, snapping_distance, merge_strategy):
-        """Clean coverage using PostGIS ST_CoverageClean.
+    def apply_cleaned_geometries(self, layer, selected_features, cleaned, profile=DISABLED_PROFILE):
+        """Write changed geometries to the layer and report the result.
 
-        :param features: List of QgsFeature objects
-        :param gap_tolerance: Maximum gap width to clean
-        :param snapping_distance: Snapping distance (-1=auto, 0=disabled, >0=custom)
-        :param merge_strategy: Strategy for merging overlaps
-        :return: List of cleaned QgsGeometry objects in same order
+        Spooled results are decoded one geometry at a time as they are written.
+
+        :param selected_features: List of QgsFeature or SelectionStream the run cleaned
+        :param cleaned: CleaningResult of the run on selected_features
+        :param profile: RunProfile of the run, receiving the apply span
         """
+        if cleaned is None:
+            return
 
-        log_message(f"clean_coverage() called with {len(features)} features, tolerance={gap_tolerance}, snapping={snapping_distance}, strategy={merge_strategy}",
-                    verbose=self.verbose_logging)
+        log_message(f"Received {len(cleaned.changed)} changed geometries, "
+                    f"{cleaned.unchanged} unchanged")
+        fids = feature_ids(selected_features)
 
-        # Connect to PostGIS using psycopg3
+        # The engine compared input and output, only changed geometries are here
+        def changes():
+            for idx, clean_geom in cleaned.changed:
+                log_message(lambda: f"Feature {idx} (ID: {fids[idx]}) geometry changed",
+                            verbose=self.verbose_logging)
+                yield fids[idx], clean_geom
+
+        direct = self.use_direct_apply(layer)
+        self.write_geometries(layer, changes(), direct, profile)
+
+        log_message(f"Total changed: {len(cleaned.changed)} of {cleaned.total}")
+        self.push_clean_result(len(cleaned.changed), cleaned.total, committed=direct)
+
+    def start_capture(self, features, gap_tolerance, snapping_distance, merge_strategy, engine,
+                      task=None):
+        """Write the input and parameters of a run to a capture file before it is cleaned.
+
+        :return: CaptureWriter receiving the outcome of the run, None if it can't be written
+        """
+        from .capture import CaptureWriter, capture_path
+        kind = task.PROFILE_KIND if task is not None else "api"
+        layer = task.layer_name if task is not None else ""
+        path = capture_path(self.profile_folder("captures"), kind, layer)
+        capture = CaptureWriter(path, gap_tolerance, snapping_distance, merge_strategy, engine,
+                                kind=kind, layer=layer)
         try:
-            log_message(f"Connecting to PostgreSQL using service: {self.pg_service}",
-                        verbose=self.verbose_logging)
-            with psycopg.connect(f"service={self.pg_service}") as conn:
-                log_message("Connected successfully", verbose=self.verbose_logging)
-                with conn.cursor() as cur:
-                    # Create a temporary table to hold the geometries with their order
-                    log_message("Creating temporary table coverage_input", verbose=self.verbose_logging)
-                    cur.execute("""
-                        CREATE TEMP TABLE coverage_input (
-                            feature_order INTEGER PRIMARY KEY,
-                            geom geometry
-                        )
-                    """)
-
-                    # Prepare batch insert data - use WKB (binary) for better performance
-                    log_message(f"Preparing {len(features)} geometries for batch insert",
-                                verbose=self.verbose_logging)
-                    batch_data = []
-                    for idx, feature in enumerate(features):
-                        geom = feature.geometry()
-                        # Use WKB (binary format) instead of WKT for better performance
-                        # Convert QByteArray to Python bytes for psycopg3
-                        wkb = bytes(geom.asWkb())
-                        batch_data.append((idx, wkb))
-                        if self.verbose_logging:
-                            log_message(f"  Feature {idx}: WKB prepared ({len(wkb)} bytes)",
-                                        verbose=True)
-
-                    # Batch insert using executemany for better performance
-                    log_message(f"Batch inserting {len(batch_data)} geometries",
-                                verbose=self.verbose_logging)
-                    cur.executemany(
-                        """INSERT INTO coverage_input (feature_order, geom)
-                           VALUES (%s, ST_GeomFromWKB(%s))""",
-                        batch_data
-                    )
-
-                    log_message("Geometries inserted (commit deferred)", verbose=self.verbose_logging)
-
-                    # Clean the coverage using ST_CoverageClean
-                    # ST_CoverageClean is a WINDOW FUNCTION that requires OVER () clause
-                    # It processes all geometries in the window and returns cleaned versions
-                    sql = f"""
-                        SELECT
-                            feature_order,
-                            ST_AsEWKB(
-                                ST_CoverageClean(
-                                    geom,
-                                    {gap_tolerance},
-                                    {snapping_distance},
-                                    '{merge_strategy}'
-                                ) OVER ()
-                            ) as geom
-                        FROM coverage_input
-                        ORDER BY feature_order
-                    """
-                    if self.verbose_logging:
-                        log_message(f"Executing ST_CoverageClean query:\n{sql}", verbose=True)
-                    else:
-                        log_message("Executing ST_CoverageClean...", verbose=True)
-
-                    cur.execute(sql)
-
-                    results = cur.fetchall()
-                    log_message(f"Query returned {len(results)} results", verbose=self.verbose_logging)
-
-                    # Convert results to QgsGeometry in original feature order
-                    log_message("Converting results to QgsGeometry objects", verbose=self.verbose_logging)
-                    cleaned_geoms = []
-                    for idx, row in enumerate(results):
-                        geom_ewkb = row[1]
-                        if isinstance(geom_ewkb, bytes):
-                            geom_ewkb = geom_ewkb.hex()
-                        cleaned_geom = ewkb_to_geom(geom_ewkb)
-                        cleaned_geoms.append(cleaned_geom)
-                        if self.verbose_logging:
-                            log_message(f"  Result {idx}: EWKB converted to QgsGeometry", verbose=True)
-
-                    # Clean up - don't need explicit DROP, temp table will be dropped at session end
-                    # But we'll do it anyway for cleanliness
-                    log_message("Cleanup complete", verbose=self.verbose_logging)
-
-                    log_message(f"Returning {len(cleaned_geoms)} cleaned geometries",
-                                verbose=self.verbose_logging)
-                    return cleaned_geoms
+            with profile_of(task).span("capture"):
+                capture.write_input(features, lambda fraction: report_stage(task, "serialize",
+                                                                            fraction))
+        except OSError as e:
+            # A capture is a diagnostic aid, the run goes on without it
+            capture.close()
+            log_message(f"Capturing the run to {path} failed: {e}", Qgis.Warning)
+            return None
+        log_message(f"Run input captured to {path}")
+        return capture
+
+    def create_engine(self, feature_count, preference=None, simplify=True):
+        """Create the cleaning engine for a run from the current settings.
+
+        :param feature_count: Number of features to clean, used by automatic selection
+        :param preference: Engine setting overriding the configured one, e.g. ENGINE_GEOS
+        :param simplify: Simplify at the configured tolerance; False for runs
+            that discard part of their results
+        :return: A CleaningEngine
+        """
+        engine = choose_engine(preference or self.engine, feature_count)
+        if engine == ENGINE_GEOS:
+            from .geos_engine import GeosEngine
+            return GeosEngine(simplify_tolerance=self.simplify_tolerance if simplify else 0.0,
+                              verbose=self.verbose_logging)
+        return self.create_postgis_engine(simplify)
+
+    def create_postgis_engine(self, simplify=False):
+        """Create a PostGISEngine on the configured pg_service from the current settings.
 
+        :param simplify: Simplify at the configured tolerance
+        """
+        from .postgis_engine import PostGISEngine
+        return PostGISEngine(
+            self.pg_service,
+            self.session_pools,
+            use_copy=self.use_copy,
+            partition_clusters=self.partition_clusters,
+            partition_workers=self.partition_workers,
+            twkb_precision=self.transfer_precision if self.transfer_precision >= 0 else None,
+            validity_probe=self.validity_probe,
+            simplify_tolerance=self.simplify_tolerance if simplify else 0.0,
+            time_budget=self.time_budget,
+            diagnostics=self.diagnostics,
+            verbose=self.verbose_logging,
+        )
+
+    def clean_coverage(self, features, gap_tolerance, snapping_distance, merge_strategy, task=None,
+                       engine_preference=None, simplify=True):
+        """Clean coverage with the configured engine.
+
+        Safe to call from a worker thread; it never touches the layer.
+
+        :param features: List of QgsFeature objects, or a SelectionStream
+        :param gap_tolerance: Maximum gap width to clean
+        :param snapping_distance: Snapping distance (-1=auto, 0=disabled, >0=custom)
+        :param merge_strategy: Strategy for merging overlaps
+        :param task: Optional CoverageCleaningTask receiving progress and cancellation
+        :param engine_preference: Engine setting overriding the configured one
+        :param simplify: Simplify the result at the configured tolerance
+        :return: CleaningResult with the changed geometries by input index
+        """
+        engine = self.create_engine(len(features), engine_preference, simplify)
+        profile = profile_of(task)
+        profile.annotate(engine=engine.name)
+
+        # Identical input and parameters give an identical result
+        key = None
+        if self.result_cache.enabled:
+            with profile.span("cache lookup"):
+                digest = input_digest(features,
+                                      lambda fraction: report_stage(task, "serialize", fraction))
+                key = run_key(digest, gap_tolerance, snapping_distance, merge_strategy,
+                              engine.result_variant)
+                cached = self.result_cache.get(key)
+            profile.annotate(cache="hit" if cached is not None else "miss")
+            if cached is not None:
+                log_message(f"Reusing cached result for {len(features)} features")
+                return cached
+
+        capture = None
+        if self.capture_runs:
+            capture = self.start_capture(features, gap_tolerance, snapping_distance,
+                                         merge_strategy, engine, task)
+
+        log_message(f"Cleaning {len(features)} features with the {engine.label} engine")
+        try:
+            result = engine.clean(features, gap_tolerance, snapping_distance, merge_strategy, task)
         except Exception as e:
-            log_message(f"Database operation failed: {str(e)}", Qgis.Critical, verbose=True)
-            raise Exception(f"Database operation failed: {str(e)}")
+            if capture is not None:
+                capture.finish(error=str(e) or type(e).__name__, profile=profile,
+                               canceled=isinstance(e, CleaningCanceled))
+            raise
+        if capture is not None:
+            capture.finish(result, profile=profile)
+        if key is not None:
+            self.result_cache.put(key, result)
+        return result
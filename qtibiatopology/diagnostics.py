@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Server diagnostics of PostGIS runs: EXPLAIN ANALYZE plans of the load and
+ clean statements, pg_stat_statements figures and the server settings
+ that matter for tuning.
+"""
+import json
+import threading
+import time
+
+import psycopg
+from qgis.core import Qgis
+
+from .utils import log_message
+
+EXPLAIN_PREFIX = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+# Server settings recorded with every report
+SERVER_SETTINGS = (
+    "work_mem",
+    "maintenance_work_mem",
+    "temp_buffers",
+    "shared_buffers",
+    "effective_cache_size",
+    "max_parallel_workers_per_gather",
+    "jit",
+    "random_page_cost",
+    "server_version",
+)
+
+SETTINGS_SQL = "SELECT name, setting, unit FROM pg_settings WHERE name = ANY(%s)"
+
+# Statements of this user and database that touched the staging tables.
+# Counters are cumulative, so a run's share is the difference of two snapshots.
+STAT_STATEMENTS_SQL = """
+    SELECT queryid, left(query, 200), calls, total_exec_time, total_plan_time, rows,
+           shared_blks_hit, shared_blks_read, local_blks_hit, local_blks_read,
+           local_blks_written, temp_blks_read, temp_blks_written
+    FROM pg_stat_statements
+    WHERE userid = (SELECT oid FROM pg_roles WHERE rolname = current_user)
+      AND dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND query LIKE '%coverage_%'
+"""
+
+STAT_COLUMNS = ("calls", "exec_ms", "plan_ms", "rows", "shared_blks_hit", "shared_blks_read",
+                "local_blks_hit", "local_blks_read", "local_blks_written", "temp_blks_read",
+                "temp_blks_written")
+
+# Memory held by this backend's memory contexts (PostgreSQL 14+, needs
+# pg_read_all_stats or superuser)
+BACKEND_MEMORY_SQL = """
+    SELECT sum(total_bytes), sum(used_bytes), count(*)
+    FROM pg_backend_memory_contexts
+"""
+
+# Plan node fields kept in the compact node list: time, rows and memory
+NODE_FIELDS = ("Actual Total Time", "Actual Rows", "Actual Loops", "Sort Space Used",
+               "Sort Space Type", "Peak Memory Usage", "Storage", "Maximum Storage",
+               "Temp Written Blocks", "Local Written Blocks")
+
+
+def plan_nodes(plan, depth=0):
+    """Flatten an EXPLAIN JSON plan tree into a list of compact node records."""
+    node = {"node": plan.get("Node Type"), "depth": depth}
+    node.update({field: plan[field] for field in NODE_FIELDS if field in plan})
+    nodes = [node]
+    for child in plan.get("Plans", ()):
+        nodes.extend(plan_nodes(child, depth + 1))
+    return nodes
+
+
+class ServerDiagnostics:
+    """Server side figures of one run: plans, pg_stat_statements deltas, settings.
+
+    Statements are explained with literal parameters, so any statement,
+    CREATE TABLE AS included, can be analyzed. A run may span several
+    sessions (partitioned workers) and several clean() calls (tiles), so
+    everything is accumulated.
+    """
+
+    def __init__(self):
+        self.plans = []
+        self.settings = {}
+        self.statements = {}
+        self.statements_error = None
+        self.backend_memory = None
+        self._before = {}
+        self._lock = threading.Lock()
+
+    def explain(self, cur, label, query, params=()):
+        """Run query under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and keep its plan.
+
+        The statement really runs; rows a SELECT would return are discarded.
+
+        :param label: Name of the statement in the report, e.g. "clean"
+        :param params: Parameters of query, bound on the client
+        """
+        text = query
+        if params:
+            with psycopg.ClientCursor(cur.connection) as client:
+                text = client.mogrify(query, params)
+        start = time.perf_counter()
+        cur.execute(EXPLAIN_PREFIX + text)
+        seconds = time.perf_counter() - start
+        result = cur.fetchone()[0]
+        if isinstance(result, (str, bytes)):
+            result = json.loads(result)
+        result = result[0]
+        plan = result["Plan"]
+        record = {
+            "label": label,
+            "client_ms": round(seconds * 1000, 3),
+            "planning_ms": result.get("Planning Time"),
+            "execution_ms": result.get("Execution Time"),
+            "temp_written_blocks": plan.get("Temp Written Blocks", 0),
+            "nodes": plan_nodes(plan),
+            "plan": result,
+        }
+        with self._lock:
+            self.plans.append(record)
+        log_message(f"Server: {label} executed in {record['execution_ms']:.1f} ms "
+                    f"(planning {record['planning_ms']:.1f} ms, "
+                    f"{record['client_ms']:.1f} ms seen by the client)")
+        if record["temp_written_blocks"]:
+            log_message(f"Server: {label} wrote {record['temp_written_blocks']} temp blocks to "
+                        f"disk, work_mem ({self.setting('work_mem')}) is too small for it",
+                        Qgis.Warning)
+
+    def setting(self, name):
+        """Return a recorded server setting with its unit, e.g. "4096kB"."""
+        value = self.settings.get(name)
+        if value is None:
+            return "unknown"
+        return f"{value['setting']}{value['unit'] or ''}"
+
+    def start(self, cur):
+        """Record the server settings and snapshot pg_stat_statements before a clean."""
+        if not self.settings:
+            cur.execute(SETTINGS_SQL, (list(SERVER_SETTINGS),))
+            self.settings = {name: {"setting": setting, "unit": unit}
+                             for name, setting, unit in cur.fetchall()}
+        self._before = self.read_statements(cur) or {}
+
+    def finish(self, cur):
+        """Add the pg_stat_statements counters of the clean and read backend memory."""
+        after = self.read_statements(cur)
+        if after is not None:
+            for queryid, (query, *counters) in after.items():
+                before = self._before.get(queryid, (query, *[0] * len(counters)))[1:]
+                delta = [a - b for a, b in zip(counters, before)]
+                if not delta[0]:
+                    continue
+                entry = self.statements.setdefault(
+                    queryid, dict({"query": query}, **dict.fromkeys(STAT_COLUMNS, 0)))
+                for column, value in zip(STAT_COLUMNS, delta):
+                    entry[column] += value
+        try:
+            with cur.connection.transaction():
+                cur.execute(BACKEND_MEMORY_SQL)
+                total, used, contexts = cur.fetchone()
+            self.backend_memory = {"total_bytes": int(total or 0), "used_bytes": int(used or 0),
+                                   "contexts": contexts}
+        except psycopg.Error as e:
+            self.backend_memory = {"error": str(e).strip()}
+
+    def read_statements(self, cur):
+        """Return {queryid: (query, counters...)} from pg_stat_statements, or None without it."""
+        if self.statements_error is not None:
+            return None
+        cur.execute("SELECT to_regclass('pg_stat_statements')")
+        if cur.fetchone()[0] is None:
+            self.statements_error = "pg_stat_statements is not installed in this database"
+            return None
+        try:
+            with cur.connection.transaction():
+                cur.execute(STAT_STATEMENTS_SQL)
+                rows = cur.fetchall()
+        except psycopg.Error as e:
+            self.statements_error = str(e).strip()
+            return None
+        return {row[0]: (row[1], *(float(value or 0) for value in row[2:])) for row in rows}
+
+    def summary(self):
+        """Return everything recorded as a JSON-serializable dict."""
+        statements = sorted(self.statements.values(), key=lambda s: s["exec_ms"], reverse=True)
+        return {
+            "settings": self.settings,
+            "plans": self.plans,
+            "pg_stat_statements": statements if self.statements_error is None
+            else {"unavailable": self.statements_error},
+            "backend_memory": self.backend_memory,
+        }
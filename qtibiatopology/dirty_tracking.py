@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Incremental re-cleaning: follows the edits made to polygon layers and
+ finds the neighbourhood of the edited features that needs cleaning again.
+"""
+import itertools
+
+from qgis.core import (QgsFeatureRequest, QgsRectangle, QgsSpatialIndex, QgsVectorLayer,
+                       QgsWkbTypes)
+
+from .engines import resolve_snapping_distance
+from .utils import log_message
+
+
+class DirtyTracker:
+    """Remembers which features of each polygon layer were edited since they were last cleaned.
+
+    Geometry changes and added features mark a feature dirty; deleting it
+    drops the mark. Rolling back an edit session restores the marks of
+    when editing started. Results written by the plugin don't mark
+    anything, because apply_geometry_changes() blocks the layer's signals.
+
+    Every mark carries an edit sequence number, so a clean only clears
+    the marks of edits it has seen.
+    """
+
+    def __init__(self, project):
+        """Constructor.
+
+        :param project: QgsProject whose polygon layers are followed
+        """
+        self.project = project
+        # layer id -> {feature id: edit sequence number}
+        self.dirty = {}
+        # layer id -> marks when the current edit session started
+        self.snapshots = {}
+        # layer id -> [(signal, slot)] to disconnect on stop()
+        self.connections = {}
+        self.sequence = itertools.count(1)
+
+    def start(self):
+        """Follow the polygon layers of the project, now and as they are added."""
+        for layer in self.project.mapLayers().values():
+            self.watch(layer)
+        self.project.layersAdded.connect(self.on_layers_added)
+        self.project.layersRemoved.connect(self.on_layers_removed)
+
+    def stop(self):
+        """Disconnect from the project and every followed layer."""
+        for layer_id in list(self.connections):
+            self.unwatch(layer_id)
+        try:
+            self.project.layersAdded.disconnect(self.on_layers_added)
+            self.project.layersRemoved.disconnect(self.on_layers_removed)
+        except (TypeError, RuntimeError):
+            pass
+
+    def on_layers_added(self, layers):
+        for layer in layers:
+            self.watch(layer)
+
+    def on_layers_removed(self, layer_ids):
+        for layer_id in layer_ids:
+            self.connections.pop(layer_id, None)
+            self.dirty.pop(layer_id, None)
+            self.snapshots.pop(layer_id, None)
+
+    def watch(self, layer):
+        """Start following the edits of layer if it is a polygon vector layer."""
+        if (not isinstance(layer, QgsVectorLayer)
+                or layer.geometryType() != QgsWkbTypes.PolygonGeometry
+                or layer.id() in self.connections):
+            return
+        layer_id = layer.id()
+        self.dirty[layer_id] = {}
+        connections = [
+            (layer.geometryChanged, lambda fid, _geom: self.mark(layer_id, fid)),
+            (layer.featureAdded, lambda fid: self.mark(layer_id, fid)),
+            (layer.featureDeleted, lambda fid: self.dirty[layer_id].pop(fid, None)),
+            (layer.committedFeaturesAdded,
+             lambda _layer_id, features: self.on_committed_features_added(layer_id, features)),
+            (layer.editingStarted,
+             lambda: self.snapshots.__setitem__(layer_id, dict(self.dirty[layer_id]))),
+            (layer.afterRollBack, lambda: self.on_rolled_back(layer_id)),
+        ]
+        for signal, slot in connections:
+            signal.connect(slot)
+        self.connections[layer_id] = connections
+
+    def unwatch(self, layer_id):
+        for signal, slot in self.connections.pop(layer_id, []):
+            try:
+                signal.disconnect(slot)
+            except (TypeError, RuntimeError):
+                # The layer is already gone
+                pass
+        self.dirty.pop(layer_id, None)
+        self.snapshots.pop(layer_id, None)
+
+    def mark(self, layer_id, fid):
+        self.dirty[layer_id][fid] = next(self.sequence)
+
+    def on_committed_features_added(self, layer_id, features):
+        """Added features get their real ids on commit; move their marks over."""
+        dirty = self.dirty[layer_id]
+        for fid in [fid for fid in dirty if fid < 0]:
+            del dirty[fid]
+        for feature in features:
+            self.mark(layer_id, feature.id())
+
+    def on_rolled_back(self, layer_id):
+        """The edits of the session are gone, and with them their marks."""
+        self.dirty[layer_id] = self.snapshots.pop(layer_id, {})
+
+    def dirty_marks(self, layer):
+        """Return {feature id: edit sequence number} of the dirty features of layer."""
+        return dict(self.dirty.get(layer.id(), {}))
+
+    def mark_clean(self, layer, marks):
+        """Clear the marks returned by dirty_marks() that were not edited again since."""
+        dirty = self.dirty.get(layer.id())
+        if dirty is None:
+            return
+        for fid, sequence in marks.items():
+            if dirty.get(fid) == sequence:
+                del dirty[fid]
+
+
+def dirty_neighbourhood(layer, dirty_ids, gap_tolerance, snapping_distance):
+    """Find the features to clean again around the dirty features of layer.
+
+    The core is the dirty features plus every feature within gap tolerance
+    plus snapping distance of one of them: the features an edit can have
+    opened a gap or made an overlap with. The halo is the features around
+    the core, cleaned with it so the core's outer edges stay in place;
+    their results are discarded. Only rectangles around the dirty features
+    are read from the layer, so the cost does not depend on the layer size.
+
+    :param dirty_ids: Ids of the edited features
+    :param snapping_distance: Snapping distance, -1 is resolved against the layer extent
+    :return: Tuple (core features, halo features, snapping distance used)
+    """
+    snapping_distance = resolve_snapping_distance(snapping_distance, layer.extent())
+    reach = gap_tolerance + snapping_distance
+
+    request = QgsFeatureRequest().setFilterFids(list(dirty_ids)).setSubsetOfAttributes([])
+    dirty = {feature.id(): feature for feature in layer.getFeatures(request)
+             if feature.hasGeometry()}
+    if not dirty:
+        return [], [], snapping_distance
+
+    # Index of the dirty geometries, to test each candidate against the nearby ones only
+    index = QgsSpatialIndex()
+    for feature in dirty.values():
+        index.addFeature(feature)
+
+    core = dict(dirty)
+    for feature in features_near(layer, dirty.values(), reach):
+        if feature.id() in core:
+            continue
+        geometry = feature.geometry()
+        candidates = index.intersects(geometry.boundingBox().buffered(reach))
+        if any(geometry.distance(dirty[fid].geometry()) <= reach for fid in candidates):
+            core[feature.id()] = feature
+
+    halo = [feature for feature in features_near(layer, core.values(), 2 * reach)
+            if feature.id() not in core]
+    log_message(lambda: f"Dirty neighbourhood: {len(dirty)} edited, "
+                f"{len(core) - len(dirty)} neighbours, {len(halo)} halo features")
+    return list(core.values()), halo, snapping_distance
+
+
+def features_near(layer, features, distance):
+    """Read the features of layer whose bounding box is within distance of one of features.
+
+    Nearby features share one rectangle request, so a handful of scattered
+    edits costs a handful of indexed reads.
+    """
+    rects = []
+    for feature in features:
+        rect = feature.geometry().boundingBox().buffered(distance)
+        for merged in rects:
+            if merged.intersects(rect):
+                merged.combineExtentWith(rect)
+                break
+        else:
+            rects.append(QgsRectangle(rect))
+
+    seen = set()
+    for rect in rects:
+        request = QgsFeatureRequest().setFilterRect(rect).setSubsetOfAttributes([])
+        for feature in layer.getFeatures(request):
+            if feature.id() not in seen and feature.hasGeometry():
+                seen.add(feature.id())
+                yield feature
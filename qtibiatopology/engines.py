@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Cleaning engine interface and automatic engine selection. Backends are
+ imported only when they are used.
+"""
+import importlib.util
+import math
+import time
+
+ENGINE_AUTO = "auto"
+ENGINE_POSTGIS = "postgis"
+ENGINE_GEOS = "geos"
+
+# GEOS derives the automatic snapping distance (-1) from the diameter of the
+# input extent divided by this factor.
+AUTO_SNAPPING_FACTOR = 1.0e8
+
+# Up to this many features the local GEOS engine is preferred when it is
+# available: the PostGIS network round trip dominates small runs.
+LOCAL_ENGINE_MAX_FEATURES = 5000
+
+# Reported when psycopg is missing; the plugin never installs it on its own
+PSYCOPG_MISSING = ("PostGIS engine selected, but psycopg is not installed in the Python used by "
+                   "QGIS; install it (e.g. python -m pip install \"psycopg[binary]\") or choose "
+                   "the local GEOS engine")
+
+
+class CleaningResult:
+    """Outcome of a clean: the geometries that changed and how many did not.
+
+    Engines compare input and output where the cleaning ran, so unchanged
+    geometries are never transferred or decoded.
+    """
+
+    def __init__(self, changed, total):
+        """Constructor.
+
+        :param changed: (input index, cleaned QgsGeometry) tuples: a list, or a
+            ResultSpool that decodes them one at a time while they are iterated
+        :param total: Number of features cleaned
+        """
+        self.changed = changed
+        self.total = total
+
+    @property
+    def unchanged(self):
+        """Number of features whose geometry was already clean."""
+        return self.total - len(self.changed)
+
+
+class SweepResult:
+    """Outcome of one parameter combination of a sweep."""
+
+    def __init__(self, gap_tolerance, snapping_distance, merge_strategy, result, seconds,
+                 area_delta, area_changed):
+        """Constructor.
+
+        :param result: CleaningResult of the combination
+        :param seconds: Time spent cleaning with this combination
+        :param area_delta: Net change of the total area of the changed features
+        :param area_changed: Sum of the absolute area changes of the changed features
+        """
+        self.gap_tolerance = gap_tolerance
+        self.snapping_distance = snapping_distance
+        self.merge_strategy = merge_strategy
+        self.result = result
+        self.seconds = seconds
+        self.area_delta = area_delta
+        self.area_changed = area_changed
+
+
+# Overlap merge strategies of ST_CoverageClean, as named in sweep combinations
+MERGE_STRATEGIES = ("MERGE_LONGEST_BORDER", "MERGE_MAX_AREA", "MERGE_MIN_AREA", "MERGE_MIN_INDEX")
+
+
+def parse_combinations(text, default_strategy):
+    """Parse one "gap, snap[, strategy]" combination per line.
+
+    Strategies may be given with or without the MERGE_ prefix; empty lines
+    and lines starting with # are skipped.
+
+    :return: List of (gap_tolerance, snapping_distance, merge_strategy)
+    :raises ValueError: With the offending line number
+    """
+    combinations = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split(",")]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Line {number}: expected gap, snap[, strategy]")
+        try:
+            gap_tolerance, snapping_distance = float(parts[0]), float(parts[1])
+        except ValueError:
+            raise ValueError(f"Line {number}: gap and snap must be numbers")
+        if gap_tolerance < 0 or snapping_distance < -1:
+            raise ValueError(f"Line {number}: gap must be >= 0 and snap >= -1")
+        strategy = parts[2].upper() if len(parts) == 3 else default_strategy
+        if not strategy.startswith("MERGE_"):
+            strategy = f"MERGE_{strategy}"
+        if strategy not in MERGE_STRATEGIES:
+            raise ValueError(f"Line {number}: unknown merge strategy {parts[2]}")
+        combinations.append((gap_tolerance, snapping_distance, strategy))
+    if not combinations:
+        raise ValueError("Enter at least one combination")
+    return combinations
+
+
+class CleaningEngine:
+    """Interface of a coverage cleaning backend.
+
+    An engine takes the features to clean and returns a CleaningResult with
+    the geometries that changed. clean() runs on a worker thread, so it must
+    not touch layers or the GUI.
+    """
+
+    #: Key stored in the settings
+    name = None
+    #: Name shown to the user
+    label = None
+
+    @classmethod
+    def is_available(cls):
+        """Return True when the engine's dependencies are installed."""
+        raise NotImplementedError
+
+    @property
+    def result_variant(self):
+        """Key keeping apart cached results of settings that change the output."""
+        return self.name
+
+    @property
+    def sweep_variant(self):
+        """Cache key variant of the results of sweep(), which runs clean() by default."""
+        return self.result_variant
+
+    def clean(self, features, gap_tolerance, snapping_distance, merge_strategy, task=None):
+        """Clean the coverage formed by features.
+
+        :param features: List of QgsFeature objects
+        :param gap_tolerance: Maximum gap width to clean
+        :param snapping_distance: Snapping distance (-1=auto, 0=disabled, >0=custom)
+        :param merge_strategy: Strategy for merging overlaps, e.g. MERGE_LONGEST_BORDER
+        :param task: Optional CoverageCleaningTask receiving progress and cancellation
+        :return: CleaningResult with the changed geometries by input index
+        """
+        raise NotImplementedError
+
+    def sweep(self, features, combinations, task=None):
+        """Clean the same features with several parameter combinations.
+
+        The default runs clean() once per combination; engines that can
+        share the input between combinations override it.
+
+        :param features: List of QgsFeature objects, or a SelectionStream
+        :param combinations: List of (gap_tolerance, snapping_distance, merge_strategy)
+        :return: List of SweepResult, one per combination in the same order
+        """
+        sweeps = []
+        # One pass over the input: features may be a SelectionStream, which
+        # has no random access
+        areas = [feature.geometry().area() for feature in features]
+        for gap_tolerance, snapping_distance, merge_strategy in combinations:
+            start = time.perf_counter()
+            result = self.clean(features, gap_tolerance, snapping_distance, merge_strategy, task)
+            seconds = time.perf_counter() - start
+            deltas = [geom.area() - areas[idx] for idx, geom in result.changed]
+            sweeps.append(SweepResult(gap_tolerance, snapping_distance, merge_strategy, result,
+                                      seconds, sum(deltas), sum(abs(d) for d in deltas)))
+        return sweeps
+
+
+def resolve_snapping_distance(snapping_distance, extent):
+    """Turn an automatic snapping distance (-1) into the value GEOS would use for extent.
+
+    Needed whenever a coverage is cleaned in pieces: each piece would
+    otherwise derive its own distance from its own, smaller extent.
+
+    :param extent: QgsRectangle of the whole input
+    """
+    if snapping_distance >= 0:
+        return snapping_distance
+    return math.hypot(extent.width(), extent.height()) / AUTO_SNAPPING_FACTOR
+
+
+def postgis_available():
+    """PostGIS needs psycopg on the client; the server is only checked when connecting."""
+    return importlib.util.find_spec("psycopg") is not None
+
+
+def geos_available():
+    """Return True when the local GEOS coverage cleaner can be used."""
+    from .geos_engine import GeosEngine
+    return GeosEngine.is_available()
+
+
+def choose_engine(preference, feature_count):
+    """Pick the engine for a run.
+
+    :param preference: ENGINE_AUTO, ENGINE_POSTGIS or ENGINE_GEOS
+    :param feature_count: Number of features to clean
+    :return: ENGINE_POSTGIS or ENGINE_GEOS
+    """
+    if preference == ENGINE_GEOS:
+        if not geos_available():
+            raise RuntimeError("Local GEOS engine selected, but the installed shapely/GEOS "
+                               "has no coverage cleaning support")
+        return ENGINE_GEOS
+    if preference == ENGINE_POSTGIS:
+        if not postgis_available():
+            raise RuntimeError(PSYCOPG_MISSING)
+        return ENGINE_POSTGIS
+
+    if feature_count <= LOCAL_ENGINE_MAX_FEATURES and geos_available():
+        return ENGINE_GEOS
+    if postgis_available():
+        return ENGINE_POSTGIS
+    if geos_available():
+        return ENGINE_GEOS
+    raise RuntimeError("No cleaning engine available: install psycopg for PostGIS "
+                       "or a shapely build with GEOS 3.14+ for local cleaning")
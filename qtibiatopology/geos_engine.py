@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Local engine: cleans coverages in-process with the GEOS CoverageCleaner
+ through shapely, without a database.
+"""
+import functools
+
+from .engines import ENGINE_GEOS, CleaningEngine, CleaningResult
+from .profiling import profile_of
+from .utils import (PROGRESS_INTERVAL, geometry_wkb, log_message, log_simplification,
+                    report_stage, wkb_to_geom)
+
+# shapely spells the overlap merge strategies in lower case without prefix
+MERGE_STRATEGIES = {
+    "MERGE_LONGEST_BORDER": "longest_border",
+    "MERGE_MAX_AREA": "max_area",
+    "MERGE_MIN_AREA": "min_area",
+    "MERGE_MIN_INDEX": "min_index",
+}
+
+
+@functools.lru_cache(maxsize=1)
+def shapely_coverage_clean():
+    """Return shapely's coverage_clean, or None when shapely or GEOS lacks it.
+
+    Coverage cleaning needs GEOS 3.14+ and a shapely release exposing it.
+    """
+    try:
+        import shapely
+    except ImportError:
+        return None
+    return getattr(shapely, "coverage_clean", None)
+
+
+class GeosEngine(CleaningEngine):
+    """Cleans coverages in-process with GEOS, no database round trip.
+
+    The same CoverageCleaner algorithm runs behind PostGIS ST_CoverageClean,
+    so both engines produce the same coverage.
+    """
+
+    name = ENGINE_GEOS
+    label = "Local GEOS"
+
+    def __init__(self, simplify_tolerance=0.0, verbose=False):
+        """Constructor.
+
+        :param simplify_tolerance: Simplify the cleaned coverage with
+            coverage_simplify at this tolerance, 0 to keep every vertex
+        :param verbose: Enable verbose logging
+        """
+        self.simplify_tolerance = simplify_tolerance
+        self.verbose = verbose
+
+    @property
+    def result_variant(self):
+        """Simplified runs are cached apart from plain ones."""
+        if self.simplify_tolerance > 0:
+            return f"{self.name}:simplify{self.simplify_tolerance:g}"
+        return self.name
+
+    @classmethod
+    def is_available(cls):
+        """Available when shapely exposes GEOS coverage cleaning."""
+        return shapely_coverage_clean() is not None
+
+    def clean(self, features, gap_tolerance, snapping_distance, merge_strategy, task=None):
+        """Clean coverage in-process with GEOS."""
+        import numpy
+        import shapely
+
+        log_message(lambda: f"GEOS clean called with {len(features)} features, tolerance={gap_tolerance}, "
+                    f"snapping={snapping_distance}, strategy={merge_strategy}", verbose=self.verbose)
+
+        report_stage(task, "serialize")
+        wkbs = []
+        for idx, feature in enumerate(features):
+            if idx % PROGRESS_INTERVAL == 0:
+                report_stage(task, "serialize", idx / len(features))
+            wkbs.append(geometry_wkb(feature.geometry()))
+        geoms = shapely.from_wkb(wkbs)
+
+        # GEOS releases the GIL while cleaning, but the call can't be interrupted
+        report_stage(task, "clean")
+        cleaned = shapely_coverage_clean()(
+            geoms,
+            gap_width=gap_tolerance,
+            snapping_distance=snapping_distance,
+            merge_strategy=MERGE_STRATEGIES[merge_strategy],
+        )
+        if isinstance(cleaned, shapely.Geometry):
+            # A single collection comes back when the input was taken as one coverage
+            cleaned = shapely.get_parts(cleaned)
+        if len(cleaned) != len(features):
+            raise RuntimeError(f"GEOS returned {len(cleaned)} geometries for {len(features)} inputs")
+        if self.simplify_tolerance > 0:
+            # The outer boundary stays, as on PostGIS: it is shared with the rest of the layer
+            cleaned = shapely.coverage_simplify(cleaned, self.simplify_tolerance,
+                                                simplify_boundary=False)
+            log_simplification(self.simplify_tolerance,
+                               int(shapely.get_num_coordinates(geoms).sum()),
+                               int(shapely.get_num_coordinates(cleaned).sum()), profile_of(task))
+
+        # Exact vertex-by-vertex comparison, like ST_OrderingEquals on the server
+        report_stage(task, "fetch")
+        changed_idx = numpy.flatnonzero(~shapely.equals_exact(geoms, cleaned, tolerance=0.0))
+        results = shapely.to_wkb(cleaned[changed_idx], flavor="iso")
+
+        changed = []
+        for done, (idx, wkb) in enumerate(zip(changed_idx, results)):
+            if done % PROGRESS_INTERVAL == 0:
+                report_stage(task, "decode", done / len(results))
+            changed.append((int(idx), wkb_to_geom(wkb)))
+
+        log_message(lambda: f"Returning {len(changed)} changed geometries, "
+                    f"{len(features) - len(changed)} unchanged", verbose=self.verbose)
+        return CleaningResult(changed, len(features))
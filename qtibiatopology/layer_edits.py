@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Writing cleaned geometries back to a layer in one batch: either as a
+ single undo command in the edit buffer, or straight to the data provider.
+"""
+from contextlib import contextmanager
+from itertools import chain, islice
+
+from qgis.core import QgsVectorDataProvider
+
+from .utils import log_message
+
+# Direct writes hand the provider this many geometries per changeGeometryValues() call
+DIRECT_BATCH_SIZE = 5000
+
+
+@contextmanager
+def frozen_canvas(canvas):
+    """Hold back map canvas redraws until the with block ends, then refresh once."""
+    if canvas is None:
+        yield
+        return
+    was_frozen = canvas.isFrozen()
+    canvas.freeze(True)
+    try:
+        yield
+    finally:
+        canvas.freeze(was_frozen)
+        if not was_frozen:
+            canvas.refresh()
+
+
+def supports_direct_writes(layer):
+    """Return True when the layer's provider can change geometries itself."""
+    provider = layer.dataProvider()
+    return bool(provider.capabilities() & QgsVectorDataProvider.ChangeGeometries)
+
+
+def apply_geometry_changes(layer, changes, direct=False, canvas=None,
+                           description="Clean coverage"):
+    """Write changed geometries to layer in one batch.
+
+    In the edit buffer the changes form a single undo command, so one undo
+    reverts the whole run. The layer's signals are blocked while the
+    changes are made; dataChanged is emitted once afterwards, so attribute
+    tables, snapping indexes and the renderer refresh once instead of once
+    per feature.
+
+    With direct=True the geometries go straight to the data provider with
+    changeGeometryValues(), bypassing the edit buffer and the undo stack.
+
+    :param changes: Iterable of (feature id, QgsGeometry) tuples
+    :param direct: Write to the data provider instead of the edit buffer
+    :param canvas: Optional QgsMapCanvas to freeze while applying
+    :param description: Text of the undo command
+    :return: Number of geometries written; the layer is left alone when
+        there are none
+    """
+    changes = iter(changes)
+    first = next(changes, None)
+    if first is None:
+        return 0
+    changes = chain((first,), changes)
+
+    with frozen_canvas(canvas):
+        if direct:
+            count = _apply_direct(layer, changes)
+        else:
+            count = _apply_to_edit_buffer(layer, changes, description)
+    layer.triggerRepaint()
+    return count
+
+
+def _apply_to_edit_buffer(layer, changes, description):
+    if not layer.isEditable():
+        log_message("Starting edit mode on layer")
+        layer.startEditing()
+
+    count = 0
+    layer.beginEditCommand(description)
+    blocked = layer.blockSignals(True)
+    try:
+        for fid, geom in changes:
+            layer.changeGeometry(fid, geom)
+            count += 1
+    except Exception:
+        layer.blockSignals(blocked)
+        layer.destroyEditCommand()
+        raise
+    layer.blockSignals(blocked)
+    layer.endEditCommand()
+    if count:
+        layer.dataChanged.emit()
+    return count
+
+
+def _apply_direct(layer, changes):
+    if not supports_direct_writes(layer):
+        raise RuntimeError(f"The data provider of {layer.name()} can't change geometries")
+
+    provider = layer.dataProvider()
+    count = 0
+    while True:
+        batch = dict(islice(changes, DIRECT_BATCH_SIZE))
+        if not batch:
+            break
+        if not provider.changeGeometryValues(batch):
+            errors = "; ".join(provider.errors()) or "unknown error"
+            raise RuntimeError(f"Writing geometries to {layer.name()} failed after "
+                               f"{count} features: {errors}")
+        count += len(batch)
+    if count:
+        # The provider changed underneath the layer's caches
+        layer.reload()
+    return count
@@ -0,0 +1,1695 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ PostGIS backend: stages the geometries in a pooled session and cleans
+ them with the ST_CoverageClean window function.
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from PyQt5.QtCore import QVariant
+from qgis.core import Qgis, QgsDataSourceUri, QgsWkbTypes
+import psycopg
+from psycopg import sql
+from psycopg.pq import TransactionStatus
+
+from .engines import (AUTO_SNAPPING_FACTOR, ENGINE_POSTGIS, CleaningEngine, CleaningResult,
+                      SweepResult, postgis_available)
+from .cluster_jobs import distribute_jobs, plan_cluster_jobs
+from .diagnostics import ServerDiagnostics
+from .profiling import profile_of
+from .spool import ResultSpool
+from .utils import (PROGRESS_INTERVAL, CleaningCanceled, geometry_wkb, iter_feature_wkb,
+                    log_message, log_simplification, report_stage, watch_connection,
+                    wkb_to_geom)
+from .wkb import twkb_to_wkb, wkb_to_twkb_rounded
+
+
+# Staging table for the geometries sent to PostGIS. cluster_id is only
+# filled in when the selection is cleaned in partitioned mode.
+COVERAGE_INPUT_DDL = """
+    CREATE TEMP TABLE coverage_input (
+        feature_order INTEGER PRIMARY KEY,
+        geom geometry,
+        cluster_id INTEGER
+    )
+"""
+
+# Staging table for compact (TWKB) uploads; COPY can't parse TWKB into a
+# geometry column, so rows land here and are converted in one INSERT ... SELECT.
+# Diagnostics stage plain WKB here as well.
+COVERAGE_INPUT_TWKB_DDL = """
+    CREATE TEMP TABLE coverage_input_twkb (
+        feature_order INTEGER PRIMARY KEY,
+        twkb bytea,
+        cluster_id INTEGER
+    )
+"""
+
+# Parses the staged rows into coverage_input. {geom_from} is ST_GeomFromTWKB,
+# or ST_GeomFromWKB when diagnostics stage WKB to time its parsing.
+STAGED_INPUT_SQL = """
+    INSERT INTO coverage_input (feature_order, geom, cluster_id)
+    SELECT feature_order, {geom_from}(twkb), cluster_id
+    FROM coverage_input_twkb
+"""
+
+# Result rows of a query explained by explain_into_result()
+RESULT_TABLE_SQL = "SELECT * FROM coverage_result ORDER BY feature_order"
+
+# Input and output are compared on the server and only rows that changed are
+# returned: ST_OrderingEquals is the same exact, vertex-by-vertex test as
+# QgsGeometry.equals(). A geometry that became (or stopped being) NULL counts
+# as changed.
+CHANGED_ROWS_FILTER = """
+    WHERE (clean IS NULL) <> (geom IS NULL) OR NOT ST_OrderingEquals(clean, geom)
+"""
+
+# Cleans the whole staging table in one window. Parameters are bound, so the
+# statement is prepared once per pooled session and reused across runs.
+# {output} is filled in by geometry_output().
+CLEAN_SQL = """
+    SELECT feature_order, {output} AS geom
+    FROM (
+        SELECT
+            feature_order,
+            geom,
+            ST_CoverageClean(geom, %s::float8, %s::float8, %s::text) OVER () AS clean
+        FROM coverage_input
+    ) c
+""" + CHANGED_ROWS_FILTER + """
+    ORDER BY feature_order
+"""
+
+# Cleans one or more clusters, each in its own window. Ordering the window by
+# feature_order keeps the input index that MERGE_MIN_INDEX relies on.
+CLUSTER_CLEAN_SQL = """
+    SELECT feature_order, {output} AS geom
+    FROM (
+        SELECT
+            feature_order,
+            geom,
+            ST_CoverageClean(geom, %s::float8, %s::float8, %s::text)
+                OVER (PARTITION BY cluster_id ORDER BY feature_order) AS clean
+        FROM coverage_input
+        WHERE cluster_id = ANY(%s)
+    ) c
+""" + CHANGED_ROWS_FILTER
+
+# Simplification fused into the cleaning query: ST_CoverageSimplify runs in
+# a second window over the cleaned coverage, so the result stays a valid
+# coverage and still arrives in one round trip. The outer boundary of the
+# run is kept (simplifyBoundary false): edges shared with features outside
+# the selection stay matched. Changed rows carry their vertex count before
+# and after. The simplify tolerance is the first parameter.
+SIMPLIFY_CLEAN_SQL = """
+    SELECT feature_order, {output} AS geom,
+           ST_NPoints(geom) AS vertices_in, ST_NPoints(clean) AS vertices_out
+    FROM (
+        SELECT
+            feature_order,
+            geom,
+            ST_CoverageSimplify(clean, %s::float8, false) OVER () AS clean
+        FROM (
+            SELECT
+                feature_order,
+                geom,
+                ST_CoverageClean(geom, %s::float8, %s::float8, %s::text) OVER () AS clean
+            FROM coverage_input
+        ) c
+    ) s
+""" + CHANGED_ROWS_FILTER + """
+    ORDER BY feature_order
+"""
+
+SIMPLIFY_CLUSTER_CLEAN_SQL = """
+    SELECT feature_order, {output} AS geom,
+           ST_NPoints(geom) AS vertices_in, ST_NPoints(clean) AS vertices_out
+    FROM (
+        SELECT
+            feature_order,
+            geom,
+            ST_CoverageSimplify(clean, %s::float8, false) OVER (PARTITION BY cluster_id) AS clean
+        FROM (
+            SELECT
+                feature_order,
+                geom,
+                cluster_id,
+                ST_CoverageClean(geom, %s::float8, %s::float8, %s::text)
+                    OVER (PARTITION BY cluster_id ORDER BY feature_order) AS clean
+            FROM coverage_input
+            WHERE cluster_id = ANY(%s)
+        ) c
+    ) s
+""" + CHANGED_ROWS_FILTER
+
+VERTEX_COUNT_SQL = "SELECT COALESCE(sum(ST_NPoints(geom)), 0) FROM coverage_input"
+
+# Validity probe, step 1: ST_CoverageInvalidEdges returns the edges of each
+# polygon that break the coverage (overlaps, unmatched vertices and gaps
+# narrower than the tolerance), or NULL when the polygon is fine
+PROBE_INVALID_SQL = """
+    SELECT feature_order
+    FROM (
+        SELECT feature_order, ST_CoverageInvalidEdges(geom, %s::float8) OVER () AS invalid
+        FROM coverage_input
+    ) c
+    WHERE invalid IS NOT NULL
+"""
+
+# Validity probe, step 2: gaps the clean would fill are holes of the coverage
+# union whose maximum inscribed circle fits in the gap width. The polygons
+# flagged in step 1 are left out, so the union is taken over a valid coverage.
+PROBE_GAPS_SQL = """
+    WITH parts AS (
+        SELECT (ST_Dump(ST_CoverageUnion(geom))).geom AS geom
+        FROM coverage_input
+        WHERE NOT feature_order = ANY(%s::int[])
+    ), holes AS (
+        SELECT ST_MakePolygon(ST_InteriorRingN(geom, n)) AS hole
+        FROM parts, generate_series(1, ST_NumInteriorRings(geom)) AS n
+    )
+    SELECT DISTINCT c.feature_order
+    FROM holes h
+    JOIN coverage_input c ON ST_Intersects(c.geom, h.hole)
+    WHERE (ST_MaximumInscribedCircle(h.hole)).radius * 2 <= %s::float8
+"""
+
+# Neighbourhood of the flagged polygons, as for incremental runs: the core
+# (cluster_id 0) is every polygon within reach of a flagged one, the halo
+# (cluster_id 1) the polygons around the core that keep its outer edges in place
+PROBE_CORE_SQL = """
+    UPDATE coverage_input c
+    SET cluster_id = 0
+    WHERE EXISTS (
+        SELECT 1 FROM coverage_input f
+        WHERE f.feature_order = ANY(%s::int[]) AND ST_DWithin(c.geom, f.geom, %s::float8)
+    )
+"""
+
+PROBE_HALO_SQL = """
+    UPDATE coverage_input c
+    SET cluster_id = 1
+    WHERE c.cluster_id IS NULL AND EXISTS (
+        SELECT 1 FROM coverage_input k
+        WHERE k.cluster_id = 0 AND ST_DWithin(c.geom, k.geom, %s::float8)
+    )
+"""
+
+# Cleans core and halo in one window and returns the changed core rows; used
+# by the validity probe and by the pieces of a time-budgeted run
+PROBE_CLEAN_SQL = """
+    SELECT feature_order, {output} AS geom
+    FROM (
+        SELECT
+            feature_order,
+            geom,
+            cluster_id,
+            ST_CoverageClean(geom, %s::float8, %s::float8, %s::text)
+                OVER (ORDER BY feature_order) AS clean
+        FROM coverage_input
+        WHERE cluster_id IN (0, 1)
+    ) c
+    WHERE cluster_id = 0
+      AND ((clean IS NULL) <> (geom IS NULL) OR NOT ST_OrderingEquals(clean, geom))
+    ORDER BY feature_order
+"""
+
+# Above this share of the input in core and halo, the probe gives way to a full clean
+PROBE_LOCAL_MAX_SHARE = 0.5
+
+# Time budget: when a clean runs into statement_timeout, the input is cut in
+# two at the median bounding box centre along its wider axis and each half
+# (a piece) is cleaned with a halo, recursively. A piece owns the rows whose
+# bounding box centre lies in its half-open box (xmin, xmax, ymin, ymax).
+PIECE_CENTRE_X = "(ST_XMin(geom) + ST_XMax(geom)) / 2"
+PIECE_CENTRE_Y = "(ST_YMin(geom) + ST_YMax(geom)) / 2"
+IN_PIECE = f"""
+    {PIECE_CENTRE_X} >= %s AND {PIECE_CENTRE_X} < %s
+    AND {PIECE_CENTRE_Y} >= %s AND {PIECE_CENTRE_Y} < %s
+"""
+
+BUDGET_SPLIT_SQL = f"""
+    SELECT count(*), max(cx) - min(cx), max(cy) - min(cy),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY cx),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY cy)
+    FROM (
+        SELECT {PIECE_CENTRE_X} AS cx, {PIECE_CENTRE_Y} AS cy
+        FROM coverage_input
+        WHERE geom IS NOT NULL AND {IN_PIECE}
+    ) c
+"""
+
+BUDGET_RESET_SQL = "UPDATE coverage_input SET cluster_id = NULL WHERE cluster_id IS NOT NULL"
+
+# Core of a piece (cluster_id 0); PROBE_CLEAN_SQL then cleans it with its halo
+BUDGET_CORE_SQL = f"UPDATE coverage_input SET cluster_id = 0 WHERE {IN_PIECE}"
+
+# Halo of a piece (cluster_id 1): rows touching the extent of the core grown
+# by the halo width. A bounding box test, so no pair of rows is compared.
+BUDGET_HALO_SQL = """
+    UPDATE coverage_input c
+    SET cluster_id = 1
+    FROM (
+        SELECT ST_Expand(ST_Extent(geom)::geometry, %s::float8) AS box
+        FROM coverage_input
+        WHERE cluster_id = 0
+    ) k
+    WHERE c.cluster_id IS NULL AND c.geom && k.box
+"""
+
+# Deepest split of a time-budgeted run: at most 2^depth pieces
+BUDGET_MAX_DEPTH = 8
+
+# Parameter sweeps: the combinations and the changed rows of each combination
+# are kept next to coverage_input, so the input is uploaded only once
+SWEEP_PARAMS_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS coverage_sweep_params (
+        combo INTEGER PRIMARY KEY,
+        gap float8,
+        snap float8,
+        strategy text,
+        seconds float8
+    )
+"""
+
+SWEEP_RESULTS_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS coverage_sweep (
+        combo INTEGER,
+        feature_order INTEGER,
+        geom geometry
+    )
+"""
+
+SWEEP_PARAMS_SQL = """
+    INSERT INTO coverage_sweep_params (combo, gap, snap, strategy)
+    SELECT idx - 1, gap, snap, strategy
+    FROM unnest(%s::float8[], %s::float8[], %s::text[]) WITH ORDINALITY AS p(gap, snap, strategy, idx)
+"""
+
+# Cleans the staged input once per combination and times each clean on the
+# server, so the runtimes don't include the network
+SWEEP_LOOP_SQL = """
+    DO $$
+    DECLARE
+        p record;
+        started timestamptz;
+    BEGIN
+        FOR p IN SELECT * FROM coverage_sweep_params ORDER BY combo LOOP
+            started := clock_timestamp();
+            INSERT INTO coverage_sweep (combo, feature_order, geom)
+            SELECT p.combo, feature_order, clean
+            FROM (
+                SELECT feature_order, geom,
+                       ST_CoverageClean(geom, p.gap, p.snap, p.strategy) OVER () AS clean
+                FROM coverage_input
+            ) c
+            WHERE (clean IS NULL) <> (geom IS NULL) OR NOT ST_OrderingEquals(clean, geom);
+            UPDATE coverage_sweep_params
+            SET seconds = extract(epoch FROM clock_timestamp() - started)
+            WHERE combo = p.combo;
+        END LOOP;
+    END
+    $$
+"""
+
+SWEEP_SUMMARY_SQL = """
+    SELECT p.combo, p.seconds,
+           COALESCE(sum(d.delta), 0)::float8,
+           COALESCE(sum(abs(d.delta)), 0)::float8
+    FROM coverage_sweep_params p
+    LEFT JOIN (
+        SELECT s.combo,
+               COALESCE(ST_Area(s.geom), 0) - COALESCE(ST_Area(i.geom), 0) AS delta
+        FROM coverage_sweep s
+        JOIN coverage_input i USING (feature_order)
+    ) d ON d.combo = p.combo
+    GROUP BY p.combo, p.seconds
+    ORDER BY p.combo
+"""
+
+SWEEP_ROWS_SQL = """
+    SELECT combo, feature_order, {output}
+    FROM coverage_sweep
+    ORDER BY combo, feature_order
+"""
+
+# Staged rows whose upload TWKB rounding moved, see WirePayload.add_rounded()
+ROUNDED_ROWS_SQL = """
+    SELECT feature_order, {output}
+    FROM coverage_input
+    WHERE feature_order = ANY(%s)
+    ORDER BY feature_order
+"""
+
+# Idle connections kept per pg_service, and how long an idle connection is
+# trusted before it is pinged on checkout.
+POOL_MAX_IDLE = 4
+POOL_CHECK_IDLE_SECONDS = 60
+
+# Changed rows of a single-window clean are pulled from a server-side cursor
+# this many at a time, so the client never holds the whole result set
+FETCH_BATCH_ROWS = 2000
+
+def geometry_output(column, precision=None):
+    """SQL expression returning column as ISO WKB, or as TWKB at precision decimals."""
+    if precision is None:
+        return f"ST_AsBinary({column})"
+    return f"ST_AsTWKB({column}, {int(precision)})"
+
+
+def explain_into_result(cur, diagnostics, label, query, params):
+    """Run a cleaning query under EXPLAIN ANALYZE, keeping its rows in coverage_result.
+
+    EXPLAIN ANALYZE discards the rows of a SELECT, so the query runs as
+    CREATE TEMP TABLE ... AS and the rows are read back with
+    RESULT_TABLE_SQL. The plan then covers the clean and the output
+    encoding, and reading the table back is the transfer alone.
+    """
+    cur.execute("DROP TABLE IF EXISTS coverage_result")
+    diagnostics.explain(cur, label, "CREATE TEMP TABLE coverage_result ON COMMIT DROP AS " + query,
+                        params)
+
+
+def fetch_batches(conn, query, params, batch_rows=FETCH_BATCH_ROWS):
+    """Yield the rows of query in lists of up to batch_rows, from a server-side cursor.
+
+    A named cursor is DECLAREd rather than prepared, so the statement is
+    planned per run; that is negligible next to the clean itself. Must run
+    inside a transaction.
+    """
+    with conn.cursor(name="coverage_result", binary=True) as cur:
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_rows)
+            if not rows:
+                return
+            yield rows
+
+
+@contextmanager
+def statement_timeout(cur, seconds):
+    """Limit every statement run within the block to seconds.
+
+    Set with set_config(..., true), so it ends with the transaction at the
+    latest; the previous value is restored when the block is left, unless
+    an error aborted the transaction anyway.
+    """
+    cur.execute("SELECT current_setting('statement_timeout')")
+    previous = cur.fetchone()[0]
+    cur.execute("SELECT set_config('statement_timeout', %s, true)", (f"{int(seconds * 1000)}ms",))
+    try:
+        yield
+    finally:
+        if cur.connection.info.transaction_status == TransactionStatus.INTRANS:
+            cur.execute("SELECT set_config('statement_timeout', %s, true)", (previous,))
+
+
+# Errors meaning the server (or a pooler in front of it) refuses COPY, so
+# the rows are inserted instead. Anything else, a timeout or a cancel
+# included, fails the load.
+COPY_REFUSED_ERRORS = (psycopg.errors.FeatureNotSupported, psycopg.errors.InsufficientPrivilege)
+
+
+def load_coverage_input(cur, make_rows, use_copy=True, with_cluster=False, twkb=False,
+                        diagnostics=None):
+    """Load (feature_order, WKB[, cluster_id]) rows into coverage_input.
+
+    Rows are streamed with binary COPY; PostGIS reads the raw WKB through the
+    geometry type's binary input, so no ST_GeomFromWKB call is needed per row.
+    When COPY is refused (permissions, poolers, proxies; see
+    COPY_REFUSED_ERRORS) the load is rolled back to a savepoint and repeated
+    with executemany.
+
+    :param make_rows: Callable returning a fresh iterator over the rows
+    :param use_copy: Try binary COPY before falling back to executemany
+    :param with_cluster: Rows carry a third cluster_id value
+    :param twkb: Rows carry TWKB instead of WKB; COPY goes through coverage_input_twkb
+    :param diagnostics: ServerDiagnostics; COPY then goes through coverage_input_twkb
+        too, and the INSERT parsing the geometries is explained
+    :return: Name of the method that loaded the rows
+    """
+    geom_from = "ST_GeomFromTWKB" if twkb else "ST_GeomFromWKB"
+    if with_cluster:
+        columns, types = "feature_order, geom, cluster_id", ["int4", "bytea", "int4"]
+        insert_sql = f"""INSERT INTO coverage_input (feature_order, geom, cluster_id)
+                         VALUES (%s, {geom_from}(%s), %s)"""
+    else:
+        columns, types = "feature_order, geom", ["int4", "bytea"]
+        insert_sql = f"""INSERT INTO coverage_input (feature_order, geom)
+                         VALUES (%s, {geom_from}(%s))"""
+
+    if use_copy:
+        target = "coverage_input"
+        staged = twkb or diagnostics is not None
+        if staged:
+            target = "coverage_input_twkb"
+            columns = columns.replace("geom", "twkb")
+        try:
+            with cur.connection.transaction():
+                if staged:
+                    cur.execute("TRUNCATE coverage_input_twkb")
+                with cur.copy(f"COPY {target} ({columns}) FROM STDIN (FORMAT BINARY)") as copy:
+                    copy.set_types(types)
+                    for row in make_rows():
+                        copy.write_row(row)
+                if staged:
+                    staged_sql = STAGED_INPUT_SQL.format(geom_from=geom_from)
+                    if diagnostics is not None:
+                        diagnostics.explain(cur, f"insert ({geom_from})", staged_sql)
+                    else:
+                        cur.execute(staged_sql)
+                    cur.execute("TRUNCATE coverage_input_twkb")
+            return "COPY"
+        except COPY_REFUSED_ERRORS as e:
+            log_message(f"COPY not available, falling back to executemany: {e}", Qgis.Warning)
+
+    # Batch insert using executemany for better performance
+    cur.executemany(insert_sql, make_rows())
+    return "executemany"
+
+
+def run_cluster_job(cur, job, params, output, simplify_tolerance=0.0, diagnostics=None):
+    """Clean the clusters of one job and time the query.
+
+    :param params: Tuple (gap_tolerance, snapping_distance, merge_strategy)
+    :param output: Geometry output expression, from geometry_output()
+    :param simplify_tolerance: Simplify each cleaned cluster at this tolerance, 0 to keep
+        every vertex; the rows then carry their vertex counts (see VertexTally)
+    :param diagnostics: ServerDiagnostics explaining the query, see explain_into_result()
+    :return: Tuple (list of (feature_order, WKB) rows, (cluster ids, size, seconds))
+    """
+    cluster_ids, size = job
+    start = time.perf_counter()
+    if simplify_tolerance > 0:
+        query = SIMPLIFY_CLUSTER_CLEAN_SQL.format(output=output)
+        params = (simplify_tolerance, *params, cluster_ids)
+    else:
+        query = CLUSTER_CLEAN_SQL.format(output=output)
+        params = (*params, cluster_ids)
+    if diagnostics is not None:
+        explain_into_result(cur, diagnostics, f"clean clusters {cluster_ids}", query, params)
+        cur.execute(RESULT_TABLE_SQL)
+    else:
+        cur.execute(query, params, prepare=True)
+    rows = cur.fetchall()
+    return rows, (cluster_ids, size, time.perf_counter() - start)
+
+
+# Cleans rows of a layer's own table in place. {multi} wraps the result in
+# ST_Multi for multi-polygon columns so unchanged features compare equal.
+# Only changed rows are returned, and only the key and the cleaned geometry;
+# they are filtered like CHANGED_ROWS_FILTER, NULL geometries included.
+IN_DATABASE_CLEANED_CTE = """
+    WITH cleaned AS (
+        SELECT {key} AS key, {geom} AS geom,
+               {multi}(ST_CoverageClean({geom}, %s::float8, %s::float8, %s::text)
+                   OVER (ORDER BY {key})) AS clean
+        FROM {table}
+        WHERE {key} = ANY(%s)
+    )
+"""
+
+IN_DATABASE_SELECT_SQL = IN_DATABASE_CLEANED_CTE + """
+    SELECT key, {output}
+    FROM cleaned
+""" + CHANGED_ROWS_FILTER + """
+    ORDER BY key
+"""
+
+IN_DATABASE_UPDATE_SQL = IN_DATABASE_CLEANED_CTE + """
+    UPDATE {table} t
+    SET {geom} = c.clean
+    FROM cleaned c
+    WHERE t.{key} = c.key
+      AND ((c.clean IS NULL) <> (c.geom IS NULL) OR NOT ST_OrderingEquals(c.clean, c.geom))
+    RETURNING t.{key}
+"""
+
+# Field types accepted as the key of an in-database clean
+INTEGER_KEY_TYPES = (QVariant.Int, QVariant.UInt, QVariant.LongLong, QVariant.ULongLong)
+
+
+class LayerTable:
+    """The PostGIS table behind a postgres provider layer.
+
+    Read from the layer's QgsDataSourceUri on the main thread; the engine
+    then cleans the selected rows where they are stored, without moving
+    the geometries through QGIS.
+    """
+
+    def __init__(self, uri, key_column, key_index, multi):
+        self.uri = uri
+        self.schema = uri.schema()
+        self.table = uri.table()
+        self.geometry_column = uri.geometryColumn()
+        self.key_column = key_column
+        self.key_index = key_index
+        self.multi = multi
+
+    @classmethod
+    def from_layer(cls, layer):
+        """Return the LayerTable of layer, or None with the reason it can't be cleaned in place.
+
+        Needs a postgres provider layer on a plain table with a geometry
+        column and a single integer primary key.
+
+        :return: Tuple (LayerTable or None, reason or None)
+        """
+        if layer.providerType() != "postgres":
+            return None, "not a PostGIS layer"
+        uri = QgsDataSourceUri(layer.source())
+        if not uri.table() or uri.table().startswith("("):
+            return None, "layer is a query, not a table"
+        if not uri.geometryColumn():
+            return None, "layer has no geometry column"
+        key_column = uri.keyColumn().strip('"')
+        if not key_column or "," in key_column:
+            return None, "layer has no single primary key column"
+        key_index = layer.fields().indexOf(key_column)
+        if key_index < 0 or layer.fields().at(key_index).type() not in INTEGER_KEY_TYPES:
+            return None, f"primary key {key_column} is not an integer field"
+        return cls(uri, key_column, key_index, QgsWkbTypes.isMultiType(layer.wkbType())), None
+
+    def is_on(self, pg_service, conn):
+        """Return True when the table lives in the database conn is connected to.
+
+        :param pg_service: Service conn was opened with
+        :param conn: Open psycopg connection
+        """
+        if self.uri.service():
+            return self.uri.service() == pg_service
+        info = conn.info
+        if self.uri.database() != info.dbname:
+            return False
+        # A socket directory can't be compared with a host name, the port still can
+        host = self.uri.host()
+        if host and not info.host.startswith("/") and host != info.host:
+            return False
+        return not self.uri.port() or int(self.uri.port()) == info.port
+
+    def compose(self, query, output=None):
+        """Fill the identifiers of this table into one of the IN_DATABASE_* queries.
+
+        :param output: Geometry output expression, from geometry_output()
+        """
+        table = (sql.Identifier(self.schema, self.table) if self.schema
+                 else sql.Identifier(self.table))
+        return sql.SQL(query).format(
+            table=table,
+            key=sql.Identifier(self.key_column),
+            geom=sql.Identifier(self.geometry_column),
+            multi=sql.SQL("ST_Multi" if self.multi else ""),
+            output=sql.SQL(output or geometry_output("clean")),
+        )
+
+    def __str__(self):
+        return f"{self.schema + '.' if self.schema else ''}{self.table}.{self.geometry_column}"
+
+
+class NotOnCleaningDatabase(Exception):
+    """Raised when a layer's table is not in the pg_service database."""
+
+
+def count_downloaded(profile, rows, with_geometry=True):
+    """Count result rows, and the WKB bytes in their last column, in a RunProfile."""
+    if profile.enabled:
+        profile.count("rows_downloaded", len(rows))
+        if with_geometry:
+            profile.count("bytes_downloaded", sum(len(row[-1]) for row in rows if row[-1]))
+
+
+class VertexTally:
+    """Vertex counts of a simplified run.
+
+    Result rows of the simplifying queries carry the vertex counts of the
+    input and output geometry. Unchanged rows are not returned, so the
+    output total is the input total corrected by the changed rows.
+    """
+
+    def __init__(self):
+        self.before = 0
+        self.changed_in = self.changed_out = 0
+
+    @property
+    def after(self):
+        return self.before - self.changed_in + self.changed_out
+
+    def strip(self, rows):
+        """Add up the counts of (feature_order, geometry, in, out) rows and drop them."""
+        stripped = []
+        for feature_order, data, vertices_in, vertices_out in rows:
+            self.changed_in += vertices_in or 0
+            self.changed_out += vertices_out or 0
+            stripped.append((feature_order, data))
+        return stripped
+
+
+class WirePayload:
+    """Geometry encoding of one run on the wire: WKB, or TWKB at a precision.
+
+    With TWKB, rows are encoded on their way into the upload and decoded
+    when results arrive, and the bytes sent are counted against the full
+    precision WKB they replace.
+
+    The server cleans the rounded coverage and only returns the rows the
+    clean changed, so a row the rounding moved but the clean left alone
+    would keep its full precision next to rounded neighbours. Those rows
+    are tracked on upload and returned as changed too (add_rounded()):
+    the whole selection comes back at the precision.
+    """
+
+    def __init__(self, precision=None, vertices=None):
+        """Constructor.
+
+        :param precision: Decimal places kept by TWKB, or None for full precision WKB
+        :param vertices: VertexTally when result rows carry vertex counts
+        """
+        self.precision = precision
+        self.vertices = vertices
+        self.upload_wkb = self.upload_sent = 0
+        self.download_wkb = self.download_received = 0
+        # feature_order of the uploaded rows whose coordinates the rounding moved
+        self.rounded = set()
+        self._lock = threading.Lock()
+
+    @property
+    def twkb(self):
+        return self.precision is not None
+
+    def output(self, column):
+        """SQL expression returning column in this encoding."""
+        return geometry_output(column, self.precision)
+
+    def encode(self, rows):
+        """Yield rows with the WKB in their second column converted to TWKB."""
+        if not self.twkb:
+            yield from rows
+            return
+        wkb_size = sent = 0
+        rounded = []
+        for row in rows:
+            wkb = row[1]
+            if wkb is not None:
+                twkb, moved = wkb_to_twkb_rounded(wkb, self.precision)
+                if moved:
+                    rounded.append(row[0])
+                wkb_size += len(wkb)
+                sent += len(twkb)
+                row = (row[0], twkb, *row[2:])
+            yield row
+        # Cluster jobs upload from several threads
+        with self._lock:
+            self.upload_wkb += wkb_size
+            self.upload_sent += sent
+            self.rounded.update(rounded)
+
+    def add_rounded(self, conn, spool, profile):
+        """Append the staged rows the rounding moved and the clean didn't change to spool.
+
+        They are read back from coverage_input, so they decode exactly like
+        the changed rows next to them.
+
+        :param conn: Connection of the session holding the coverage_input table
+        :param spool: ResultSpool holding the changed rows of the clean
+        :param profile: RunProfile counting the downloaded rows
+        """
+        missing = self.rounded.difference(spool.indexes())
+        if not missing:
+            return
+        query = ROUNDED_ROWS_SQL.format(output=self.output("geom"))
+        for batch in fetch_batches(conn, query, (sorted(missing),)):
+            count_downloaded(profile, batch)
+            spool.extend((feature_order, self.wkb(data)) for feature_order, data in batch)
+        log_message(f"{len(missing)} rows moved by the TWKB rounding returned as changed",
+                    verbose=True)
+
+    def wkb(self, data):
+        """Return a result geometry as ISO WKB, decoding TWKB."""
+        if data is None or not self.twkb:
+            return data
+        wkb = twkb_to_wkb(data)
+        self.download_received += len(data)
+        self.download_wkb += len(wkb)
+        return wkb
+
+    def geometry(self, data):
+        """Decode a result geometry into a QgsGeometry."""
+        return wkb_to_geom(self.wkb(data))
+
+    def spool(self, spool, rows, profile):
+        """Append (feature_order, geometry) result rows to a ResultSpool as WKB."""
+        if self.vertices is not None:
+            rows = self.vertices.strip(rows)
+        count_downloaded(profile, rows)
+        spool.extend((feature_order, self.wkb(data)) for feature_order, data in rows)
+
+    def report(self, profile):
+        """Log how much smaller the payload was than WKB and add it to the run profile."""
+        if not self.twkb:
+            return
+        parts = []
+        for direction, wkb_size, sent in (("uploaded", self.upload_wkb, self.upload_sent),
+                                          ("downloaded", self.download_wkb,
+                                           self.download_received)):
+            if wkb_size:
+                parts.append(f"{direction} {sent / 1024:.1f} KB instead of "
+                             f"{wkb_size / 1024:.1f} KB ({100 * (1 - sent / wkb_size):.0f}% smaller)")
+        if parts:
+            log_message(f"TWKB transfer at {self.precision} decimals: " + ", ".join(parts))
+        profile.annotate(transfer={
+            "format": "TWKB",
+            "precision": self.precision,
+            "upload_wkb_bytes": self.upload_wkb,
+            "upload_sent_bytes": self.upload_sent,
+            "download_wkb_bytes": self.download_wkb,
+            "download_received_bytes": self.download_received,
+        })
+
+
+class CleaningSession:
+    """A pooled PostGIS connection with its own coverage_input staging table.
+
+    The staging table is created once per connection and truncated for every
+    run, so repeated runs don't churn the catalog with new temp tables.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.reused = False
+        self.last_used = time.monotonic()
+        try:
+            conn.execute(COVERAGE_INPUT_DDL)
+            conn.execute(COVERAGE_INPUT_TWKB_DDL)
+        except psycopg.Error:
+            conn.close()
+            raise
+
+    def is_usable(self):
+        """Check that the connection still works before handing it out again.
+
+        Connections idle for less than POOL_CHECK_IDLE_SECONDS are trusted
+        without a round trip.
+        """
+        if self.conn.closed or self.conn.broken:
+            return False
+        if time.monotonic() - self.last_used < POOL_CHECK_IDLE_SECONDS:
+            return True
+        try:
+            self.conn.execute("SELECT 1")
+            return True
+        except psycopg.Error:
+            return False
+
+    def close(self):
+        """Close the connection, ignoring errors from an already dead one."""
+        try:
+            self.conn.close()
+        except psycopg.Error:
+            pass
+
+
+class SessionPool:
+    """Small pool of CleaningSession objects for one pg_service.
+
+    Connections are opened on demand and handed back after each run. Broken
+    connections, or ones left inside a transaction, are dropped instead of
+    being returned to the pool. Safe to use from several threads.
+    """
+
+    def __init__(self, pg_service, max_idle=POOL_MAX_IDLE):
+        self.pg_service = pg_service
+        self.max_idle = max_idle
+        self._idle = []
+        self._closed = False
+        self._lock = threading.Lock()
+        # Seconds per feature of recent full single-window cleans, used to
+        # estimate the time a validity probe saved
+        self.clean_seconds_per_feature = None
+
+    @contextmanager
+    def session(self):
+        """Borrow a session for the duration of a with block."""
+        session = self._acquire()
+        try:
+            yield session
+        finally:
+            self._release(session)
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                conn = psycopg.connect(f"service={self.pg_service}", autocommit=True)
+                return CleaningSession(conn)
+            if session.is_usable():
+                session.reused = True
+                return session
+            session.close()
+
+    def _release(self, session):
+        conn = session.conn
+        if (conn.closed or conn.broken
+                or conn.info.transaction_status != TransactionStatus.IDLE):
+            session.close()
+            return
+        session.last_used = time.monotonic()
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(session)
+                return
+        session.close()
+
+    def record_clean(self, features, seconds):
+        """Fold the rate of a full single-window clean into clean_seconds_per_feature."""
+        if not features:
+            return
+        rate = seconds / features
+        with self._lock:
+            previous = self.clean_seconds_per_feature
+            self.clean_seconds_per_feature = rate if previous is None else (previous + rate) / 2
+
+    def close(self):
+        """Close all idle connections; sessions still in use are closed on release."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
+
+
+class SessionPoolRegistry:
+    """Session pools keyed by pg_service, created on first use."""
+
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, pg_service):
+        """Return the pool for pg_service, creating it if needed."""
+        with self._lock:
+            pool = self._pools.get(pg_service)
+            if pool is None:
+                pool = SessionPool(pg_service)
+                self._pools[pg_service] = pool
+            return pool
+
+    def close(self):
+        """Close every pool."""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+class PostGISEngine(CleaningEngine):
+    """Cleans coverages on a PostGIS server with the ST_CoverageClean window function.
+
+    Geometries are staged in a pooled session's coverage_input table and
+    cleaned either in one window or cluster by cluster.
+    """
+
+    name = ENGINE_POSTGIS
+    label = "PostGIS"
+
+    def __init__(self, pg_service, pools, use_copy=True, partition_clusters=False,
+                 partition_workers=1, twkb_precision=None, validity_probe=False,
+                 simplify_tolerance=0.0, time_budget=0, diagnostics=False, verbose=False):
+        """Constructor.
+
+        :param pg_service: Name of the pg_service to connect to
+        :param pools: SessionPoolRegistry shared between runs
+        :param use_copy: Upload with binary COPY before falling back to executemany
+        :param partition_clusters: Clean spatially disjoint clusters separately
+        :param partition_workers: Connections used to clean clusters concurrently
+        :param twkb_precision: Send and receive geometries as TWKB rounded to this
+            many decimals, or None for full precision WKB
+        :param validity_probe: Check the coverage before cleaning it and clean
+            only the neighbourhood of what the check flags
+        :param simplify_tolerance: Simplify the cleaned coverage with
+            ST_CoverageSimplify at this tolerance in the same query, 0 to keep
+            every vertex
+        :param time_budget: Seconds a single-window clean may take before its
+            input is split in two and the halves are cleaned separately, 0 for
+            no limit. Partitioned runs fail when a cluster job exceeds it, and
+            the validity probe is off while it is set
+        :param diagnostics: Explain the load and clean statements and collect
+            pg_stat_statements figures; they are attached to the run profile
+        :param verbose: Enable verbose logging
+        """
+        self.pg_service = pg_service
+        self.pools = pools
+        self.use_copy = use_copy
+        self.partition_clusters = partition_clusters
+        self.partition_workers = partition_workers
+        self.twkb_precision = twkb_precision
+        self.validity_probe = validity_probe
+        self.simplify_tolerance = simplify_tolerance
+        self.time_budget = time_budget
+        # One engine serves one run, tiles included, so figures add up here
+        self.diagnostics = ServerDiagnostics() if diagnostics else None
+        self.verbose = verbose
+
+    @property
+    def result_variant(self):
+        """Rounded transfers, probed, simplified and split runs give different results, so they are cached apart."""
+        variant = self.name
+        if self.twkb_precision is not None:
+            variant += f":twkb{self.twkb_precision}"
+        if self.simplify_tolerance > 0:
+            variant += f":simplify{self.simplify_tolerance:g}"
+        elif self.validity_probe and self.time_budget <= 0:
+            variant += ":probe"
+        if self.time_budget > 0:
+            variant += f":budget{self.time_budget}"
+        return variant
+
+    @property
+    def sweep_variant(self):
+        """A sweep is a plain single-window clean per combination, without probe or budget."""
+        variant = self.name
+        if self.twkb_precision is not None:
+            variant += f":twkb{self.twkb_precision}"
+        return variant
+
+    @classmethod
+    def is_available(cls):
+        """PostGIS can be tried whenever psycopg is installed."""
+        return postgis_available()
+
+    def session_pool(self):
+        """Return the session pool for the configured pg_service."""
+        return self.pools.get(self.pg_service)
+
+    def clean(self, features, gap_tolerance, snapping_distance, merge_strategy, task=None):
+        """Clean coverage using PostGIS ST_CoverageClean.
+
+        Safe to call from a worker thread; it never touches the layer.
+
+        :param features: List of QgsFeature objects, or a SelectionStream
+        :param gap_tolerance: Maximum gap width to clean
+        :param snapping_distance: Snapping distance (-1=auto, 0=disabled, >0=custom)
+        :param merge_strategy: Strategy for merging overlaps
+        :param task: Optional CoverageCleaningTask receiving progress and cancellation
+        :return: CleaningResult whose changed geometries are spooled as WKB and
+            decoded one at a time when the result is applied
+        """
+
+        log_message(lambda: f"PostGIS clean called with {len(features)} features, tolerance={gap_tolerance}, snapping={snapping_distance}, strategy={merge_strategy}",
+                    verbose=self.verbose)
+
+        payload = WirePayload(self.twkb_precision)
+        # Use a pooled PostGIS session (psycopg3), opened on first use
+        try:
+            report_stage(task, "serialize")
+            pool = self.session_pool()
+            for attempt in range(2):
+                with pool.session() as session:
+                    log_message(lambda: f"Using {'pooled' if session.reused else 'new'} connection "
+                                f"to service: {self.pg_service}", verbose=self.verbose)
+                    # A retry starts over with an empty spool
+                    spool = ResultSpool()
+                    if self.simplify_tolerance > 0:
+                        payload.vertices = VertexTally()
+                    try:
+                        self.clean_on_session(
+                            session, features, gap_tolerance, snapping_distance, merge_strategy,
+                            task, payload, spool)
+                        break
+                    except psycopg.OperationalError:
+                        # A pooled connection can die between runs (server restart,
+                        # idle timeout); retry once on a fresh connection
+                        if attempt or not session.reused or not session.conn.broken:
+                            raise
+                        log_message("Pooled connection was lost, retrying on a new connection",
+                                    Qgis.Warning)
+            # Only changed rows come back; every other staged row was already clean.
+            # ST_AsBinary returns ISO WKB and TWKB decodes to it: no SRID to strip,
+            # and the QgsGeometry is only built when the row is applied
+            log_message(lambda: f"Query returned {len(spool)} changed rows "
+                        f"({spool.wkb_bytes / 1024:.1f} KB spooled), "
+                        f"{len(features) - len(spool)} unchanged", verbose=self.verbose)
+            payload.report(profile_of(task))
+            if payload.vertices is not None:
+                log_simplification(self.simplify_tolerance, payload.vertices.before,
+                                   payload.vertices.after, profile_of(task))
+            if self.diagnostics is not None:
+                profile_of(task).attach("server", self.diagnostics.summary())
+
+            return CleaningResult(spool, len(features))
+
+        except CleaningCanceled:
+            raise
+        except Exception as e:
+            if task is not None and task.isCanceled():
+                # conn.cancel() surfaces as a QueryCanceled error
+                raise CleaningCanceled() from e
+            log_message(f"Database operation failed: {str(e)}", Qgis.Critical, verbose=True)
+            raise Exception(f"Database operation failed: {str(e)}")
+
+    def sweep(self, features, combinations, task=None):
+        """Clean the features with every parameter combination in one round trip.
+
+        The input is uploaded once. The combinations, a server-side loop
+        over them and the queries reading the summary and the changed rows
+        are sent together in one pipeline.
+
+        :param combinations: List of (gap_tolerance, snapping_distance, merge_strategy)
+        :return: List of SweepResult, one per combination in the same order
+        """
+        log_message(lambda: f"PostGIS sweep of {len(combinations)} combinations over "
+                    f"{len(features)} features", verbose=self.verbose)
+        payload = WirePayload(self.twkb_precision)
+        try:
+            report_stage(task, "serialize")
+            with self.session_pool().session() as session:
+                conn = session.conn
+                with watch_connection(task, conn), conn.transaction():
+                    with conn.cursor(binary=True) as cur, \
+                            conn.cursor(binary=True) as summary_cur, \
+                            conn.cursor(binary=True) as rows_cur:
+                        cur.execute("TRUNCATE coverage_input")
+                        profile = profile_of(task)
+                        method = load_coverage_input(
+                            cur,
+                            lambda: payload.encode(iter_feature_wkb(
+                                features, lambda f: report_stage(task, "upload", f), profile)),
+                            self.use_copy, twkb=payload.twkb)
+                        profile.annotate(upload_method=method)
+
+                        report_stage(task, "clean")
+                        with conn.pipeline():
+                            cur.execute(SWEEP_PARAMS_DDL)
+                            cur.execute(SWEEP_RESULTS_DDL)
+                            cur.execute("TRUNCATE coverage_sweep_params, coverage_sweep")
+                            cur.execute(SWEEP_PARAMS_SQL, tuple(map(list, zip(*combinations))))
+                            cur.execute(SWEEP_LOOP_SQL)
+                            summary_cur.execute(SWEEP_SUMMARY_SQL)
+                            rows_cur.execute(SWEEP_ROWS_SQL.format(output=payload.output("geom")))
+                            # Don't keep every combination's geometries on the server
+                            cur.execute("TRUNCATE coverage_sweep")
+
+                        report_stage(task, "fetch")
+                        summary = summary_cur.fetchall()
+                        rows = rows_cur.fetchall()
+                        rounded = []
+                        if payload.rounded:
+                            cur.execute(ROUNDED_ROWS_SQL.format(output=payload.output("geom")),
+                                        (sorted(payload.rounded),))
+                            rounded = cur.fetchall()
+            count_downloaded(profile, rows)
+            count_downloaded(profile, rounded)
+
+            changed = [[] for _ in combinations]
+            for idx, (combo, feature_order, wkb) in enumerate(rows):
+                if idx % PROGRESS_INTERVAL == 0:
+                    report_stage(task, "decode", idx / len(rows))
+                changed[combo].append((feature_order, payload.geometry(wkb)))
+            # Rows the rounding moved are changed in every combination
+            for combo_changed in changed:
+                seen = {feature_order for feature_order, _geom in combo_changed}
+                combo_changed.extend((feature_order, payload.geometry(wkb))
+                                     for feature_order, wkb in rounded
+                                     if feature_order not in seen)
+                combo_changed.sort(key=lambda row: row[0])
+            payload.report(profile)
+
+            return [SweepResult(*combinations[combo], CleaningResult(changed[combo], len(features)),
+                                seconds, area_delta, area_changed)
+                    for combo, seconds, area_delta, area_changed in summary]
+
+        except CleaningCanceled:
+            raise
+        except Exception as e:
+            if task is not None and task.isCanceled():
+                raise CleaningCanceled() from e
+            log_message(f"Database operation failed: {str(e)}", Qgis.Critical, verbose=True)
+            raise Exception(f"Database operation failed: {str(e)}")
+
+    def clean_in_database(self, table, keys, gap_tolerance, snapping_distance, merge_strategy,
+                          writeback=False, task=None):
+        """Clean rows of a layer's table on the server, without uploading them.
+
+        The selected rows are read from the table itself. Only the keys and
+        cleaned geometries of rows that changed come back; with writeback
+        the table is updated directly and only the changed keys come back.
+
+        :param table: LayerTable of the layer
+        :param keys: Primary key values of the features to clean
+        :param writeback: UPDATE the table instead of returning geometries
+        :param task: Optional CoverageCleaningTask receiving progress and cancellation
+        :return: List of (key, QgsGeometry) tuples for changed rows, or with
+            writeback the list of (key, None) tuples of updated rows
+        :raises NotOnCleaningDatabase: When the table is in another database
+        """
+        query = IN_DATABASE_UPDATE_SQL if writeback else IN_DATABASE_SELECT_SQL
+        # Unchanged rows keep their full precision in the table, so changed
+        # rows come back at full precision too
+        payload = WirePayload()
+        params = (gap_tolerance, snapping_distance, merge_strategy, list(keys))
+        log_message(lambda: f"In-database clean of {len(keys)} rows of {table}"
+                    f"{' with direct writeback' if writeback else ''}", verbose=self.verbose)
+        try:
+            with self.session_pool().session() as session:
+                if not table.is_on(self.pg_service, session.conn):
+                    raise NotOnCleaningDatabase(
+                        f"{table} is not in the database of service {self.pg_service}")
+                report_stage(task, "clean")
+                with watch_connection(task, session.conn), session.conn.transaction():
+                    with session.conn.cursor(binary=True) as cur:
+                        cur.execute(table.compose(query, payload.output("clean")), params,
+                                    prepare=True)
+                        report_stage(task, "fetch")
+                        rows = cur.fetchall()
+            count_downloaded(profile_of(task), rows, with_geometry=not writeback)
+
+            if writeback:
+                return [(row[0], None) for row in rows]
+            changed = []
+            for idx, (key, wkb) in enumerate(rows):
+                if idx % PROGRESS_INTERVAL == 0:
+                    report_stage(task, "decode", idx / len(rows))
+                changed.append((key, payload.geometry(wkb)))
+            payload.report(profile_of(task))
+            return changed
+
+        except (CleaningCanceled, NotOnCleaningDatabase):
+            raise
+        except Exception as e:
+            if task is not None and task.isCanceled():
+                raise CleaningCanceled() from e
+            log_message(f"Database operation failed: {str(e)}", Qgis.Critical, verbose=True)
+            raise Exception(f"Database operation failed: {str(e)}")
+
+    def clean_on_session(self, session, features, gap_tolerance, snapping_distance, merge_strategy,
+                         task=None, payload=None, spool=None):
+        """Stage the features in a pooled session and run the clean.
+
+        Everything runs in one transaction, so a failed run leaves the
+        session's staging table as it was.
+
+        :param payload: WirePayload encoding the geometries, full precision WKB when None
+        :param spool: ResultSpool receiving the changed rows as they arrive
+        :return: The spool holding (feature_order, WKB) rows of changed geometries
+        """
+        spool = spool if spool is not None else ResultSpool()
+        with watch_connection(task, session.conn), session.conn.transaction():
+            with session.conn.cursor(binary=True) as cur:
+                if self.diagnostics is not None:
+                    self.diagnostics.start(cur)
+                # Reuse the session's staging table instead of creating a new one
+                cur.execute("TRUNCATE coverage_input")
+
+                # Stream WKB (binary) straight from the features into the table
+                log_message(lambda: f"Uploading {len(features)} geometries", verbose=self.verbose)
+                profile = profile_of(task)
+                payload = payload or WirePayload()
+                method = load_coverage_input(
+                    cur,
+                    lambda: payload.encode(iter_feature_wkb(
+                        features, lambda f: report_stage(task, "upload", f), profile)),
+                    self.use_copy, twkb=payload.twkb, diagnostics=self.diagnostics)
+                profile.annotate(upload_method=method)
+                log_message(lambda: f"Geometries uploaded with {method}", verbose=self.verbose)
+                if payload.vertices is not None:
+                    cur.execute(VERTEX_COUNT_SQL)
+                    payload.vertices.before = cur.fetchone()[0]
+
+                # Simplification changes every polygon, a valid coverage included.
+                # The probe's queries and local clean can't be split, so a time
+                # budget turns it off
+                probed = (self.validity_probe and self.simplify_tolerance <= 0
+                          and self.time_budget <= 0
+                          and self.clean_flagged(cur, len(features), gap_tolerance,
+                                                 snapping_distance, merge_strategy, task,
+                                                 payload, spool))
+                if not probed:
+                    report_stage(task, "clean")
+                    if self.partition_clusters:
+                        try:
+                            with self.budget_limit(cur):
+                                self.clean_partitioned(
+                                    cur, features, gap_tolerance, snapping_distance,
+                                    merge_strategy, task, payload, spool)
+                        except psycopg.errors.QueryCanceled as e:
+                            if self.time_budget <= 0 or (task is not None and task.isCanceled()):
+                                raise
+                            raise RuntimeError(
+                                f"A cluster job exceeded the time budget of {self.time_budget}s; "
+                                "turn cluster partitioning off to let the budget split the "
+                                "selection") from e
+                    elif self.time_budget > 0:
+                        self.clean_within_budget(
+                            cur, len(features), gap_tolerance, snapping_distance,
+                            merge_strategy, task, payload, spool)
+                    else:
+                        start = time.perf_counter()
+                        self.clean_single_window(
+                            cur, gap_tolerance, snapping_distance, merge_strategy, task,
+                            payload, spool)
+                        self.session_pool().record_clean(len(features),
+                                                         time.perf_counter() - start)
+
+                payload.add_rounded(session.conn, spool, profile)
+                if self.diagnostics is not None:
+                    self.diagnostics.finish(cur)
+                return spool
+
+    def budget_limit(self, cur):
+        """Return a context running the statements of cur within the time budget, if any."""
+        return statement_timeout(cur, self.time_budget) if self.time_budget > 0 else nullcontext()
+
+    def clean_flagged(self, cur, total, gap_tolerance, snapping_distance, merge_strategy, task=None,
+                      payload=None, spool=None):
+        """Probe coverage_input for invalid edges and narrow gaps, and clean only what they touch.
+
+        A coverage with neither is left alone. Otherwise the flagged polygons,
+        their neighbours within gap tolerance plus snapping distance and a
+        halo around those are cleaned in one window; only the core results
+        are kept. When the neighbourhood covers more than
+        PROBE_LOCAL_MAX_SHARE of the input, the full clean is cheaper.
+
+        :param total: Number of rows in coverage_input
+        :param spool: ResultSpool receiving the changed core rows
+        :return: True when the run is done, False to go on with a full clean
+        """
+        payload = payload or WirePayload()
+        profile = profile_of(task)
+        start = time.perf_counter()
+        report_stage(task, "probe")
+        snapping_distance = self.resolve_snapping(cur, snapping_distance)
+        reach = gap_tolerance + snapping_distance
+
+        cur.execute(PROBE_INVALID_SQL, (max(gap_tolerance, snapping_distance),))
+        invalid = [row[0] for row in cur.fetchall()]
+        gaps = []
+        if gap_tolerance > 0:
+            cur.execute(PROBE_GAPS_SQL, (invalid, gap_tolerance))
+            gaps = [row[0] for row in cur.fetchall()]
+        flagged = sorted(set(invalid) | set(gaps))
+        probe_seconds = time.perf_counter() - start
+        summary = {"invalid": len(invalid), "gaps": len(gaps), "seconds": round(probe_seconds, 6)}
+
+        core = halo = 0
+        if flagged:
+            cur.execute(PROBE_CORE_SQL, (flagged, reach))
+            core = cur.rowcount
+            cur.execute(PROBE_HALO_SQL, (2 * reach,))
+            halo = cur.rowcount
+            summary.update(core=core, halo=halo)
+            if core + halo > PROBE_LOCAL_MAX_SHARE * total:
+                log_message(f"Validity probe flagged {len(flagged)} of {total} features, "
+                            f"too many to clean locally ({probe_seconds:.3f}s spent)")
+                profile.annotate(probe=dict(summary, outcome="full clean"))
+                return False
+
+            report_stage(task, "clean")
+            query = PROBE_CLEAN_SQL.format(output=payload.output("clean"))
+            for batch in self.result_batches(cur, "probe clean", query,
+                                             (gap_tolerance, snapping_distance, merge_strategy)):
+                report_stage(task, "fetch")
+                payload.spool(spool, batch, profile)
+
+        elapsed = time.perf_counter() - start
+        rate = self.session_pool().clean_seconds_per_feature
+        if rate is None:
+            saving = "no full clean timed on this service yet to compare with"
+        else:
+            estimate = rate * total
+            summary["estimated_saved"] = round(estimate - elapsed, 6)
+            saving = (f"a full clean would take about {estimate:.3f}s: "
+                      f"~{estimate - elapsed:.3f}s saved")
+        if flagged:
+            log_message(f"Validity probe: {len(invalid)} features with invalid edges, "
+                        f"{len(gaps)} next to narrow gaps; cleaned {core} features and "
+                        f"{halo} halo instead of {total} in {elapsed:.3f}s ({saving})")
+        else:
+            log_message(f"Validity probe: coverage of {total} features is already valid, "
+                        f"skipped the clean ({elapsed:.3f}s, {saving})")
+        profile.annotate(probe=dict(summary, outcome="local clean" if flagged else "skipped"))
+        return True
+
+    def result_batches(self, cur, label, query, params):
+        """Yield the rows of a cleaning query in batches of FETCH_BATCH_ROWS.
+
+        In diagnostics mode the query is explained first (see
+        explain_into_result()) and its rows are read back from coverage_result.
+        """
+        if self.diagnostics is None:
+            yield from fetch_batches(cur.connection, query, params)
+            return
+        explain_into_result(cur, self.diagnostics, label, query, params)
+        yield from fetch_batches(cur.connection, RESULT_TABLE_SQL, ())
+        cur.execute("DROP TABLE coverage_result")
+
+    def clean_single_window(self, cur, gap_tolerance, snapping_distance, merge_strategy, task=None,
+                            payload=None, spool=None):
+        """Clean the whole of coverage_input in one ST_CoverageClean window.
+
+        Changed rows are read from a server-side cursor FETCH_BATCH_ROWS at a
+        time and appended to spool as each batch arrives.
+
+        :param cur: Cursor on the session holding the coverage_input table
+        :param payload: WirePayload choosing the result encoding, WKB when None
+        :param spool: ResultSpool receiving the changed rows
+        :return: The spool holding (feature_order, WKB) rows of changed geometries
+        """
+        payload = payload or WirePayload()
+        spool = spool if spool is not None else ResultSpool()
+        params = (gap_tolerance, snapping_distance, merge_strategy)
+        query = CLEAN_SQL.format(output=payload.output("clean"))
+        if self.simplify_tolerance > 0:
+            params = (self.simplify_tolerance, *params)
+            query = SIMPLIFY_CLEAN_SQL.format(output=payload.output("clean"))
+        if self.verbose:
+            log_message(f"Executing ST_CoverageClean query:\n{query}\nparameters: {params}",
+                        verbose=True)
+        else:
+            log_message("Executing ST_CoverageClean...", verbose=True)
+
+        # The window runs when the first batch is fetched
+        profile = profile_of(task)
+        for batch in self.result_batches(cur, "clean", query, params):
+            report_stage(task, "fetch")
+            payload.spool(spool, batch, profile)
+            log_message(lambda: f"  {len(spool)} changed rows received", verbose=self.verbose)
+        return spool
+
+    def clean_within_budget(self, cur, total, gap_tolerance, snapping_distance, merge_strategy,
+                            task=None, payload=None, spool=None):
+        """Clean coverage_input in one window, splitting it when it runs out of time.
+
+        Every statement runs under statement_timeout set to the time budget,
+        and every clean in a savepoint. When the single window times out, the
+        input is bisected (see split_piece()) and each piece is cleaned with
+        its halo; a piece that times out is bisected again, down to
+        BUDGET_MAX_DEPTH. Pieces drop their halo results, so they are never
+        simplified. The branches taken are logged and recorded in the run
+        profile.
+
+        :param total: Number of rows in coverage_input
+        :param spool: ResultSpool receiving the changed rows
+        :return: The spool holding (feature_order, WKB) rows of changed geometries
+        """
+        payload = payload or WirePayload()
+        spool = spool if spool is not None else ResultSpool()
+        conn = cur.connection
+        start = time.perf_counter()
+        branches = []
+        with statement_timeout(cur, self.time_budget):
+            mark = spool.mark()
+            try:
+                with conn.transaction():
+                    self.clean_single_window(cur, gap_tolerance, snapping_distance,
+                                             merge_strategy, task, payload, spool)
+                elapsed = time.perf_counter() - start
+                self.session_pool().record_clean(total, elapsed)
+                branches.append({"branch": "root", "features": total,
+                                 "seconds": round(elapsed, 3), "outcome": "cleaned"})
+            except psycopg.errors.QueryCanceled:
+                if task is not None and task.isCanceled():
+                    raise
+                spool.rollback(mark)
+                log_message(f"Clean of {total} features exceeded the time budget of "
+                            f"{self.time_budget}s, splitting it", Qgis.Warning)
+                if payload.vertices is not None:
+                    log_message("Split pieces are cleaned without simplification", Qgis.Warning)
+                    payload.vertices = None
+                # Every piece uses the snapping distance of the whole input
+                snapping_distance = self.resolve_snapping(cur, snapping_distance)
+                halo = 2 * (gap_tolerance + snapping_distance)
+                params = (gap_tolerance, snapping_distance, merge_strategy)
+                branches.append({"branch": "root", "features": total,
+                                 "seconds": round(time.perf_counter() - start, 3),
+                                 "outcome": "split"})
+                self.split_piece(cur, "root", (-math.inf, math.inf, -math.inf, math.inf), 1,
+                                 halo, params, task, payload, spool, branches)
+
+        elapsed = time.perf_counter() - start
+        split = [branch for branch in branches if branch["outcome"] == "split"]
+        if split:
+            cleaned = sum(1 for branch in branches if branch["outcome"] == "cleaned")
+            log_message(f"Time budget: {len(split)} branches split, {cleaned} pieces cleaned "
+                        f"in {elapsed:.3f}s")
+            for branch in branches:
+                log_message(lambda: f"  {branch['branch']}: {branch['features']} features, "
+                            f"{branch['outcome']} after {branch['seconds']}s",
+                            verbose=self.verbose)
+        profile_of(task).annotate(time_budget={"seconds": self.time_budget,
+                                               "branches": branches})
+        return spool
+
+    def split_piece(self, cur, branch, box, depth, halo, params, task, payload, spool, branches):
+        """Bisect a piece that ran out of time and clean both halves.
+
+        The cut is at the median bounding box centre along the wider spread
+        of centres, so both halves get about half the features.
+
+        :param branch: Name of the piece, the cuts leading to it
+        :param box: Half-open (xmin, xmax, ymin, ymax) of the piece's centres
+        :param depth: Depth of the halves in the split tree
+        :param halo: Width of the halo cleaned around each half
+        :param params: Tuple (gap_tolerance, snapping_distance, merge_strategy)
+        :param branches: List of branch records, extended in place
+        """
+        xmin, xmax, ymin, ymax = box
+        cur.execute(BUDGET_SPLIT_SQL, box)
+        count, spread_x, spread_y, median_x, median_y = cur.fetchone()
+        if depth > BUDGET_MAX_DEPTH or count < 2 or not (spread_x or spread_y):
+            raise RuntimeError(f"Piece {branch} of {count} features could not be cleaned within "
+                               f"the time budget of {self.time_budget}s")
+        if spread_x >= spread_y:
+            axis, at = "x", median_x
+            halves = ((xmin, at, ymin, ymax), (at, xmax, ymin, ymax))
+        else:
+            axis, at = "y", median_y
+            halves = ((xmin, xmax, ymin, at), (xmin, xmax, at, ymax))
+        log_message(lambda: f"Splitting {branch} ({count} features) at {axis} = {at}",
+                    verbose=self.verbose)
+        for name, half in zip((f"{branch}/{axis}<{at:g}", f"{branch}/{axis}>={at:g}"), halves):
+            self.clean_piece(cur, name, half, depth, halo, params, task, payload, spool,
+                             branches)
+
+    def clean_piece(self, cur, branch, box, depth, halo, params, task, payload, spool, branches):
+        """Clean one piece of a split run with its halo, splitting it again on timeout.
+
+        Arguments as for split_piece(); depth is the depth of this piece.
+        """
+        conn = cur.connection
+        profile = profile_of(task)
+        start = time.perf_counter()
+        mark = spool.mark()
+        record = {"branch": branch, "features": None, "outcome": "cleaned"}
+        try:
+            with conn.transaction():
+                cur.execute(BUDGET_RESET_SQL)
+                cur.execute(BUDGET_CORE_SQL, box)
+                record["features"] = cur.rowcount
+                if cur.rowcount:
+                    cur.execute(BUDGET_HALO_SQL, (halo,))
+                    record["halo"] = cur.rowcount
+                    report_stage(task, "clean")
+                    query = PROBE_CLEAN_SQL.format(output=payload.output("clean"))
+                    for batch in self.result_batches(cur, f"clean {branch}", query, params):
+                        report_stage(task, "fetch")
+                        payload.spool(spool, batch, profile)
+                else:
+                    record["outcome"] = "empty"
+        except psycopg.errors.QueryCanceled:
+            if task is not None and task.isCanceled():
+                raise
+            spool.rollback(mark)
+            record["outcome"] = "split"
+            log_message(f"Piece {branch} exceeded the time budget, splitting it", Qgis.Warning)
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        branches.append(record)
+        if record["outcome"] == "split":
+            self.split_piece(cur, branch, box, depth + 1, halo, params, task, payload, spool,
+                             branches)
+
+    def clean_partitioned(self, cur, features, gap_tolerance, snapping_distance, merge_strategy,
+                          task=None, payload=None, spool=None):
+        """Clean coverage_input cluster by cluster.
+
+        Polygons are grouped into spatially disjoint clusters which cannot
+        influence each other during cleaning, so each cluster gets its own
+        ST_CoverageClean window. With more than one parallel connection the
+        clusters are spread over extra sessions and cleaned concurrently.
+
+        :param cur: Cursor on the session holding the coverage_input table
+        :param features: List of QgsFeature objects (or SelectionStream) already in coverage_input
+        :param payload: WirePayload encoding the geometries, WKB when None
+        :param spool: ResultSpool receiving the changed rows of each job as it finishes
+        :return: The spool holding (feature_order, WKB) rows of changed geometries
+        """
+        payload = payload or WirePayload()
+        spool = spool if spool is not None else ResultSpool()
+        profile = profile_of(task)
+        output = payload.output("clean")
+        start = time.perf_counter()
+        snapping_distance, clusters = self.assign_clusters(cur, gap_tolerance, snapping_distance)
+        jobs = plan_cluster_jobs(clusters)
+        workers = max(1, min(self.partition_workers, len(jobs)))
+        log_message(f"Partitioned clean: {len(clusters)} clusters in {len(jobs)} jobs "
+                    f"over {workers} connection(s), largest cluster {clusters[0][1]} features",
+                    verbose=True)
+
+        params = (gap_tolerance, snapping_distance, merge_strategy)
+        buckets = distribute_jobs(jobs, workers)
+
+        timings = []
+        if workers > 1:
+            bucket_of = {cluster_id: number
+                         for number, bucket in enumerate(buckets[1:])
+                         for cluster_ids, _size in bucket
+                         for cluster_id in cluster_ids}
+            cur.execute("SELECT feature_order, cluster_id FROM coverage_input "
+                        "WHERE cluster_id = ANY(%s)", (list(bucket_of),))
+            cluster_of = dict(cur.fetchall())
+
+            # Geometries are serialized here, QgsFeature stays on this thread.
+            # One pass over the features, which may be a SelectionStream
+            bucket_rows = [[] for _ in buckets[1:]]
+            for feature_order, feature in enumerate(features):
+                cluster_id = cluster_of.get(feature_order)
+                if cluster_id is not None:
+                    bucket_rows[bucket_of[cluster_id]].append(
+                        (feature_order, geometry_wkb(feature.geometry()), cluster_id))
+
+            with ThreadPoolExecutor(max_workers=workers - 1) as executor:
+                futures = [executor.submit(self.clean_jobs_on_pooled_session, bucket, rows, params,
+                                           task, payload)
+                           for bucket, rows in zip(buckets[1:], bucket_rows)]
+                # The first bucket runs on the session that already holds the data
+                for done, job in enumerate(buckets[0]):
+                    report_stage(task, "clean", done / len(buckets[0]))
+                    rows, timing = run_cluster_job(cur, job, params, output,
+                                                   self.simplify_tolerance, self.diagnostics)
+                    payload.spool(spool, rows, profile)
+                    timings.append(timing)
+                for future in futures:
+                    rows, bucket_timings = future.result()
+                    payload.spool(spool, rows, profile)
+                    timings.extend(bucket_timings)
+        else:
+            for done, job in enumerate(buckets[0]):
+                report_stage(task, "clean", done / len(buckets[0]))
+                rows, timing = run_cluster_job(cur, job, params, output,
+                                               self.simplify_tolerance, self.diagnostics)
+                payload.spool(spool, rows, profile)
+                timings.append(timing)
+
+        report_stage(task, "fetch")
+        self.log_cluster_timings(timings, time.perf_counter() - start)
+        return spool
+
+    def assign_clusters(self, cur, gap_tolerance, snapping_distance):
+        """Tag every coverage_input row with the id of its spatial cluster.
+
+        Polygons closer than the gap tolerance plus the snapping distance are
+        connected, so no gap or snap can span two different clusters. An
+        automatic snapping distance (-1) is resolved against the extent of the
+        whole input, the same value a single-window run would use.
+
+        :return: Tuple (snapping distance, list of (cluster_id, size) largest first)
+        """
+        snapping_distance = self.resolve_snapping(cur, snapping_distance)
+        cur.execute("""
+            UPDATE coverage_input c
+            SET cluster_id = COALESCE(k.cid, -1)
+            FROM (
+                SELECT feature_order,
+                       ST_ClusterDBSCAN(geom, eps := %s, minpoints := 1) OVER () AS cid
+                FROM coverage_input
+            ) k
+            WHERE c.feature_order = k.feature_order
+        """, (gap_tolerance + snapping_distance,))
+        cur.execute("""
+            SELECT cluster_id, count(*)
+            FROM coverage_input
+            GROUP BY cluster_id
+            ORDER BY count(*) DESC, cluster_id
+        """)
+        return snapping_distance, cur.fetchall()
+
+    def resolve_snapping(self, cur, snapping_distance):
+        """Turn an automatic snapping distance (-1) into the value GEOS derives for all of coverage_input."""
+        if snapping_distance >= 0:
+            return snapping_distance
+        cur.execute("""
+            SELECT COALESCE(
+                sqrt(power(ST_XMax(ext) - ST_XMin(ext), 2) +
+                     power(ST_YMax(ext) - ST_YMin(ext), 2)) / %s,
+                0)
+            FROM (SELECT ST_Extent(geom) AS ext FROM coverage_input) e
+        """, (AUTO_SNAPPING_FACTOR,))
+        snapping_distance = float(cur.fetchone()[0])
+        log_message(lambda: f"Resolved automatic snapping distance to {snapping_distance}",
+                    verbose=self.verbose)
+        return snapping_distance
+
+    def clean_jobs_on_pooled_session(self, jobs, rows, params, task=None, payload=None):
+        """Stage the features of some cluster jobs in another session and clean them.
+
+        Runs in a worker thread with its own pooled database connection. Its
+        statements run within the time budget, like those of the main session.
+
+        :param rows: List of (feature_order, WKB, cluster_id) tuples for the jobs
+        :param payload: WirePayload encoding the geometries, WKB when None
+        :return: Tuple (list of (feature_order, WKB) rows, list of job timings)
+        """
+        payload = payload or WirePayload()
+        output = payload.output("clean")
+        with self.session_pool().session() as session:
+            with watch_connection(task, session.conn), session.conn.transaction():
+                with session.conn.cursor(binary=True) as cur, self.budget_limit(cur):
+                    cur.execute("TRUNCATE coverage_input")
+                    load_coverage_input(cur, lambda: payload.encode(iter(rows)), self.use_copy,
+                                        with_cluster=True, twkb=payload.twkb,
+                                        diagnostics=self.diagnostics)
+                    results = []
+                    timings = []
+                    for job in jobs:
+                        job_rows, timing = run_cluster_job(cur, job, params, output,
+                                                           self.simplify_tolerance,
+                                                           self.diagnostics)
+                        results.extend(job_rows)
+                        timings.append(timing)
+                    return results, timings
+
+    def log_cluster_timings(self, timings, elapsed):
+        """Log the per-cluster timing breakdown of a partitioned clean.
+
+        The ten slowest jobs are always shown, all of them with verbose logging.
+        """
+        timings = sorted(timings, key=lambda timing: timing[2], reverse=True)
+        log_message(f"Partitioned clean finished in {elapsed:.3f}s "
+                    f"(sum of cluster times {sum(t[2] for t in timings):.3f}s)", verbose=True)
+        shown = timings if self.verbose else timings[:10]
+        for cluster_ids, size, seconds in shown:
+            if len(cluster_ids) == 1:
+                label = f"cluster {cluster_ids[0]}"
+            else:
+                label = f"{len(cluster_ids)} clusters batched"
+            log_message(f"  {label} ({size} features): {seconds:.3f}s", verbose=True)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Processing provider: the cleaning pipeline as Processing algorithms, for
+ models, the batch interface and headless runs through qgis_process.
+"""
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from PyQt5.QtGui import QIcon
+from qgis.core import (QgsFeatureRequest, QgsFeatureSink, QgsProcessing, QgsProcessingAlgorithm,
+                       QgsProcessingException, QgsProcessingOutputMultipleLayers,
+                       QgsProcessingOutputNumber, QgsProcessingParameterEnum,
+                       QgsProcessingParameterFeatureSink, QgsProcessingParameterFeatureSource,
+                       QgsProcessingParameterFolderDestination,
+                       QgsProcessingParameterMultipleLayers, QgsProcessingParameterNumber,
+                       QgsProcessingProvider, QgsVectorFileWriter, QgsVectorLayerFeatureSource)
+
+from .engines import ENGINE_AUTO, ENGINE_GEOS, ENGINE_POSTGIS
+from .utils import CleaningCanceled, log_message, stage_percent
+
+MERGE_STRATEGIES = ["MERGE_LONGEST_BORDER", "MERGE_MAX_AREA", "MERGE_MIN_AREA", "MERGE_MIN_INDEX"]
+# First entry: whatever engine the plugin settings choose
+ENGINES = [None, ENGINE_AUTO, ENGINE_POSTGIS, ENGINE_GEOS]
+ENGINE_LABELS = ["As in the plugin settings", "Automatic", "PostGIS", "Local GEOS"]
+
+
+class ProcessingRun:
+    """Stands in for a CoverageCleaningTask when the pipeline runs inside Processing.
+
+    Stage progress goes to the QgsProcessingFeedback, and canceling the
+    algorithm cancels a running query through the registered cancel hooks.
+    """
+
+    # Kind of run recorded in the run profile and captures
+    PROFILE_KIND = "processing"
+
+    def __init__(self, plugin, feedback, layer_name, feature_count, gap_tolerance,
+                 snapping_distance, merge_strategy, report_progress=True):
+        """Constructor.
+
+        :param report_progress: Move the feedback's progress bar with the stages;
+            off when several runs share one feedback
+        """
+        self.feedback = feedback
+        self.layer_name = layer_name
+        self.report_progress = report_progress
+        self.error = None
+        self.profile = plugin.new_profile(
+            self.PROFILE_KIND, layer=layer_name, features=feature_count, gap_tolerance=gap_tolerance,
+            snapping_distance=snapping_distance, merge_strategy=merge_strategy)
+
+    def isCanceled(self):  # same name as QgsTask.isCanceled()
+        return self.feedback.isCanceled()
+
+    def set_stage(self, stage, fraction=0.0):
+        """Report a pipeline stage; raises CleaningCanceled when the algorithm was canceled."""
+        if self.feedback.isCanceled():
+            raise CleaningCanceled()
+        self.profile.stage(stage)
+        if self.report_progress:
+            self.feedback.setProgress(stage_percent(stage, fraction))
+
+    @contextmanager
+    def cancel_hook(self, callback):
+        """Call callback (e.g. conn.cancel) if the algorithm is canceled within a with block."""
+        self.feedback.canceled.connect(callback)
+        try:
+            yield
+        finally:
+            try:
+                self.feedback.canceled.disconnect(callback)
+            except TypeError:
+                pass
+
+
+def clean_features(plugin, run, features, gap_tolerance, snapping_distance, merge_strategy,
+                   engine):
+    """Clean features with the plugin's pipeline and close the run's profile.
+
+    :param run: ProcessingRun of this clean
+    :param engine: Engine preference, None for the plugin settings
+    :return: Dict {input index: cleaned QgsGeometry} of the changed features
+    """
+    try:
+        if len(features) < 2:
+            return {}
+        cleaned = plugin.clean_coverage(features, gap_tolerance, snapping_distance,
+                                        merge_strategy, task=run, engine_preference=engine)
+        run.profile.annotate(changed=len(cleaned.changed))
+        return dict(cleaned.changed)
+    except CleaningCanceled:
+        raise QgsProcessingException("Canceled")
+    except Exception as e:
+        run.error = str(e)
+        raise QgsProcessingException(f"Coverage cleaning of {run.layer_name} failed: {e}")
+    finally:
+        plugin.report_profile(run)
+
+
+def throughput_message(name, features, changed, seconds):
+    """One line summary of a cleaned layer."""
+    rate = features / seconds if seconds else 0.0
+    return (f"{name}: {features} features cleaned in {seconds:.2f}s ({rate:.0f} features/s), "
+            f"{changed} changed")
+
+
+class CleanCoverageAlgorithm(QgsProcessingAlgorithm):
+    """Cleans the coverage of one polygon layer (or its selection) into a new layer."""
+
+    INPUT = "INPUT"
+    GAP_TOLERANCE = "GAP_TOLERANCE"
+    SNAPPING_DISTANCE = "SNAPPING_DISTANCE"
+    MERGE_STRATEGY = "MERGE_STRATEGY"
+    ENGINE = "ENGINE"
+    OUTPUT = "OUTPUT"
+    CHANGED = "CHANGED"
+    FEATURES_PER_SECOND = "FEATURES_PER_SECOND"
+
+    def __init__(self, plugin):
+        super().__init__()
+        self.plugin = plugin
+
+    def createInstance(self):
+        return type(self)(self.plugin)
+
+    def name(self):
+        return "cleancoverage"
+
+    def displayName(self):
+        return "Clean coverage"
+
+    def shortHelpString(self):
+        return ("Removes gaps and overlaps between the polygons of a layer with "
+                "ST_CoverageClean, as the Clean Coverage toolbar action does. With "
+                "'Selected features only' just the selection is cleaned. Every input "
+                "feature is written to the output, with its cleaned geometry when it changed.")
+
+    def initAlgorithm(self, config=None):
+        add_cleaning_parameters(self, QgsProcessingParameterFeatureSource(
+            self.INPUT, "Input layer", [QgsProcessing.TypeVectorPolygon]))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, "Cleaned", QgsProcessing.TypeVectorPolygon))
+        self.addOutput(QgsProcessingOutputNumber(self.CHANGED, "Changed features"))
+        self.addOutput(QgsProcessingOutputNumber(self.FEATURES_PER_SECOND, "Features per second"))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+        gap_tolerance, snapping_distance, merge_strategy, engine = cleaning_parameters(
+            self, parameters, context)
+
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, source.fields(),
+                                             source.wkbType(), source.sourceCrs())
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        start = time.perf_counter()
+        features = list(source.getFeatures())
+        run = ProcessingRun(self.plugin, feedback, source.sourceName(), len(features),
+                            gap_tolerance, snapping_distance, merge_strategy)
+        changed = clean_features(self.plugin, run, features, gap_tolerance, snapping_distance,
+                                 merge_strategy, engine)
+
+        for idx, feature in enumerate(features):
+            if idx in changed:
+                feature.setGeometry(changed[idx])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+        seconds = time.perf_counter() - start
+        feedback.pushInfo(throughput_message(source.sourceName(), len(features), len(changed),
+                                             seconds))
+        return {
+            self.OUTPUT: dest_id,
+            self.CHANGED: len(changed),
+            self.FEATURES_PER_SECOND: len(features) / seconds if seconds else 0.0,
+        }
+
+
+class CleanCoveragesAlgorithm(QgsProcessingAlgorithm):
+    """Cleans several polygon layers concurrently, each as a coverage of its own."""
+
+    LAYERS = "LAYERS"
+    GAP_TOLERANCE = "GAP_TOLERANCE"
+    SNAPPING_DISTANCE = "SNAPPING_DISTANCE"
+    MERGE_STRATEGY = "MERGE_STRATEGY"
+    ENGINE = "ENGINE"
+    PARALLEL = "PARALLEL"
+    OUTPUT_FOLDER = "OUTPUT_FOLDER"
+    OUTPUT_LAYERS = "OUTPUT_LAYERS"
+    FEATURES_PER_SECOND = "FEATURES_PER_SECOND"
+
+    def __init__(self, plugin):
+        super().__init__()
+        self.plugin = plugin
+        self.sources = []
+
+    def createInstance(self):
+        return type(self)(self.plugin)
+
+    def name(self):
+        return "cleancoverages"
+
+    def displayName(self):
+        return "Clean coverages (several layers in parallel)"
+
+    def shortHelpString(self):
+        return ("Cleans every input layer as a separate coverage, several layers at a "
+                "time. Each concurrent clean uses its own database connection (PostGIS) "
+                "or worker thread (local GEOS). Every layer is written to a GeoPackage "
+                "in the output folder, and the feature throughput of each layer and of "
+                "the whole run is reported.")
+
+    def initAlgorithm(self, config=None):
+        add_cleaning_parameters(self, QgsProcessingParameterMultipleLayers(
+            self.LAYERS, "Input layers", QgsProcessing.TypeVectorPolygon))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.PARALLEL, "Layers cleaned at the same time", QgsProcessingParameterNumber.Integer,
+            defaultValue=2, minValue=1, maxValue=16))
+        self.addParameter(QgsProcessingParameterFolderDestination(
+            self.OUTPUT_FOLDER, "Output folder"))
+        self.addOutput(QgsProcessingOutputMultipleLayers(self.OUTPUT_LAYERS, "Cleaned layers"))
+        self.addOutput(QgsProcessingOutputNumber(self.FEATURES_PER_SECOND, "Features per second"))
+
+    def prepareAlgorithm(self, parameters, context, feedback):
+        """Snapshot the layers on the main thread; the workers read the snapshots."""
+        self.sources = [(layer.name(), layer.fields(), layer.wkbType(), layer.crs(),
+                         QgsVectorLayerFeatureSource(layer))
+                        for layer in self.parameterAsLayerList(parameters, self.LAYERS, context)]
+        return True
+
+    def processAlgorithm(self, parameters, context, feedback):
+        gap_tolerance, snapping_distance, merge_strategy, engine = cleaning_parameters(
+            self, parameters, context)
+        parallel = self.parameterAsInt(parameters, self.PARALLEL, context)
+        folder = self.parameterAsString(parameters, self.OUTPUT_FOLDER, context)
+        os.makedirs(folder, exist_ok=True)
+
+        def clean_layer(name, source):
+            features = list(source.getFeatures(QgsFeatureRequest()))
+            run = ProcessingRun(self.plugin, feedback, name, len(features), gap_tolerance,
+                                snapping_distance, merge_strategy, report_progress=False)
+            start = time.perf_counter()
+            changed = clean_features(self.plugin, run, features, gap_tolerance,
+                                     snapping_distance, merge_strategy, engine)
+            return features, changed, time.perf_counter() - start
+
+        start = time.perf_counter()
+        outputs = []
+        total_features = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(self.sources)))) as executor:
+            futures = {executor.submit(clean_layer, name, source): index
+                       for index, (name, _fields, _wkb_type, _crs, source)
+                       in enumerate(self.sources)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                name, fields, wkb_type, crs, _source = self.sources[index]
+                features, changed, seconds = future.result()
+                path = self.write_layer(folder, index, name, fields, wkb_type, crs, features,
+                                        changed, context)
+                outputs.append(path)
+                total_features += len(features)
+                feedback.pushInfo(throughput_message(name, len(features), len(changed), seconds))
+                feedback.setProgress(100.0 * done / len(self.sources))
+
+        elapsed = time.perf_counter() - start
+        rate = total_features / elapsed if elapsed else 0.0
+        feedback.pushInfo(f"{len(self.sources)} layers, {total_features} features in "
+                          f"{elapsed:.2f}s ({rate:.0f} features/s, {parallel} at a time)")
+        log_message(f"Processing clean of {len(self.sources)} layers: {total_features} features, "
+                    f"{rate:.0f} features/s")
+        return {self.OUTPUT_FOLDER: folder, self.OUTPUT_LAYERS: outputs,
+                self.FEATURES_PER_SECOND: rate}
+
+    @staticmethod
+    def write_layer(folder, index, name, fields, wkb_type, crs, features, changed, context):
+        """Write one cleaned layer to a GeoPackage in folder and return its path."""
+        safe_name = re.sub(r"[^\w-]+", "_", name).strip("_") or "layer"
+        path = os.path.join(folder, f"{index + 1:02d}_{safe_name}.gpkg")
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "GPKG"
+        options.layerName = safe_name
+        writer = QgsVectorFileWriter.create(path, fields, wkb_type, crs,
+                                            context.transformContext(), options)
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            raise QgsProcessingException(f"Could not write {path}: {writer.errorMessage()}")
+        for idx, feature in enumerate(features):
+            if idx in changed:
+                feature.setGeometry(changed[idx])
+            writer.addFeature(feature, QgsFeatureSink.FastInsert)
+        del writer
+        return path
+
+
+def add_cleaning_parameters(algorithm, input_parameter):
+    """Add the input and the cleaning parameters shared by the algorithms."""
+    algorithm.addParameter(input_parameter)
+    algorithm.addParameter(QgsProcessingParameterNumber(
+        algorithm.GAP_TOLERANCE, "Gap maximum width", QgsProcessingParameterNumber.Double,
+        defaultValue=0.01, minValue=0.0))
+    algorithm.addParameter(QgsProcessingParameterNumber(
+        algorithm.SNAPPING_DISTANCE, "Snapping distance (-1=auto, 0=disabled)",
+        QgsProcessingParameterNumber.Double, defaultValue=-1.0, minValue=-1.0))
+    algorithm.addParameter(QgsProcessingParameterEnum(
+        algorithm.MERGE_STRATEGY, "Overlap merge strategy", options=MERGE_STRATEGIES,
+        defaultValue=0))
+    algorithm.addParameter(QgsProcessingParameterEnum(
+        algorithm.ENGINE, "Cleaning engine", options=ENGINE_LABELS, defaultValue=0))
+
+
+def cleaning_parameters(algorithm, parameters, context):
+    """Return (gap tolerance, snapping distance, merge strategy, engine preference)."""
+    return (
+        algorithm.parameterAsDouble(parameters, algorithm.GAP_TOLERANCE, context),
+        algorithm.parameterAsDouble(parameters, algorithm.SNAPPING_DISTANCE, context),
+        MERGE_STRATEGIES[algorithm.parameterAsEnum(parameters, algorithm.MERGE_STRATEGY, context)],
+        ENGINES[algorithm.parameterAsEnum(parameters, algorithm.ENGINE, context)],
+    )
+
+
+class CoverageCleaningProvider(QgsProcessingProvider):
+    """Processing provider of the Coverage Cleaning plugin."""
+
+    def __init__(self, plugin):
+        super().__init__()
+        self.plugin = plugin
+
+    def id(self):
+        return "qtibiatopology"
+
+    def name(self):
+        return "QTIBIA Topology"
+
+    def icon(self):
+        return QIcon(os.path.join(self.plugin.plugin_dir, "icon.svg"))
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(CleanCoverageAlgorithm(self.plugin))
+        self.addAlgorithm(CleanCoveragesAlgorithm(self.plugin))
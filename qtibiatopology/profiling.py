@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Run profiles: monotonic-clock spans per pipeline stage, byte and row
+ counters, and a JSON summary per run. A disabled profile is a shared
+ no-op object, so instrumented code costs one method call.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+_NULL_CONTEXT = nullcontext()
+
+
+class RunProfile:
+    """Timings and counters of one cleaning run.
+
+    Stages are timed as consecutive spans: entering a stage closes the one
+    before it, which matches how report_stage() walks the pipeline.
+    Explicit spans (span()) can be nested inside or between stages. Time
+    spent in a stage more than once (e.g. per tile) is added up.
+    """
+
+    enabled = True
+
+    def __init__(self, kind, **meta):
+        """Constructor.
+
+        :param kind: Kind of run, e.g. "selection" or "whole-layer"
+        :param meta: Extra fields for the summary (layer, parameters, ...)
+        """
+        self.kind = kind
+        self.meta = dict(meta)
+        self.details = {}
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._end = None
+        self._stages = {}
+        self._counters = {}
+        self._current = None
+        self._since = None
+        self._lock = threading.Lock()
+
+    def annotate(self, **meta):
+        """Add fields to the summary."""
+        self.meta.update(meta)
+
+    def attach(self, name, data):
+        """Add bulky data (e.g. query plans) to the report, but not to the one-line summary."""
+        self.details[name] = data
+
+    def stage(self, name):
+        """Close the running stage and start timing name."""
+        now = time.perf_counter()
+        with self._lock:
+            if self._current == name:
+                return
+            if self._current is not None:
+                self._add(self._current, now - self._since)
+            self._current, self._since = name, now
+
+    @contextmanager
+    def span(self, name):
+        """Time a with block as name, independent of the running stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._add(name, elapsed)
+
+    def count(self, name, amount=1):
+        """Add amount to the counter name (bytes, rows, ...)."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def finish(self):
+        """Close the running stage and stop the run clock; later calls are ignored."""
+        if self._end is not None:
+            return
+        self._end = time.perf_counter()
+        with self._lock:
+            if self._current is not None:
+                self._add(self._current, self._end - self._since)
+                self._current = None
+
+    def summary(self):
+        """Return the profile as a JSON-serializable dict."""
+        end = self._end if self._end is not None else time.perf_counter()
+        return {
+            "kind": self.kind,
+            "started": self.started.isoformat(timespec="seconds"),
+            "seconds": round(end - self._start, 6),
+            **self.meta,
+            "stages": {name: {"seconds": round(seconds, 6), "calls": calls}
+                       for name, (seconds, calls) in self._stages.items()},
+            "counters": dict(self._counters),
+        }
+
+    def to_json(self, indent=None):
+        """Return summary() as JSON text."""
+        return json.dumps(self.summary(), indent=indent)
+
+    def report(self):
+        """Return the summary together with the attached details."""
+        return dict(self.summary(), **self.details)
+
+    def _add(self, name, seconds):
+        total, calls = self._stages.get(name, (0.0, 0))
+        self._stages[name] = (total + seconds, calls + 1)
+
+
+class DisabledProfile:
+    """Stand-in used when profiling is off; every method does nothing."""
+
+    enabled = False
+
+    def annotate(self, **meta):
+        pass
+
+    def attach(self, name, data):
+        pass
+
+    def stage(self, name):
+        pass
+
+    def span(self, name):
+        return _NULL_CONTEXT
+
+    def count(self, name, amount=1):
+        pass
+
+    def finish(self):
+        pass
+
+
+DISABLED_PROFILE = DisabledProfile()
+
+
+def profile_of(task):
+    """Return the RunProfile of a task, or the disabled profile when there is none."""
+    return getattr(task, "profile", DISABLED_PROFILE)
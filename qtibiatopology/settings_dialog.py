@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Settings dialog of the plugin. Imported on first use, so opening QGIS
+ does not build it.
+"""
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QDoubleSpinBox, QSpinBox, QComboBox, QCheckBox,
+                             QPushButton, QGroupBox, QFormLayout)
+
+from .engines import ENGINE_AUTO, ENGINE_GEOS, ENGINE_POSTGIS, geos_available
+from .wkb import TWKB_MAX_PRECISION
+
+
+class CoverageCleaningSettingsDialog(QDialog):
+    """Settings dialog for Coverage Cleaning plugin."""
+
+    def __init__(self, plugin, parent=None):
+        super().__init__(parent)
+        self.plugin = plugin
+        self.setWindowTitle("Coverage Cleaning - Settings")
+        self.setMinimumWidth(500)
+        self.setup_ui()
+        self.load_settings()
+
+    def setup_ui(self):
+        """Setup the user interface."""
+        layout = QVBoxLayout()
+
+        # Database settings group
+        db_group = QGroupBox("Database Connection")
+        db_layout = QFormLayout()
+
+        self.pg_service_edit = QLineEdit()
+        self.pg_service_edit.setPlaceholderText("cadastru_999")
+        db_layout.addRow("pg_service:", self.pg_service_edit)
+
+        db_group.setLayout(db_layout)
+        layout.addWidget(db_group)
+
+        # Cleaning engine group
+        engine_group = QGroupBox("Cleaning Engine")
+        engine_layout = QFormLayout()
+
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("Automatic - local for small selections, PostGIS otherwise", ENGINE_AUTO)
+        self.engine_combo.addItem("PostGIS - ST_CoverageClean on the pg_service database", ENGINE_POSTGIS)
+        self.engine_combo.addItem("Local GEOS - in-process, no database needed", ENGINE_GEOS)
+        engine_layout.addRow("Engine:", self.engine_combo)
+
+        if not geos_available():
+            engine_layout.addRow(QLabel(
+                "Local GEOS engine unavailable: needs shapely with GEOS 3.14+ coverage cleaning"))
+
+        self.in_database_check = QCheckBox("Clean PostGIS layers in place on the server")
+        self.in_database_check.setToolTip(
+            "For layers stored in the pg_service database, clean the selected rows "
+            "where they are stored; only changed geometries are downloaded")
+        engine_layout.addRow(self.in_database_check)
+
+        self.in_database_writeback_check = QCheckBox(
+            "Write in-place results directly to the table (bypasses the edit buffer)")
+        self.in_database_writeback_check.setToolTip(
+            "UPDATE the changed rows on the server instead of downloading them for review. "
+            "Layers in edit mode always get the results in the edit buffer")
+        engine_layout.addRow(self.in_database_writeback_check)
+
+        self.direct_apply_check = QCheckBox(
+            "Write results directly to the data source (no undo step)")
+        self.direct_apply_check.setToolTip(
+            "Hand changed geometries to the data provider in batches instead of the "
+            "edit buffer. Faster for large runs, but cannot be undone. Layers already "
+            "in edit mode always get the results in the edit buffer")
+        engine_layout.addRow(self.direct_apply_check)
+
+        self.validity_probe_check = QCheckBox(
+            "Check coverage validity first, clean only where it is invalid")
+        self.validity_probe_check.setToolTip(
+            "PostGIS engine: look for invalid edges and narrow gaps before cleaning. A "
+            "coverage that is already clean is not cleaned at all, and a few problems "
+            "are cleaned with their neighbourhood only. Off while a time budget is set")
+        engine_layout.addRow(self.validity_probe_check)
+
+        engine_group.setLayout(engine_layout)
+        layout.addWidget(engine_group)
+
+        # Cleaning parameters group
+        params_group = QGroupBox("Cleaning Parameters")
+        params_layout = QFormLayout()
+
+        self.gap_tolerance_spin = QDoubleSpinBox()
+        self.gap_tolerance_spin.setDecimals(4)
+        self.gap_tolerance_spin.setRange(0.0, 1000000.0)
+        self.gap_tolerance_spin.setSingleStep(0.01)
+        self.gap_tolerance_spin.setSuffix(" map units")
+        params_layout.addRow("Gap Maximum Width:", self.gap_tolerance_spin)
+
+        self.snapping_distance_spin = QDoubleSpinBox()
+        self.snapping_distance_spin.setDecimals(4)
+        self.snapping_distance_spin.setRange(-1.0, 1000000.0)
+        self.snapping_distance_spin.setSingleStep(0.01)
+        self.snapping_distance_spin.setSuffix(" (-1=auto, 0=disabled)")
+        params_layout.addRow("Snapping Distance:", self.snapping_distance_spin)
+
+        self.merge_strategy_combo = QComboBox()
+        self.merge_strategy_combo.addItems([
+            "MERGE_LONGEST_BORDER - Longest common border (recommended)",
+            "MERGE_MAX_AREA - Maximum area",
+            "MERGE_MIN_AREA - Minimum area",
+            "MERGE_MIN_INDEX - Smallest input index"
+        ])
+        params_layout.addRow("Overlap Merge Strategy:", self.merge_strategy_combo)
+
+        self.simplify_tolerance_spin = QDoubleSpinBox()
+        self.simplify_tolerance_spin.setDecimals(4)
+        self.simplify_tolerance_spin.setRange(0.0, 1000000.0)
+        self.simplify_tolerance_spin.setSingleStep(0.01)
+        self.simplify_tolerance_spin.setSpecialValueText("Off")
+        self.simplify_tolerance_spin.setSuffix(" map units")
+        self.simplify_tolerance_spin.setToolTip(
+            "Simplify the cleaned coverage with ST_CoverageSimplify in the same query.\n"
+            "Shared edges stay shared and the outer boundary of the selection is kept.\n"
+            "Not applied to entire-layer, re-clean and in-database runs.")
+        params_layout.addRow("Simplify Tolerance:", self.simplify_tolerance_spin)
+
+        params_group.setLayout(params_layout)
+        layout.addWidget(params_group)
+
+        # Performance settings group
+        perf_group = QGroupBox("Performance")
+        perf_layout = QVBoxLayout()
+
+        self.verbose_logging_check = QCheckBox("Enable verbose logging (slower but detailed)")
+        perf_layout.addWidget(self.verbose_logging_check)
+
+        self.profiling_check = QCheckBox("Record stage timings (run profile)")
+        self.profiling_check.setToolTip(
+            "Log a JSON summary of every run with the time spent per stage and the rows "
+            "and bytes transferred; the last one can be exported from the menu")
+        perf_layout.addWidget(self.profiling_check)
+
+        self.diagnostics_check = QCheckBox("Server diagnostics (EXPLAIN ANALYZE, slower)")
+        self.diagnostics_check.setToolTip(
+            "PostGIS engine: run the load and clean statements under EXPLAIN (ANALYZE, "
+            "BUFFERS), read pg_stat_statements when it is installed, and save a report "
+            "with the plans and the stage timings of every run to the QGIS profile folder")
+        perf_layout.addWidget(self.diagnostics_check)
+
+        self.capture_runs_check = QCheckBox("Capture run inputs for replay")
+        self.capture_runs_check.setToolTip(
+            "Write the input geometries, parameters and timings of every clean to a "
+            ".qtcap file in the QGIS profile folder, to be replayed with "
+            "benchmarks/replay.py on another machine")
+        perf_layout.addWidget(self.capture_runs_check)
+
+        self.use_copy_check = QCheckBox("Upload geometries with binary COPY")
+        self.use_copy_check.setToolTip(
+            "Stream geometries with COPY ... (FORMAT BINARY); falls back to "
+            "batch inserts when the server refuses COPY")
+        perf_layout.addWidget(self.use_copy_check)
+
+        self.partition_clusters_check = QCheckBox(
+            "Partition selection into independent clusters")
+        self.partition_clusters_check.setToolTip(
+            "Clean spatially disjoint groups of polygons separately instead of "
+            "in a single ST_CoverageClean window")
+        perf_layout.addWidget(self.partition_clusters_check)
+
+        workers_layout = QFormLayout()
+        self.partition_workers_spin = QSpinBox()
+        self.partition_workers_spin.setRange(1, 16)
+        self.partition_workers_spin.setToolTip(
+            "Number of database connections used to clean clusters concurrently")
+        workers_layout.addRow("Parallel connections:", self.partition_workers_spin)
+
+        self.tile_features_spin = QSpinBox()
+        self.tile_features_spin.setRange(100, 1000000)
+        self.tile_features_spin.setSingleStep(1000)
+        self.tile_features_spin.setToolTip(
+            "Target number of features per tile when cleaning an entire layer")
+        workers_layout.addRow("Features per tile (entire layer):", self.tile_features_spin)
+
+        self.transfer_precision_spin = QSpinBox()
+        self.transfer_precision_spin.setRange(-1, TWKB_MAX_PRECISION)
+        self.transfer_precision_spin.setSpecialValueText("Full precision (WKB)")
+        self.transfer_precision_spin.setSuffix(" decimals (TWKB)")
+        self.transfer_precision_spin.setToolTip(
+            "PostGIS engine: send and receive geometries as TWKB rounded to this many "
+            "decimals, e.g. 3 for millimetres in a metric CRS. Much smaller than WKB for "
+            "dense polygons, but coordinates are rounded before cleaning and every selected "
+            "feature the rounding moves is written back rounded")
+        workers_layout.addRow("Transfer precision:", self.transfer_precision_spin)
+
+        self.time_budget_spin = QSpinBox()
+        self.time_budget_spin.setRange(0, 86400)
+        self.time_budget_spin.setSpecialValueText("No limit")
+        self.time_budget_spin.setSuffix(" s")
+        self.time_budget_spin.setToolTip(
+            "PostGIS engine: stop a clean that takes longer than this (statement_timeout), "
+            "split the selection in two and clean the halves separately, again and again "
+            "if needed. Puts an upper bound on slow runs. Partitioned runs fail when a "
+            "cluster exceeds it; turns the validity check off; not used for in-database runs")
+        workers_layout.addRow("Time budget per query:", self.time_budget_spin)
+        perf_layout.addLayout(workers_layout)
+
+        self.result_cache_check = QCheckBox("Reuse results of identical runs (result cache)")
+        self.result_cache_check.setToolTip(
+            "Runs on the same geometries with the same parameters return the cached "
+            "result without cleaning again")
+        perf_layout.addWidget(self.result_cache_check)
+
+        self.disk_cache_check = QCheckBox("Keep cached results on disk between sessions")
+        perf_layout.addWidget(self.disk_cache_check)
+
+        cache_layout = QFormLayout()
+        self.disk_cache_mb_spin = QSpinBox()
+        self.disk_cache_mb_spin.setRange(1, 100000)
+        self.disk_cache_mb_spin.setSuffix(" MB")
+        self.disk_cache_mb_spin.setToolTip(
+            "Oldest cached results are removed when the disk cache grows past this size")
+        cache_layout.addRow("Disk cache size:", self.disk_cache_mb_spin)
+        perf_layout.addLayout(cache_layout)
+
+        perf_group.setLayout(perf_layout)
+        layout.addWidget(perf_group)
+
+        # Buttons
+        button_layout = QHBoxLayout()
+        save_button = QPushButton("Save")
+        save_button.clicked.connect(self.save_and_close)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+
+        button_layout.addStretch()
+        button_layout.addWidget(save_button)
+        button_layout.addWidget(cancel_button)
+
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def load_settings(self):
+        """Load settings from plugin."""
+        self.pg_service_edit.setText(self.plugin.pg_service)
+        self.gap_tolerance_spin.setValue(self.plugin.gap_tolerance)
+        self.snapping_distance_spin.setValue(self.plugin.snapping_distance)
+        self.simplify_tolerance_spin.setValue(self.plugin.simplify_tolerance)
+
+        # Set merge strategy combo
+        strategies = ["MERGE_LONGEST_BORDER", "MERGE_MAX_AREA", "MERGE_MIN_AREA", "MERGE_MIN_INDEX"]
+        if self.plugin.merge_strategy in strategies:
+            self.merge_strategy_combo.setCurrentIndex(strategies.index(self.plugin.merge_strategy))
+
+        self.engine_combo.setCurrentIndex(max(0, self.engine_combo.findData(self.plugin.engine)))
+        self.in_database_check.setChecked(self.plugin.in_database)
+        self.in_database_writeback_check.setChecked(self.plugin.in_database_writeback)
+        self.direct_apply_check.setChecked(self.plugin.direct_apply)
+        self.transfer_precision_spin.setValue(self.plugin.transfer_precision)
+        self.validity_probe_check.setChecked(self.plugin.validity_probe)
+        self.time_budget_spin.setValue(self.plugin.time_budget)
+        self.verbose_logging_check.setChecked(self.plugin.verbose_logging)
+        self.profiling_check.setChecked(self.plugin.profiling)
+        self.diagnostics_check.setChecked(self.plugin.diagnostics)
+        self.capture_runs_check.setChecked(self.plugin.capture_runs)
+        self.use_copy_check.setChecked(self.plugin.use_copy)
+        self.partition_clusters_check.setChecked(self.plugin.partition_clusters)
+        self.partition_workers_spin.setValue(self.plugin.partition_workers)
+        self.tile_features_spin.setValue(self.plugin.tile_features)
+        self.result_cache_check.setChecked(self.plugin.result_cache_enabled)
+        self.disk_cache_check.setChecked(self.plugin.disk_cache)
+        self.disk_cache_mb_spin.setValue(self.plugin.disk_cache_mb)
+
+    def save_and_close(self):
+        """Save settings to plugin and close dialog."""
+        self.plugin.pg_service = self.pg_service_edit.text()
+        self.plugin.gap_tolerance = self.gap_tolerance_spin.value()
+        self.plugin.snapping_distance = self.snapping_distance_spin.value()
+
+        # Extract strategy key from combo text
+        strategy_text = self.merge_strategy_combo.currentText()
+        self.plugin.merge_strategy = strategy_text.split(" - ")[0]
+        self.plugin.simplify_tolerance = self.simplify_tolerance_spin.value()
+
+        self.plugin.engine = self.engine_combo.currentData()
+        self.plugin.in_database = self.in_database_check.isChecked()
+        self.plugin.in_database_writeback = self.in_database_writeback_check.isChecked()
+        self.plugin.direct_apply = self.direct_apply_check.isChecked()
+        self.plugin.transfer_precision = self.transfer_precision_spin.value()
+        self.plugin.validity_probe = self.validity_probe_check.isChecked()
+        self.plugin.time_budget = self.time_budget_spin.value()
+        self.plugin.verbose_logging = self.verbose_logging_check.isChecked()
+        self.plugin.profiling = self.profiling_check.isChecked()
+        self.plugin.diagnostics = self.diagnostics_check.isChecked()
+        self.plugin.capture_runs = self.capture_runs_check.isChecked()
+        self.plugin.use_copy = self.use_copy_check.isChecked()
+        self.plugin.partition_clusters = self.partition_clusters_check.isChecked()
+        self.plugin.partition_workers = self.partition_workers_spin.value()
+        self.plugin.tile_features = self.tile_features_spin.value()
+        self.plugin.result_cache_enabled = self.result_cache_check.isChecked()
+        self.plugin.disk_cache = self.disk_cache_check.isChecked()
+        self.plugin.disk_cache_mb = self.disk_cache_mb_spin.value()
+
+        # Save to QSettings for persistence
+        self.plugin.save_settings()
+
+        # Update toolbar widgets
+        self.plugin.gap_tolerance_widget.setValue(self.plugin.gap_tolerance)
+        self.plugin.snapping_distance_widget.setValue(self.plugin.snapping_distance)
+
+        # Update merge strategy combo
+        short_name = self.plugin.merge_strategy.replace("MERGE_", "")
+        self.plugin.merge_strategy_widget.setCurrentText(short_name)
+        self.plugin.simplify_tolerance_widget.setValue(self.plugin.simplify_tolerance)
+
+        self.accept()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Result spool: changed geometries of a run kept as length-prefixed WKB
+ until they are applied. Pure Python up to decoding, which imports QGIS
+ when the spool is iterated, so the spool logic can be tested outside QGIS.
+"""
+import os
+import struct
+import tempfile
+
+# Changed geometries of a run up to this size stay in memory, the rest is
+# written to a temporary file
+SPOOL_MEMORY_BYTES = 32 * 1024 * 1024
+
+# Spool record header: input index and WKB length (0 for a NULL geometry)
+_SPOOL_RECORD = struct.Struct("<II")
+
+
+class ResultSpool:
+    """Changed geometries of a run, kept as WKB until they are applied.
+
+    Result rows are appended batch by batch on the worker thread as
+    length-prefixed records in a SpooledTemporaryFile: small results stay
+    in memory, large ones spill to disk. Iterating decodes one geometry at
+    a time, so the spool can feed apply_geometry_changes() directly. Used
+    as CleaningResult.changed; the file goes away with the result.
+    """
+
+    def __init__(self, max_memory=SPOOL_MEMORY_BYTES):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self._count = 0
+        self.wkb_bytes = 0
+
+    def __len__(self):
+        return self._count
+
+    def extend(self, rows):
+        """Append (input index, WKB) rows; a None WKB stands for a NULL geometry."""
+        self._file.seek(0, os.SEEK_END)
+        for idx, wkb in rows:
+            wkb = wkb or b""
+            self._file.write(_SPOOL_RECORD.pack(idx, len(wkb)))
+            self._file.write(wkb)
+            self._count += 1
+            self.wkb_bytes += len(wkb)
+
+    def mark(self):
+        """Return the current end of the spool, to go back to with rollback()."""
+        self._file.seek(0, os.SEEK_END)
+        return self._count, self.wkb_bytes, self._file.tell()
+
+    def rollback(self, mark):
+        """Drop the rows appended since mark() returned mark."""
+        self._count, self.wkb_bytes, position = mark
+        self._file.truncate(position)
+
+    def indexes(self):
+        """Return the set of input indexes in the spool, without reading the WKB."""
+        found = set()
+        pos = 0
+        for _ in range(self._count):
+            self._file.seek(pos)
+            idx, length = _SPOOL_RECORD.unpack(self._file.read(_SPOOL_RECORD.size))
+            found.add(idx)
+            pos += _SPOOL_RECORD.size + length
+        return found
+
+    def wkb_items(self):
+        """Yield (input index, WKB) in the order the rows were appended, without decoding."""
+        pos = 0
+        for _ in range(self._count):
+            self._file.seek(pos)
+            idx, length = _SPOOL_RECORD.unpack(self._file.read(_SPOOL_RECORD.size))
+            wkb = self._file.read(length) if length else None
+            pos += _SPOOL_RECORD.size + length
+            yield idx, wkb
+
+    def __iter__(self):
+        # QGIS is only needed to decode, see the module docstring
+        from .utils import wkb_to_geom
+        for idx, wkb in self.wkb_items():
+            yield idx, wkb_to_geom(wkb)
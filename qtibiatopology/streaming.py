@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Memory-bounded runs: selected features are read from a layer snapshot in
+ chunks; changed geometries are kept as WKB in a ResultSpool (spool.py)
+ until they are applied.
+"""
+from array import array
+from bisect import bisect_right
+
+from qgis.core import QgsFeatureRequest, QgsVectorLayerFeatureSource
+
+from .spool import ResultSpool
+from .utils import wkb_to_geom
+
+# Selected features are read from the layer this many at a time
+READ_CHUNK_FEATURES = 2000
+
+
+class SelectionStream:
+    """Selected features of a layer, read geometry-only in chunks when iterated.
+
+    Stands in for a list of QgsFeature in cleaning runs: it has a length
+    and can be iterated more than once, but never holds more than one
+    chunk of features. Built on the main thread; iterating only reads the
+    QgsVectorLayerFeatureSource snapshot, so it is safe on a worker thread.
+    Features come in ascending id order, so input index idx is always
+    fids[idx].
+    """
+
+    def __init__(self, layer, fids=None, chunk_features=READ_CHUNK_FEATURES):
+        """Constructor.
+
+        :param layer: QgsVectorLayer to read from
+        :param fids: Feature ids to read, the layer's selection when None
+        :param chunk_features: Features fetched per QgsFeatureRequest
+        """
+        self.source = QgsVectorLayerFeatureSource(layer)
+        self.fids = array("q", sorted(layer.selectedFeatureIds() if fids is None else fids))
+        self.chunk_features = chunk_features
+
+    def __len__(self):
+        return len(self.fids)
+
+    def __iter__(self):
+        for start in range(0, len(self.fids), self.chunk_features):
+            chunk = self.fids[start:start + self.chunk_features]
+            request = QgsFeatureRequest().setFilterFids(list(chunk)).setSubsetOfAttributes([])
+            features = sorted(self.source.getFeatures(request), key=lambda feature: feature.id())
+            if len(features) != len(chunk):
+                # Input indexes would no longer match fids
+                raise RuntimeError(f"{len(chunk) - len(features)} selected features could not "
+                                   "be read from the layer")
+            yield from features
+
+
+class MultiLayerSelection:
+    """Selected features of several layers, cleaned together as one coverage.
+
+    The selections are chained in layer order, so every layer owns one
+    contiguous range of input indexes: input index idx is feature
+    fids[idx - start] of the layer whose range starts at start. The range
+    is the (layer, feature id) tag of a staged feature, which keeps the
+    staging table and the clean queries the same as for one layer.
+    """
+
+    def __init__(self, layers, chunk_features=READ_CHUNK_FEATURES):
+        """Constructor.
+
+        :param layers: QgsVectorLayers whose selections are cleaned, all in one CRS
+        :param chunk_features: Features fetched per QgsFeatureRequest
+        """
+        self.layer_ids = [layer.id() for layer in layers]
+        self.layer_names = [layer.name() for layer in layers]
+        self.streams = [SelectionStream(layer, chunk_features=chunk_features) for layer in layers]
+        self.starts = []
+        start = 0
+        for stream in self.streams:
+            self.starts.append(start)
+            start += len(stream)
+        self._count = start
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for stream in self.streams:
+            yield from stream
+
+    def locate(self, idx):
+        """Return the (layer id, feature id) of input index idx."""
+        part = bisect_right(self.starts, idx) - 1
+        return self.layer_ids[part], self.streams[part].fids[idx - self.starts[part]]
+
+    def layer_changes(self, changed, layer_id):
+        """Yield (feature id, QgsGeometry) of the changed rows that belong to layer_id.
+
+        Spooled rows of other layers are skipped without being decoded.
+
+        :param changed: CleaningResult.changed of the run on this selection
+        """
+        part = self.layer_ids.index(layer_id)
+        start = self.starts[part]
+        fids = self.streams[part].fids
+        stop = start + len(fids)
+        if isinstance(changed, ResultSpool):
+            for idx, wkb in changed.wkb_items():
+                if start <= idx < stop:
+                    yield fids[idx - start], wkb_to_geom(wkb)
+        else:
+            for idx, geom in changed:
+                if start <= idx < stop:
+                    yield fids[idx - start], geom
+
+
+def feature_ids(features):
+    """Return the layer feature id of every input index of a run.
+
+    :param features: SelectionStream or list of QgsFeature the run cleaned
+    """
+    if isinstance(features, SelectionStream):
+        return features.fids
+    return [feature.id() for feature in features]
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Parameter sweeps: the same selection is cleaned with several
+ tolerance/snapping/strategy combinations, the results are compared in a
+ table and the chosen one is applied without cleaning again.
+"""
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPlainTextEdit,
+                             QPushButton, QMessageBox, QTableWidget, QTableWidgetItem,
+                             QAbstractItemView)
+from PyQt5.QtCore import Qt
+
+from .cache import input_digest, run_key
+from .engines import parse_combinations
+from .utils import log_message
+
+# Gap tolerances offered in a new sweep, as multiples of the current one
+DEFAULT_GAP_FACTORS = (0.5, 1, 2, 5, 10)
+
+
+def cache_sweep_results(cache, features, sweeps, engine):
+    """Store every combination of a sweep in the result cache.
+
+    A later "Clean Coverage" with one of the swept combinations then
+    returns right away.
+    """
+    if not cache.enabled:
+        return
+    digest = input_digest(features)
+    for sweep in sweeps:
+        cache.put(run_key(digest, sweep.gap_tolerance, sweep.snapping_distance,
+                          sweep.merge_strategy, engine), sweep.result)
+
+
+class SweepParametersDialog(QDialog):
+    """Asks for the combinations of a parameter sweep."""
+
+    def __init__(self, plugin, feature_count, parent=None):
+        super().__init__(parent)
+        self.plugin = plugin
+        self.combinations = None
+        self.setWindowTitle("Coverage Cleaning - Parameter Sweep")
+        self.setMinimumWidth(450)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(
+            f"Clean the {feature_count} selected features with each combination below.\n"
+            "One combination per line: gap, snap[, strategy]. Snap -1 is automatic."))
+
+        self.combinations_edit = QPlainTextEdit()
+        short_strategy = plugin.merge_strategy.replace("MERGE_", "")
+        self.combinations_edit.setPlainText("\n".join(
+            f"{plugin.gap_tolerance * factor:g}, {plugin.snapping_distance:g}, {short_strategy}"
+            for factor in DEFAULT_GAP_FACTORS))
+        layout.addWidget(self.combinations_edit)
+
+        button_layout = QHBoxLayout()
+        run_button = QPushButton("Run Sweep")
+        run_button.clicked.connect(self.run_and_close)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(run_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def run_and_close(self):
+        """Validate the combinations and close the dialog."""
+        try:
+            self.combinations = parse_combinations(
+                self.combinations_edit.toPlainText(), self.plugin.merge_strategy)
+        except ValueError as e:
+            QMessageBox.warning(self, "Parameter Sweep", str(e))
+            return
+        self.accept()
+
+
+class SweepResultsDialog(QDialog):
+    """Compares the combinations of a finished sweep and lets the user pick one."""
+
+    COLUMNS = ("Gap", "Snap", "Strategy", "Changed", "Net area change", "Area changed",
+               "Runtime (s)")
+
+    def __init__(self, sweeps, feature_count, parent=None):
+        super().__init__(parent)
+        self.sweeps = sweeps
+        self.setWindowTitle("Coverage Cleaning - Sweep Results")
+        self.setMinimumWidth(700)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"{feature_count} features, {len(sweeps)} combinations. "
+                                "Select a row and apply it to the edit buffer."))
+
+        self.table = QTableWidget(len(sweeps), len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        for row, sweep in enumerate(sweeps):
+            values = (f"{sweep.gap_tolerance:g}", f"{sweep.snapping_distance:g}",
+                      sweep.merge_strategy.replace("MERGE_", ""),
+                      f"{len(sweep.result.changed)}", f"{sweep.area_delta:.6g}",
+                      f"{sweep.area_changed:.6g}", f"{sweep.seconds:.3f}")
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column != 2:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+        self.table.itemSelectionChanged.connect(self.on_selection_changed)
+        self.table.cellDoubleClicked.connect(lambda _row, _column: self.accept())
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.apply_button = QPushButton("Apply Selected")
+        self.apply_button.setEnabled(False)
+        self.apply_button.clicked.connect(self.accept)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(self.apply_button)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def on_selection_changed(self):
+        self.apply_button.setEnabled(bool(self.table.selectionModel().selectedRows()))
+
+    def chosen(self):
+        """Return the selected SweepResult, or None."""
+        rows = self.table.selectionModel().selectedRows()
+        return self.sweeps[rows[0].row()] if rows else None
+
+
+def log_sweep(sweeps):
+    """Log the summary table of a sweep."""
+    log_message(f"Sweep of {len(sweeps)} combinations:")
+    for sweep in sweeps:
+        log_message(f"  gap={sweep.gap_tolerance:g} snap={sweep.snapping_distance:g} "
+                    f"{sweep.merge_strategy}: {len(sweep.result.changed)} changed, "
+                    f"net area {sweep.area_delta:.6g}, area changed {sweep.area_changed:.6g}, "
+                    f"{sweep.seconds:.3f}s")
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Result cache of cache.py: run keys, the memory LRU and the disk tier.
+
+Results are given as ResultSpools, which the cache stores without decoding,
+so no QGIS or database is needed. From the repository root:
+
+    python -m pytest qtibiatopology/test_cache.py
+"""
+import os
+
+from . import cache
+from .cache import ResultCache, run_key
+from .engines import CleaningResult
+from .spool import ResultSpool
+
+DIGEST = bytes(32)
+
+
+def result(rows, total=10):
+    spool = ResultSpool()
+    spool.extend(rows)
+    return CleaningResult(spool, total)
+
+
+def rows_of(size, idx=0):
+    """One changed row holding size bytes of WKB, with the 8 bytes of bookkeeping."""
+    return [(idx, b"\x01" * (size - 8))]
+
+
+def test_run_key_separates_parameters_and_variants():
+    key = run_key(DIGEST, 0.01, -1, "MERGE_LONGEST_BORDER", "postgis")
+    assert key == run_key(DIGEST, 0.01, -1, "MERGE_LONGEST_BORDER", "postgis")
+    others = [
+        run_key(b"\x01" + DIGEST[1:], 0.01, -1, "MERGE_LONGEST_BORDER", "postgis"),
+        run_key(DIGEST, 0.02, -1, "MERGE_LONGEST_BORDER", "postgis"),
+        run_key(DIGEST, 0.01, 0, "MERGE_LONGEST_BORDER", "postgis"),
+        run_key(DIGEST, 0.01, -1, "MERGE_MAX_AREA", "postgis"),
+        run_key(DIGEST, 0.01, -1, "MERGE_LONGEST_BORDER", "geos"),
+        run_key(DIGEST, 0.01, -1, "MERGE_LONGEST_BORDER", "postgis:probe"),
+        run_key(DIGEST, 0.01, -1, "MERGE_LONGEST_BORDER", "postgis:twkb3"),
+    ]
+    assert len({key, *others}) == len(others) + 1
+
+
+def test_variants_are_cached_apart():
+    results = ResultCache()
+    plain = run_key(DIGEST, 0.01, -1, "MERGE_LONGEST_BORDER", "postgis")
+    probed = run_key(DIGEST, 0.01, -1, "MERGE_LONGEST_BORDER", "postgis:probe")
+    results.put(plain, result([(1, b"\x01plain")]))
+    assert results.get_wkb(plain) == (10, [(1, b"\x01plain")])
+    assert results.get_wkb(probed) is None
+    assert (results.hits, results.misses) == (1, 1)
+
+
+def test_memory_tier_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(cache, "MEMORY_CACHE_MAX_BYTES", 300)
+    results = ResultCache()
+    for key in "abc":
+        results.put(key, result(rows_of(100)))
+    # Using a makes b the least recently used entry
+    assert results.get_wkb("a") is not None
+    results.put("d", result(rows_of(100)))
+    assert results.get_wkb("b") is None
+    for key in "acd":
+        assert results.get_wkb(key) == (10, rows_of(100))
+
+
+def test_entry_above_memory_cap_is_not_kept_in_memory(monkeypatch):
+    monkeypatch.setattr(cache, "MEMORY_CACHE_MAX_BYTES", 300)
+    results = ResultCache()
+    results.put("small", result(rows_of(100)))
+    results.put("large", result(rows_of(400)))
+    assert results.get_wkb("large") is None
+    assert results.get_wkb("small") is not None
+
+
+def test_disk_tier_round_trip(tmp_path):
+    rows = [(0, b"\x01first"), (4, None), (9, b"\x01" * 500)]
+    ResultCache(disk_folder=str(tmp_path), disk_max_bytes=1 << 20).put("key", result(rows, 42))
+    # A new cache has an empty memory tier, so the entry comes from disk
+    results = ResultCache(disk_folder=str(tmp_path), disk_max_bytes=1 << 20)
+    assert results.get_wkb("key") == (42, rows)
+    assert results.hits == 1
+
+
+def test_disk_tier_keeps_large_results_out_of_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "MEMORY_CACHE_MAX_BYTES", 300)
+    results = ResultCache(disk_folder=str(tmp_path), disk_max_bytes=1 << 20)
+    results.put("large", result(rows_of(400)))
+    # Streamed from the spool to disk only, and read back from there
+    assert results.get_wkb("large") == (10, rows_of(400))
+    assert results.get_wkb("large") == (10, rows_of(400))
+
+
+def test_disk_tier_evicts_oldest_above_cap(tmp_path):
+    results = ResultCache(disk_folder=str(tmp_path), disk_max_bytes=2500)
+    for number, key in enumerate("abc"):
+        results.put(key, result(rows_of(1000)))
+        # Entries are evicted by modification time
+        path = tmp_path / f"{key}.bin"
+        os.utime(path, (number, number))
+    assert sorted(os.listdir(tmp_path)) == ["b.bin", "c.bin"]
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    results = ResultCache(enabled=False, disk_folder=str(tmp_path), disk_max_bytes=1 << 20)
+    results.put("key", result(rows_of(100)))
+    assert results.get_wkb("key") is None
+    assert not os.listdir(tmp_path)
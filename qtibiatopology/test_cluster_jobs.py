@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Job planning of partitioned cleans in cluster_jobs.py.
+
+Pure Python, no QGIS or database needed. From the repository root:
+
+    python -m pytest qtibiatopology/test_cluster_jobs.py
+"""
+import pytest
+
+from .cluster_jobs import PARTITION_BATCH_FEATURES, distribute_jobs, plan_cluster_jobs
+
+
+def test_large_clusters_get_their_own_job():
+    clusters = [(1, 2000), (2, PARTITION_BATCH_FEATURES), (3, 10), (4, 5)]
+    assert plan_cluster_jobs(clusters) == [([1], 2000), ([2], PARTITION_BATCH_FEATURES),
+                                           ([3, 4], 15)]
+
+
+def test_small_clusters_are_batched():
+    clusters = [(cluster_id, 100) for cluster_id in range(12)]
+    jobs = plan_cluster_jobs(clusters)
+    assert [size for _ids, size in jobs] == [500, 500, 200]
+    assert [cluster_id for ids, _size in jobs for cluster_id in ids] == list(range(12))
+
+
+def test_no_clusters_no_jobs():
+    assert plan_cluster_jobs([]) == []
+
+
+def test_distribute_balances_largest_first():
+    jobs = [([1], 900), ([2], 600), ([3], 500), ([4], 400), ([5], 300), ([6], 100)]
+    buckets = distribute_jobs(jobs, 3)
+    # Ties go to the first least loaded worker
+    assert buckets == [
+        [([1], 900), ([6], 100)],
+        [([2], 600), ([5], 300)],
+        [([3], 500), ([4], 400)],
+    ]
+
+
+def test_distribute_keeps_every_job_once():
+    jobs = [([cluster_id], size) for cluster_id, size in enumerate((7, 3, 9, 1, 4, 4, 8, 2))]
+    buckets = distribute_jobs(jobs, 3)
+    assert sorted(job for bucket in buckets for job in bucket) == sorted(jobs)
+    loads = [sum(size for _ids, size in bucket) for bucket in buckets]
+    # Largest-first greedy: no worker ends up more than the largest job above another
+    assert max(loads) - min(loads) <= max(size for _ids, size in jobs)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_distribute_more_workers_than_jobs(workers):
+    jobs = [([1], 10)]
+    buckets = distribute_jobs(jobs, workers)
+    assert len(buckets) == workers
+    assert buckets[0] == jobs
+    assert all(bucket == [] for bucket in buckets[1:])
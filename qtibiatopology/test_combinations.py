@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing of parameter sweep combinations, engines.parse_combinations().
+
+Pure Python, no QGIS or database needed. From the repository root:
+
+    python -m pytest qtibiatopology/test_combinations.py
+"""
+import re
+
+import pytest
+
+from .engines import parse_combinations
+
+DEFAULT = "MERGE_LONGEST_BORDER"
+
+
+def test_valid_lines():
+    text = """
+        # gap, snap[, strategy]
+        0.01, -1
+        0.05, 0, max_area
+        1e-3 , 0.5 , MERGE_MIN_INDEX
+
+    """
+    assert parse_combinations(text, DEFAULT) == [
+        (0.01, -1.0, DEFAULT),
+        (0.05, 0.0, "MERGE_MAX_AREA"),
+        (0.001, 0.5, "MERGE_MIN_INDEX"),
+    ]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("0.01", "Line 1: expected gap, snap[, strategy]"),
+    ("0.01, -1, max_area, extra", "Line 1: expected gap, snap[, strategy]"),
+    ("0.01, -1\nwide, -1", "Line 2: gap and snap must be numbers"),
+    ("0.01, ", "Line 1: gap and snap must be numbers"),
+    ("-0.01, -1", "Line 1: gap must be >= 0 and snap >= -1"),
+    ("0.01, -2", "Line 1: gap must be >= 0 and snap >= -1"),
+    ("# header\n0.01, -1, biggest", "Line 2: unknown merge strategy biggest"),
+    ("", "Enter at least one combination"),
+    ("# only a comment\n\n", "Enter at least one combination"),
+])
+def test_malformed_lines(text, message):
+    with pytest.raises(ValueError, match=f"^{re.escape(message)}$"):
+        parse_combinations(text, DEFAULT)
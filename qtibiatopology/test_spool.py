@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+ResultSpool of spool.py: appending, rollback and reading back without decoding.
+
+Pure Python, no QGIS or database needed. From the repository root:
+
+    python -m pytest qtibiatopology/test_spool.py
+"""
+import pytest
+
+from .spool import ResultSpool
+
+ROWS = [(0, b"\x01first"), (3, None), (7, b"\x01third geometry")]
+
+
+@pytest.fixture(params=[1 << 20, 8], ids=["memory", "spilled"])
+def spool(request):
+    # A tiny max_memory makes the spool spill to a temporary file at once
+    return ResultSpool(max_memory=request.param)
+
+
+def test_rows_come_back_in_order(spool):
+    spool.extend(ROWS)
+    spool.extend([(9, b"\x01later")])
+    assert list(spool.wkb_items()) == ROWS + [(9, b"\x01later")]
+    assert len(spool) == 4
+    assert spool.wkb_bytes == sum(len(wkb or b"") for _idx, wkb in ROWS) + len(b"\x01later")
+
+
+def test_empty_wkb_reads_back_as_null(spool):
+    spool.extend([(1, b"")])
+    assert list(spool.wkb_items()) == [(1, None)]
+
+
+def test_rollback_drops_rows_after_mark(spool):
+    spool.extend(ROWS[:1])
+    mark = spool.mark()
+    spool.extend(ROWS[1:])
+    spool.rollback(mark)
+    assert list(spool.wkb_items()) == ROWS[:1]
+    assert len(spool) == 1
+    assert spool.wkb_bytes == len(ROWS[0][1])
+    # Appending after a rollback continues where the mark was
+    spool.extend([(5, b"\x01again")])
+    assert list(spool.wkb_items()) == [ROWS[0], (5, b"\x01again")]
+
+
+def test_rollback_to_empty(spool):
+    mark = spool.mark()
+    spool.extend(ROWS)
+    spool.rollback(mark)
+    assert len(spool) == 0
+    assert list(spool.wkb_items()) == []
+
+
+def test_indexes(spool):
+    assert spool.indexes() == set()
+    spool.extend(ROWS[:1])
+    mark = spool.mark()
+    spool.extend(ROWS[1:])
+    assert spool.indexes() == {0, 3, 7}
+    spool.rollback(mark)
+    assert spool.indexes() == {0}
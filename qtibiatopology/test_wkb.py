@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+EWKB and TWKB conversions of wkb.py.
+
+Pure Python, no QGIS or database needed. From the repository root:
+
+    python -m pytest qtibiatopology/test_wkb.py
+"""
+import struct
+
+import pytest
+
+from .benchmarks.bench_wkb_decode import legacy_ewkb_to_wkb, make_ewkb
+from .wkb import ewkb_to_wkb, twkb_to_wkb, wkb_to_twkb, wkb_to_twkb_rounded
+
+EWKB_VARIANTS = [(order, parts, z, m)
+                 for order in "<>"
+                 for parts in (1, 3)
+                 for z in (False, True)
+                 for m in (False, True)]
+
+
+def polygon_wkb(coords):
+    """Little-endian 2D ISO WKB of a polygon with one ring."""
+    wkb = struct.pack("<BII", 1, 3, 1) + struct.pack("<I", len(coords))
+    for x, y in coords:
+        wkb += struct.pack("<2d", x, y)
+    return wkb
+
+
+@pytest.mark.parametrize("order, parts, z, m", EWKB_VARIANTS)
+def test_ewkb_to_wkb(order, parts, z, m):
+    ewkb, expected = make_ewkb(order, parts, 50, z=z, m=m)
+    assert bytes(ewkb_to_wkb(ewkb)) == expected
+    assert bytes(ewkb_to_wkb(memoryview(ewkb))) == expected
+
+
+@pytest.mark.parametrize("z", (False, True))
+def test_ewkb_to_wkb_reads_legacy_output(z):
+    # The legacy hex path only handled little-endian 2D/Z input; Z stayed an
+    # EWKB flag there, which QGIS reads as a 25D type
+    ewkb, expected = make_ewkb("<", 1, 50, z=z)
+    legacy = legacy_ewkb_to_wkb(ewkb)
+    assert bytes(ewkb_to_wkb(legacy)) == expected
+    if not z:
+        assert legacy == expected
+
+
+def test_iso_wkb_passes_through():
+    _ewkb, iso = make_ewkb("<", 1, 50)
+    assert ewkb_to_wkb(iso) is iso
+
+
+@pytest.mark.parametrize("order, parts, z, m", EWKB_VARIANTS)
+def test_twkb_round_trip(order, parts, z, m):
+    # The ring coordinates are whole numbers, so no precision loses anything
+    _ewkb, iso = make_ewkb(order, parts, 50, z=z, m=m)
+    twkb, moved = wkb_to_twkb_rounded(iso, 0)
+    assert not moved
+    assert twkb == wkb_to_twkb(iso, 0)
+    # Decoded as little-endian ISO WKB whatever the input byte order
+    assert twkb_to_wkb(twkb) == make_ewkb("<", parts, 50, z=z, m=m)[1]
+
+
+def test_twkb_rounding_moves():
+    wkb = polygon_wkb([(0, 0), (1.005, 0), (1, 1.25), (0, 0)])
+    assert wkb_to_twkb_rounded(wkb, 3)[1] is False
+    twkb, moved = wkb_to_twkb_rounded(wkb, 1)
+    assert moved
+    assert twkb_to_wkb(twkb) == polygon_wkb([(0, 0), (1.0, 0), (1, 1.3), (0, 0)])
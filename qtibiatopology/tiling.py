@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Whole-layer cleaning: the layer extent is split into tiles, each tile is
+ cleaned together with a halo of neighbouring features and only its own
+ (core) features are kept. A second pass over a grid shifted by half a tile
+ re-cleans the features along the seams, which then lie inside a tile.
+"""
+import json
+import math
+import os
+import sqlite3
+import time
+
+from qgis.core import QgsFeature, QgsFeatureRequest, QgsRectangle
+
+from .engines import resolve_snapping_distance
+from .utils import geometry_wkb, log_message, wkb_to_geom
+
+# Pass numbers stored in the checkpoint
+PASS_TILES = 1
+PASS_SEAMS = 2
+PASS_PARTS = 3
+
+# A tile owning more than this many times tile_features is split 3 x 3.
+# Thirds never fall on the half-tile lines of the seam grid, so features
+# along the split lines are reconciled by the seam pass like tile borders.
+TILE_SPLIT_FACTOR = 2
+TILE_SPLIT_DEPTH = 4
+# Checkpoint keys of tile parts: tile * PART_KEYS + part path, the path
+# written in base 9 after a leading 1
+PART_KEYS = 9 ** (TILE_SPLIT_DEPTH + 1)
+
+
+class TileGrid:
+    """Regular grid of tiles over an extent, optionally shifted by half a tile."""
+
+    def __init__(self, extent, cols, rows, shifted=False):
+        self.extent = extent
+        self.cols = cols + 1 if shifted else cols
+        self.rows = rows + 1 if shifted else rows
+        self.width = extent.width() / cols
+        self.height = extent.height() / rows
+        self.offset = 0.5 if shifted else 0.0
+
+    @classmethod
+    def for_layer(cls, extent, feature_count, tile_features, shifted=False):
+        """Build a square-ish grid with about tile_features features per tile."""
+        tiles = max(1, math.ceil(feature_count / max(1, tile_features)))
+        side = math.ceil(math.sqrt(tiles))
+        return cls(extent, side, side, shifted)
+
+    def __len__(self):
+        return self.cols * self.rows
+
+    def rect(self, index):
+        """Return the QgsRectangle of tile index."""
+        row, col = divmod(index, self.cols)
+        x0 = self.extent.xMinimum() + (col - self.offset) * self.width
+        y0 = self.extent.yMinimum() + (row - self.offset) * self.height
+        return QgsRectangle(x0, y0, x0 + self.width, y0 + self.height)
+
+    def index_of(self, x, y):
+        """Return the tile owning point (x, y); every point belongs to exactly one tile."""
+        col = int(math.floor((x - self.extent.xMinimum()) / self.width + self.offset)) if self.width else 0
+        row = int(math.floor((y - self.extent.yMinimum()) / self.height + self.offset)) if self.height else 0
+        col = min(max(col, 0), self.cols - 1)
+        row = min(max(row, 0), self.rows - 1)
+        return row * self.cols + col
+
+
+class CheckpointStore:
+    """SQLite file recording the progress of a whole-layer run.
+
+    Holds the finished tiles, the seam features found by the first pass and
+    every changed geometry as WKB, so changes never have to be kept in
+    memory and an interrupted run can resume. Each tile is committed in one
+    transaction, so a checkpoint never holds half a tile.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS done_tiles (
+                pass INTEGER, tile INTEGER, PRIMARY KEY (pass, tile));
+            CREATE TABLE IF NOT EXISTS seams (fid INTEGER PRIMARY KEY, x REAL, y REAL);
+            CREATE INDEX IF NOT EXISTS seams_xy ON seams (x, y);
+            CREATE TABLE IF NOT EXISTS changes (fid INTEGER PRIMARY KEY, wkb BLOB);
+        """)
+
+    @staticmethod
+    def signature(layer, gap_tolerance, snapping_distance, merge_strategy, tile_features):
+        """Describe a run; a checkpoint is only resumed for an identical run."""
+        return json.dumps({
+            "source": layer.source(),
+            "feature_count": layer.featureCount(),
+            "extent": layer.extent().toString(),
+            "params": [gap_tolerance, snapping_distance, merge_strategy],
+            "tile_features": tile_features,
+        }, sort_keys=True)
+
+    def matches(self, signature):
+        """Return True when the checkpoint belongs to a run with this signature."""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        return row is not None and row[0] == signature
+
+    def has_progress(self):
+        """Return True when at least one tile has been finished."""
+        return self.db.execute("SELECT 1 FROM done_tiles LIMIT 1").fetchone() is not None
+
+    def reset(self, signature):
+        """Forget all progress and start a checkpoint for a new run."""
+        with self.db:
+            for table in ("meta", "done_tiles", "seams", "changes"):
+                self.db.execute(f"DELETE FROM {table}")
+            self.db.execute("INSERT INTO meta (key, value) VALUES ('signature', ?)", (signature,))
+
+    def is_done(self, pass_number, tile):
+        return self.db.execute(
+            "SELECT 1 FROM done_tiles WHERE pass = ? AND tile = ?", (pass_number, tile)
+        ).fetchone() is not None
+
+    def finish_tile(self, pass_number, tile, changed=(), unchanged=(), seams=()):
+        """Record the results of one tile atomically.
+
+        :param changed: (fid, WKB) of core features whose geometry changed
+        :param unchanged: fids of core features that ended up unchanged
+        :param seams: (fid, x, y) of core features near the tile border
+        """
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO changes (fid, wkb) VALUES (?, ?)", changed)
+            self.db.executemany("DELETE FROM changes WHERE fid = ?", [(fid,) for fid in unchanged])
+            self.db.executemany("INSERT OR REPLACE INTO seams (fid, x, y) VALUES (?, ?, ?)", seams)
+            self.db.execute("INSERT INTO done_tiles (pass, tile) VALUES (?, ?)", (pass_number, tile))
+
+    def changed_wkb(self, fids):
+        """Return {fid: WKB} for those of fids that have a changed geometry."""
+        result = {}
+        fids = list(fids)
+        for start in range(0, len(fids), 500):
+            chunk = fids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            result.update(self.db.execute(
+                f"SELECT fid, wkb FROM changes WHERE fid IN ({placeholders})", chunk))
+        return result
+
+    def seams_in(self, rect):
+        """Return (fid, x, y) of the seam features whose centre lies in rect."""
+        return self.db.execute(
+            "SELECT fid, x, y FROM seams WHERE x >= ? AND x <= ? AND y >= ? AND y <= ?",
+            (rect.xMinimum(), rect.xMaximum(), rect.yMinimum(), rect.yMaximum())).fetchall()
+
+    def change_count(self):
+        return self.db.execute("SELECT count(*) FROM changes").fetchone()[0]
+
+    def iter_changes(self):
+        """Yield (fid, WKB) of every changed geometry."""
+        yield from self.db.execute("SELECT fid, wkb FROM changes ORDER BY fid")
+
+    def close(self):
+        self.db.close()
+
+    def remove(self):
+        """Close and delete the checkpoint file."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TiledCleaner:
+    """Cleans a whole layer tile by tile with bounded memory.
+
+    Only the features of the current tile and its halo are held in memory;
+    changed geometries go straight to the CheckpointStore. The grid is
+    uniform, so a tile over a dense area is split into parts until each
+    owns at most TILE_SPLIT_FACTOR * tile_features features.
+    """
+
+    def __init__(self, engine, source, extent, feature_count, store, gap_tolerance,
+                 snapping_distance, merge_strategy, tile_features, task=None, verbose=False):
+        """Constructor.
+
+        :param engine: CleaningEngine used for every tile
+        :param source: QgsFeatureSource of the layer (e.g. QgsVectorLayerFeatureSource)
+        :param extent: QgsRectangle of the layer
+        :param store: CheckpointStore of this run
+        :param tile_features: Target number of core features per tile
+        :param task: Optional TiledCleaningTask receiving progress and cancellation
+        """
+        self.engine = engine
+        self.source = source
+        self.store = store
+        self.gap_tolerance = gap_tolerance
+        # Every tile must snap with the distance a global clean would use
+        self.snapping_distance = resolve_snapping_distance(snapping_distance, extent)
+        self.merge_strategy = merge_strategy
+        self.task = task
+        self.verbose = verbose
+        # Anything within gap tolerance + snapping distance can interact with a core feature
+        self.halo = 2 * (gap_tolerance + self.snapping_distance)
+        self.max_core = TILE_SPLIT_FACTOR * max(1, tile_features)
+        self.tiles = TileGrid.for_layer(extent, feature_count, tile_features)
+        self.seam_tiles = TileGrid.for_layer(extent, feature_count, tile_features, shifted=True)
+
+    def run(self):
+        """Clean every tile, then the seams.
+
+        :return: Dict with features, seam_features, changed, seconds and
+            features_per_second. Features along the seams are cleaned in both
+            passes; features counts the first pass only, seam_features the
+            second, so neither inflates features_per_second
+        """
+        start = time.perf_counter()
+        total = len(self.tiles) + len(self.seam_tiles)
+        processed = seam_processed = 0
+
+        for index in range(len(self.tiles)):
+            self.start_tile(index, total)
+            if not self.store.is_done(PASS_TILES, index):
+                processed += self.clean_tile(index)
+        for index in range(len(self.seam_tiles)):
+            self.start_tile(len(self.tiles) + index, total)
+            if not self.store.is_done(PASS_SEAMS, index):
+                seam_processed += self.clean_seam_tile(index)
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "features": processed,
+            "seam_features": seam_processed,
+            "changed": self.store.change_count(),
+            "seconds": elapsed,
+            "features_per_second": processed / elapsed if elapsed else 0.0,
+        }
+        log_message(f"Whole-layer clean: {processed} features cleaned in {elapsed:.1f}s "
+                    f"({summary['features_per_second']:.0f} features/s) over "
+                    f"{len(self.tiles)} tiles, {seam_processed} seam features re-cleaned over "
+                    f"{len(self.seam_tiles)} seam tiles, {summary['changed']} geometries changed")
+        return summary
+
+    def start_tile(self, position, total):
+        """Report progress; raises CleaningCanceled when the task was canceled."""
+        if self.task is not None:
+            self.task.start_tile(position, total)
+
+    def clean_tile(self, index):
+        """First pass: clean the features owned by one tile.
+
+        :return: Number of core features cleaned
+        """
+        return self.clean_part(index, 1, self.tiles.rect(index),
+                               lambda x, y: self.tiles.index_of(x, y) == index, str(index))
+
+    def clean_part(self, index, path, rect, owns, label, depth=0):
+        """Clean the features of tile index owned by rect, splitting it when it owns too many.
+
+        :param path: Part of the tile, 1 for the whole tile (see PART_KEYS)
+        :param owns: Callable telling whether a feature centre (x, y) belongs to rect
+        :param label: Name of the part in the log, e.g. "12.4.0"
+        :return: Number of core features cleaned
+        """
+        if path == 1:
+            pass_number, key = PASS_TILES, index
+        else:
+            pass_number, key = PASS_PARTS, index * PART_KEYS + path
+            if self.store.is_done(pass_number, key):
+                return 0
+
+        start = time.perf_counter()
+        limit = self.max_core if depth < TILE_SPLIT_DEPTH else None
+        core = self.owned_features(rect, owns, limit)
+        if core is None:
+            log_message(lambda: f"  Tile {label} owns more than {limit} features, splitting it "
+                        "3 x 3", verbose=self.verbose)
+            processed = 0
+            for part in range(9):
+                processed += self.clean_part(index, path * 9 + part, self.part_rect(rect, part),
+                                             self.part_owner(rect, part, owns),
+                                             f"{label}.{part}", depth + 1)
+            self.store.finish_tile(pass_number, key)
+            return processed
+        if not core:
+            self.store.finish_tile(pass_number, key)
+            return 0
+
+        halo = self.halo_features(core)
+        result = self.engine.clean(core + halo, self.gap_tolerance, self.snapping_distance,
+                                   self.merge_strategy, self.task)
+
+        # Halo results are discarded, the halo features belong to other tiles
+        changed = [(core[idx].id(), geometry_wkb(geom))
+                   for idx, geom in result.changed if idx < len(core)]
+        # Features whose neighbourhood reaches past the tile get a second look
+        seams = [(feature.id(), *self.centre(feature)) for feature in core
+                 if not rect.contains(feature.geometry().boundingBox().buffered(self.halo))]
+        self.store.finish_tile(pass_number, key, changed=changed, seams=seams)
+
+        self.log_tile("Tile", label, len(core), len(halo), len(changed), start)
+        return len(core)
+
+    def clean_seam_tile(self, index):
+        """Second pass: re-clean the seam features of one shifted tile.
+
+        Neighbours are taken with their first pass results, so the seams
+        are reconciled against already cleaned geometry.
+
+        :return: Number of core features cleaned
+        """
+        start = time.perf_counter()
+        rect = self.seam_tiles.rect(index)
+        fids = [fid for fid, x, y in self.store.seams_in(rect)
+                if self.seam_tiles.index_of(x, y) == index]
+        if not fids:
+            self.store.finish_tile(PASS_SEAMS, index)
+            return 0
+
+        request = QgsFeatureRequest().setFilterFids(fids).setSubsetOfAttributes([])
+        originals = list(self.source.getFeatures(request))
+        core = self.with_cleaned_geometries(originals)
+        halo = self.with_cleaned_geometries(self.seam_halo_features(originals))
+        result = self.engine.clean(core + halo, self.gap_tolerance, self.snapping_distance,
+                                   self.merge_strategy, self.task)
+
+        # The engine compared against the first pass results; features it left
+        # alone keep their checkpoint entry, the others are checked against the
+        # layer again, since a seam clean can also undo a first pass change
+        changed = []
+        unchanged = []
+        for idx, geom in result.changed:
+            if idx >= len(core):
+                continue
+            original = originals[idx]
+            if original.geometry().equals(geom):
+                unchanged.append(original.id())
+            else:
+                changed.append((original.id(), geometry_wkb(geom)))
+        self.store.finish_tile(PASS_SEAMS, index, changed=changed, unchanged=unchanged)
+
+        self.log_tile("Seam tile", index, len(core), len(halo), len(changed), start)
+        return len(core)
+
+    def features_in(self, rect):
+        """Read the geometries (no attributes) of the features intersecting rect."""
+        request = QgsFeatureRequest().setFilterRect(rect).setSubsetOfAttributes([])
+        return list(self.source.getFeatures(request))
+
+    def owned_features(self, rect, owns, limit=None):
+        """Read the features of rect whose centre it owns, or None once there are more than limit.
+
+        Features are read one at a time, so an oversized tile never holds
+        more than limit of them.
+        """
+        request = QgsFeatureRequest().setFilterRect(rect).setSubsetOfAttributes([])
+        owned = []
+        for feature in self.source.getFeatures(request):
+            if owns(*self.centre(feature)):
+                if limit is not None and len(owned) >= limit:
+                    return None
+                owned.append(feature)
+        return owned
+
+    @staticmethod
+    def part_rect(rect, part):
+        """Return the QgsRectangle of part (0-8, row by row) of rect split 3 x 3."""
+        row, col = divmod(part, 3)
+        width, height = rect.width() / 3, rect.height() / 3
+        x0 = rect.xMinimum() + col * width
+        y0 = rect.yMinimum() + row * height
+        return QgsRectangle(x0, y0, x0 + width, y0 + height)
+
+    @staticmethod
+    def part_owner(rect, part, owns):
+        """Return the owns() callable of part of rect; every point of rect belongs to one part."""
+        row, col = divmod(part, 3)
+
+        def third(value, start, size):
+            return min(max(int((value - start) * 3 / size), 0), 2) if size else 0
+
+        def owns_part(x, y):
+            return (owns(x, y) and third(x, rect.xMinimum(), rect.width()) == col
+                    and third(y, rect.yMinimum(), rect.height()) == row)
+        return owns_part
+
+    def halo_features(self, core):
+        """Return the features around core that could interact with it."""
+        bounds = QgsRectangle(core[0].geometry().boundingBox())
+        for feature in core[1:]:
+            bounds.combineExtentWith(feature.geometry().boundingBox())
+        core_ids = {feature.id() for feature in core}
+        return [feature for feature in self.features_in(bounds.buffered(self.halo))
+                if feature.id() not in core_ids]
+
+    def seam_halo_features(self, seams):
+        """Return the features around each seam feature that could interact with it.
+
+        Seam features are spread along tile and part borders, so the halo is
+        read around every one of them instead of around their common extent,
+        which could cover a whole dense tile.
+        """
+        seam_ids = {feature.id() for feature in seams}
+        halo = {}
+        for seam in seams:
+            rect = seam.geometry().boundingBox().buffered(self.halo)
+            for feature in self.features_in(rect):
+                if feature.id() not in seam_ids:
+                    halo.setdefault(feature.id(), feature)
+        return list(halo.values())
+
+    def with_cleaned_geometries(self, features):
+        """Return copies of features carrying their checkpointed geometry, if changed."""
+        changed = self.store.changed_wkb(feature.id() for feature in features)
+        result = []
+        for feature in features:
+            wkb = changed.get(feature.id())
+            if wkb is not None:
+                feature = QgsFeature(feature)
+                feature.setGeometry(wkb_to_geom(wkb))
+            result.append(feature)
+        return result
+
+    @staticmethod
+    def centre(feature):
+        """Return the centre of the feature's bounding box as (x, y)."""
+        centre = feature.geometry().boundingBox().center()
+        return centre.x(), centre.y()
+
+    def log_tile(self, label, index, core, halo, changed, start):
+        elapsed = time.perf_counter() - start
+        log_message(lambda: f"  {label} {index}: {core} features + {halo} halo, {changed} changed, "
+                    f"{elapsed:.2f}s ({core / elapsed if elapsed else 0:.0f} features/s)",
+                    verbose=self.verbose)
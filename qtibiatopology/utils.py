@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Helpers shared by the plugin and the cleaning engines: logging, progress
+ reporting for background runs and geometry conversion.
+"""
+from contextlib import nullcontext
+
+from qgis.core import QgsGeometry, Qgis, QgsMessageLog
+
+from .profiling import DISABLED_PROFILE
+from .wkb import ewkb_to_wkb
+
+
+def log_message(message, level=Qgis.Info, verbose=True):
+    """Log message to the QGIS log panel.
+
+    :param message: Text, or a callable returning it. A callable is only
+        called when the message is logged, so verbose-only messages cost
+        nothing to format while verbose logging is off
+    """
+    # Set verbose=False in production for better performance
+    if not verbose:
+        return
+    if callable(message):
+        message = message()
+    QgsMessageLog.logMessage(message, 'Coverage Cleaning', level)
+
+
+# Progress of background runs is reported every this many features
+PROGRESS_INTERVAL = 1000
+
+
+def geometry_wkb(geom):
+    """Return the WKB of a QgsGeometry as bytes, or None for an empty geometry."""
+    # Convert QByteArray to Python bytes for psycopg3
+    wkb = bytes(geom.asWkb())
+    return wkb or None
+
+
+def iter_feature_wkb(features, progress=None, profile=DISABLED_PROFILE):
+    """Yield (feature_order, WKB) tuples, serializing one geometry at a time.
+
+    :param progress: Optional callable receiving the fraction of features done,
+        called every PROGRESS_INTERVAL features
+    :param profile: RunProfile counting the serialized rows and bytes
+    """
+    count = len(features)
+    size = 0
+    for idx, feature in enumerate(features):
+        if progress is not None and idx % PROGRESS_INTERVAL == 0:
+            progress(idx / count)
+        wkb = geometry_wkb(feature.geometry())
+        if profile.enabled and wkb:
+            size += len(wkb)
+        yield idx, wkb
+    profile.count("rows_uploaded", count)
+    profile.count("bytes_uploaded", size)
+
+
+class CleaningCanceled(Exception):
+    """Raised inside a cleaning run when its task was canceled."""
+
+
+# Progress bar position (percent) at which each pipeline stage starts.
+# Serialization is streamed into the upload, so it only gets a sliver.
+STAGE_PROGRESS = (
+    ("serialize", 0),
+    ("upload", 5),
+    ("probe", 30),
+    ("clean", 40),
+    ("fetch", 75),
+    ("decode", 85),
+)
+
+
+def stage_percent(stage, fraction=0.0):
+    """Return the progress (0-100) reached at fraction of a STAGE_PROGRESS stage."""
+    names = [name for name, _start in STAGE_PROGRESS]
+    index = names.index(stage)
+    start = STAGE_PROGRESS[index][1]
+    end = STAGE_PROGRESS[index + 1][1] if index + 1 < len(names) else 100
+    return start + (end - start) * fraction
+
+
+def report_stage(task, stage, fraction=0.0):
+    """Report pipeline progress to a CoverageCleaningTask, if the run has one."""
+    if task is not None:
+        task.set_stage(stage, fraction)
+
+
+def watch_connection(task, conn):
+    """Register conn with the task so canceling it cancels the running query."""
+    if task is None:
+        return nullcontext(conn)
+    return task.cancel_hook(conn.cancel)
+
+
+def wkb_to_geom(wkb):
+    """Convert ISO WKB bytes to QgsGeometry."""
+    if wkb is None:
+        return QgsGeometry()
+    g = QgsGeometry()
+    g.fromWkb(bytes(wkb) if isinstance(wkb, memoryview) else wkb)
+    return g
+
+
+def ewkb_to_geom(ewkb):
+    """Convert EWKB from PostGIS to QgsGeometry.
+
+    :param ewkb: EWKB as bytes or memoryview (a hex string is still accepted)
+    """
+    if ewkb is None:
+        return QgsGeometry()
+    if isinstance(ewkb, str):
+        ewkb = bytes.fromhex(ewkb)
+    return wkb_to_geom(ewkb_to_wkb(ewkb))
+
+
+def log_simplification(tolerance, before, after, profile=DISABLED_PROFILE):
+    """Log the vertex counts of a simplified run and add them to the run profile.
+
+    :param before: Vertices of the input
+    :param after: Vertices of the cleaned and simplified output
+    """
+    saved = f" ({100 * (1 - after / before):.0f}% fewer)" if before else ""
+    log_message(f"Coverage simplified at tolerance {tolerance}: {before} vertices before, "
+                f"{after} after{saved}")
+    profile.annotate(simplify={"tolerance": tolerance, "vertices_before": before,
+                               "vertices_after": after})
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ QTIBIA Topology - Coverage Cleaning Plugin
+                                 A QGIS plugin
+ Clean polygon coverages using PostGIS ST_CoverageClean
+                              -------------------
+        begin                : 2026-01-05
+        copyright            : (C) 2026 by QTIBIA Engineering
+        email                : tudor.barascu@qtibia.ro
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+ Binary (E)WKB and TWKB helpers. Pure Python, no QGIS imports, so they can be
+ benchmarked and checked outside QGIS.
+"""
+import struct
+
+# PostGIS EWKB flags in the geometry type word
+EWKB_Z_FLAG = 0x80000000
+EWKB_M_FLAG = 0x40000000
+EWKB_SRID_FLAG = 0x20000000
+
+# Geometry types whose body is a point list, a ring list or nested geometries
+_POINT = 1
+_POINT_LIST_TYPES = (2, 8)              # LineString, CircularString
+_RING_LIST_TYPES = (3, 17)              # Polygon, Triangle
+_COLLECTION_TYPES = (4, 5, 6, 7, 9, 10, 11, 12, 15, 16)
+
+
+def ewkb_to_wkb(data):
+    """Convert PostGIS EWKB to ISO WKB that QgsGeometry.fromWkb() can read.
+
+    Works on bytes, bytearray or memoryview without going through hex text.
+    Handles both byte orders, the SRID flag, and Z/M dimensions (EWKB flags
+    are rewritten to ISO type codes, e.g. 0x80000003 becomes 1003). Plain WKB
+    is returned unchanged.
+
+    :param data: EWKB or WKB geometry
+    :return: ISO WKB as bytes, or the input object itself when already WKB
+    """
+    view = memoryview(data)
+    order = "<" if view[0] == 1 else ">"
+    (geom_type,) = struct.unpack_from(order + "I", view, 1)
+
+    if not geom_type & (EWKB_Z_FLAG | EWKB_M_FLAG | EWKB_SRID_FLAG):
+        return data
+
+    if not geom_type & (EWKB_Z_FLAG | EWKB_M_FLAG):
+        # Only the SRID needs to go: nested geometries never carry one,
+        # so rewrite the header and copy the body in a single slice
+        header = struct.pack(order + "BI", view[0], geom_type & ~EWKB_SRID_FLAG)
+        return header + view[9:]
+
+    out = bytearray()
+    end = _copy_geometry(view, 0, out)
+    if end != len(view):
+        raise ValueError(f"Trailing bytes after EWKB geometry ({len(view) - end})")
+    return bytes(out)
+
+
+def _copy_geometry(view, pos, out):
+    """Append one geometry starting at pos to out as ISO WKB, return the end offset."""
+    byte_order = view[pos]
+    order = "<" if byte_order == 1 else ">"
+    (geom_type,) = struct.unpack_from(order + "I", view, pos + 1)
+    pos += 5
+
+    has_z = bool(geom_type & EWKB_Z_FLAG)
+    has_m = bool(geom_type & EWKB_M_FLAG)
+    if geom_type & EWKB_SRID_FLAG:
+        pos += 4
+    base_type = geom_type & 0x0FFFFFFF
+
+    # Accept ISO type codes as well (1000 = Z, 2000 = M, 3000 = ZM)
+    iso_dims = base_type // 1000
+    base_type %= 1000
+    has_z = has_z or iso_dims in (1, 3)
+    has_m = has_m or iso_dims in (2, 3)
+
+    iso_type = base_type + (1000 if has_z else 0) + (2000 if has_m else 0)
+    out += struct.pack(order + "BI", byte_order, iso_type)
+
+    point_size = 8 * (2 + has_z + has_m)
+    if base_type == _POINT:
+        end = pos + point_size
+    elif base_type in _POINT_LIST_TYPES:
+        (count,) = struct.unpack_from(order + "I", view, pos)
+        end = pos + 4 + count * point_size
+    elif base_type in _RING_LIST_TYPES:
+        (rings,) = struct.unpack_from(order + "I", view, pos)
+        end = pos + 4
+        for _ in range(rings):
+            (count,) = struct.unpack_from(order + "I", view, end)
+            end += 4 + count * point_size
+    elif base_type in _COLLECTION_TYPES:
+        (parts,) = struct.unpack_from(order + "I", view, pos)
+        out += view[pos:pos + 4]
+        pos += 4
+        for _ in range(parts):
+            pos = _copy_geometry(view, pos, out)
+        return pos
+    else:
+        raise ValueError(f"Unsupported EWKB geometry type {base_type}")
+
+    if end > len(view):
+        raise ValueError("Truncated EWKB geometry")
+    out += view[pos:end]
+    return end
+
+
+# TWKB (Tiny WKB, as written by ST_AsTWKB): coordinates are rounded to a
+# decimal precision and stored as zigzag varint deltas from the previous point
+TWKB_MIN_PRECISION = -8
+TWKB_MAX_PRECISION = 7
+_TWKB_BBOX = 0x01
+_TWKB_SIZE = 0x02
+_TWKB_ID_LIST = 0x04
+_TWKB_EXTENDED_DIMS = 0x08
+_TWKB_EMPTY = 0x10
+_MULTI_PART_TYPES = {4: 1, 5: 2, 6: 3}
+_NAN_POINT = struct.pack("<2d", float("nan"), float("nan"))
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(view, pos):
+    result = shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _round_half_away(value):
+    """Round like PostGIS lround(): halves away from zero."""
+    return int(value + 0.5) if value >= 0 else -int(0.5 - value)
+
+
+def wkb_to_twkb(data, precision):
+    """Convert (ISO or EWKB) WKB to TWKB, rounding coordinates to precision decimals.
+
+    The output matches what ST_GeomFromTWKB() reads; unlike ST_AsTWKB()
+    repeated points are kept, so the vertex count never changes. Z and M
+    are rounded to the same precision, clamped to 0..7 decimals.
+
+    :param data: WKB geometry as bytes, bytearray or memoryview
+    :param precision: Decimal places kept in X and Y, TWKB_MIN_PRECISION to TWKB_MAX_PRECISION
+    :return: TWKB as bytes
+    :raises ValueError: For curved geometry types, which TWKB can't store
+    """
+    return wkb_to_twkb_rounded(data, precision)[0]
+
+
+def wkb_to_twkb_rounded(data, precision):
+    """Convert WKB to TWKB like wkb_to_twkb(), telling whether rounding moved the geometry.
+
+    A coordinate moved when the value twkb_to_wkb() reads back is not the
+    one in data, so a False means the TWKB decodes to the same geometry.
+
+    :param data: WKB geometry as bytes, bytearray or memoryview
+    :param precision: Decimal places kept in X and Y, TWKB_MIN_PRECISION to TWKB_MAX_PRECISION
+    :return: Tuple (TWKB as bytes, True when a coordinate moved)
+    :raises ValueError: For curved geometry types, which TWKB can't store
+    """
+    if not TWKB_MIN_PRECISION <= precision <= TWKB_MAX_PRECISION:
+        raise ValueError(f"TWKB precision must be between {TWKB_MIN_PRECISION} "
+                         f"and {TWKB_MAX_PRECISION}, not {precision}")
+    view = memoryview(data)
+    out = bytearray()
+    end, moved = _encode_twkb(view, 0, precision, out)
+    if end != len(view):
+        raise ValueError(f"Trailing bytes after WKB geometry ({len(view) - end})")
+    return bytes(out), moved
+
+
+def _read_wkb_header(view, pos):
+    """Return (byte order, base type, has Z, has M, body offset) of the geometry at pos."""
+    order = "<" if view[pos] == 1 else ">"
+    (geom_type,) = struct.unpack_from(order + "I", view, pos + 1)
+    pos += 5
+    has_z = bool(geom_type & EWKB_Z_FLAG)
+    has_m = bool(geom_type & EWKB_M_FLAG)
+    if geom_type & EWKB_SRID_FLAG:
+        pos += 4
+    base_type = geom_type & 0x0FFFFFFF
+    iso_dims = base_type // 1000
+    base_type %= 1000
+    return order, base_type, has_z or iso_dims in (1, 3), has_m or iso_dims in (2, 3), pos
+
+
+def _encode_twkb(view, pos, precision, out):
+    order, base_type, has_z, has_m, pos = _read_wkb_header(view, pos)
+    if not 1 <= base_type <= 7:
+        raise ValueError(f"TWKB can't store WKB geometry type {base_type}")
+
+    dims = 2 + has_z + has_m
+    extra_precision = max(0, min(precision, 7))
+    factors = [10.0 ** precision] * 2 + [10.0 ** extra_precision] * (dims - 2)
+
+    # The body is written first: emptiness is only known once the counts are read
+    body = bytearray()
+    last = [0] * dims
+    moved = False
+    if base_type == 1:
+        coords = struct.unpack_from(f"{order}{dims}d", view, pos)
+        pos += 8 * dims
+        empty = coords[0] != coords[0]                      # POINT EMPTY is NaN
+        if not empty:
+            moved = _encode_coords(coords, factors, last, body)
+    elif base_type in (2, 3):
+        pos, empty, moved = _encode_body(view, pos, order, base_type, dims, factors, last, body)
+    else:
+        (parts,) = struct.unpack_from(order + "I", view, pos)
+        pos += 4
+        empty = parts == 0
+        _write_varint(body, parts)
+        for _ in range(parts):
+            if base_type == 7:
+                pos, part_moved = _encode_twkb(view, pos, precision, body)
+                moved |= part_moved
+                continue
+            part_order, part_type, _z, _m, pos = _read_wkb_header(view, pos)
+            if part_type == 1:
+                coords = struct.unpack_from(f"{part_order}{dims}d", view, pos)
+                pos += 8 * dims
+                moved |= _encode_coords(coords, factors, last, body)
+            else:
+                pos, _, part_moved = _encode_body(view, pos, part_order, part_type, dims,
+                                                  factors, last, body)
+                moved |= part_moved
+
+    out.append(base_type | (_zigzag(precision) << 4))
+    metadata = _TWKB_EMPTY if empty else 0
+    if has_z or has_m:
+        metadata |= _TWKB_EXTENDED_DIMS
+    out.append(metadata)
+    if has_z or has_m:
+        out.append(has_z | (has_m << 1) | (extra_precision << 2 if has_z else 0)
+                   | (extra_precision << 5 if has_m else 0))
+    if not empty:
+        out += body
+    return pos, moved
+
+
+def _encode_body(view, pos, order, base_type, dims, factors, last, body):
+    """Encode a LineString (2) or Polygon (3) body, return (end offset, empty, moved)."""
+    (count,) = struct.unpack_from(order + "I", view, pos)
+    pos += 4
+    _write_varint(body, count)
+    if base_type == 2:
+        coords = struct.unpack_from(f"{order}{count * dims}d", view, pos)
+        moved = _encode_coords(coords, factors, last, body)
+        return pos + 8 * dims * count, count == 0, moved
+    moved = False
+    for _ in range(count):
+        (points,) = struct.unpack_from(order + "I", view, pos)
+        pos += 4
+        _write_varint(body, points)
+        coords = struct.unpack_from(f"{order}{points * dims}d", view, pos)
+        moved |= _encode_coords(coords, factors, last, body)
+        pos += 8 * dims * points
+    return pos, count == 0, moved
+
+
+def _encode_coords(coords, factors, last, body):
+    """Encode coordinates as deltas, return True when rounding moved one of them."""
+    dims = len(factors)
+    moved = False
+    for idx, value in enumerate(coords):
+        dim = idx % dims
+        rounded = _round_half_away(value * factors[dim])
+        _write_varint(body, _zigzag(rounded - last[dim]))
+        last[dim] = rounded
+        # The same division twkb_to_wkb() decodes with
+        if rounded / factors[dim] != value:
+            moved = True
+    return moved
+
+
+def twkb_to_wkb(data):
+    """Convert TWKB (e.g. from ST_AsTWKB) to little-endian ISO WKB.
+
+    Bounding boxes, size fields and id lists are skipped; Z and M are kept.
+
+    :param data: TWKB geometry as bytes or memoryview
+    :return: ISO WKB as bytes, readable by QgsGeometry.fromWkb()
+    """
+    view = memoryview(data)
+    out = bytearray()
+    end = _decode_twkb(view, 0, out)
+    if end != len(view):
+        raise ValueError(f"Trailing bytes after TWKB geometry ({len(view) - end})")
+    return bytes(out)
+
+
+def _decode_twkb(view, pos, out):
+    type_byte, metadata = view[pos], view[pos + 1]
+    pos += 2
+    base_type = type_byte & 0x0F
+    if not 1 <= base_type <= 7:
+        raise ValueError(f"Unsupported TWKB geometry type {base_type}")
+
+    divisors = [10.0 ** _unzigzag(type_byte >> 4)] * 2
+    has_z = has_m = False
+    if metadata & _TWKB_EXTENDED_DIMS:
+        dims_byte = view[pos]
+        pos += 1
+        has_z, has_m = bool(dims_byte & 0x01), bool(dims_byte & 0x02)
+        if has_z:
+            divisors.append(10.0 ** ((dims_byte >> 2) & 0x07))
+        if has_m:
+            divisors.append(10.0 ** ((dims_byte >> 5) & 0x07))
+    if metadata & _TWKB_SIZE:
+        _size, pos = _read_varint(view, pos)
+    if metadata & _TWKB_BBOX:
+        for _ in range(2 * len(divisors)):
+            _value, pos = _read_varint(view, pos)
+
+    dim_offset = 1000 * has_z + 2000 * has_m
+    out += struct.pack("<BI", 1, base_type + dim_offset)
+    if metadata & _TWKB_EMPTY:
+        out += (_NAN_POINT + bytes(8 * (len(divisors) - 2)) if base_type == 1
+                else struct.pack("<I", 0))
+        return pos
+
+    last = [0] * len(divisors)
+    if base_type == 1:
+        return _decode_points(view, pos, 1, divisors, last, out)
+    if base_type in (2, 3):
+        return _decode_body(view, pos, base_type, divisors, last, out)
+
+    parts, pos = _read_varint(view, pos)
+    out += struct.pack("<I", parts)
+    if metadata & _TWKB_ID_LIST:
+        for _ in range(parts):
+            _id, pos = _read_varint(view, pos)
+    for _ in range(parts):
+        if base_type == 7:
+            pos = _decode_twkb(view, pos, out)
+            continue
+        part_type = _MULTI_PART_TYPES[base_type]
+        out += struct.pack("<BI", 1, part_type + dim_offset)
+        if part_type == 1:
+            pos = _decode_points(view, pos, 1, divisors, last, out)
+        else:
+            pos = _decode_body(view, pos, part_type, divisors, last, out)
+    return pos
+
+
+def _decode_body(view, pos, base_type, divisors, last, out):
+    count, pos = _read_varint(view, pos)
+    out += struct.pack("<I", count)
+    if base_type == 2:
+        return _decode_points(view, pos, count, divisors, last, out)
+    for _ in range(count):
+        points, pos = _read_varint(view, pos)
+        out += struct.pack("<I", points)
+        pos = _decode_points(view, pos, points, divisors, last, out)
+    return pos
+
+
+def _decode_points(view, pos, count, divisors, last, out):
+    dims = len(divisors)
+    values = []
+    for _ in range(count):
+        for dim in range(dims):
+            # Inlined _read_varint: this loop runs once per coordinate
+            result = shift = 0
+            while True:
+                byte = view[pos]
+                pos += 1
+                result |= (byte & 0x7F) << shift
+                if not byte & 0x80:
+                    break
+                shift += 7
+            last[dim] += (result >> 1) ^ -(result & 1)
+            values.append(last[dim] / divisors[dim])
+    out += struct.pack(f"<{len(values)}d", *values)
+    return pos